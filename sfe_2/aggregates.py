@@ -0,0 +1,141 @@
+import pandas as pd
+
+from downsample import SCATTER_POINT_LIMIT, bin_duration_price
+
+
+# value_counts without the zero counts categorical columns report for unused categories
+def _value_counts(series):
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+# KPI values shown in the Key Performance Indicators section
+def compute_kpis(filtered_vehicles, filtered_rentals):
+    total_rentals = len(filtered_rentals)
+    return {
+        'total_rentals': total_rentals,
+        'total_revenue': filtered_rentals['total_price'].sum(),
+        'avg_rental_price': filtered_rentals['total_price'].mean() if total_rentals > 0 else 0,
+        'avg_rental_days': filtered_rentals['rental_days'].mean() if total_rentals > 0 else 0,
+        'avg_rating': filtered_rentals['customer_rating'].mean() if total_rentals > 0 else 0,
+        'total_available': int((filtered_vehicles['status'] == 'Available').sum()),
+        'total_rented': int((filtered_vehicles['status'] == 'Rented').sum()),
+        'total_maintenance': int((filtered_vehicles['status'] == 'Maintenance').sum()),
+    }
+
+
+# Chart-ready aggregates, one function per dashboard section so each section
+# only pays for its own data. Trend and performance data come from the rollup
+# cube. The returned frames may be shared between sessions: treat them as read-only.
+
+# Monthly totals (chronological order)
+def compute_trends(rollup_cube, date_range=None, category=None):
+    monthly_totals = rollup_cube.monthly(date_range, vehicle_type=category)
+    return {
+        'monthly_rentals': monthly_totals[['month_year', 'count']].reset_index(drop=True),
+        'monthly_revenue': (
+            monthly_totals[['month_year', 'revenue']]
+            .rename(columns={'revenue': 'total_price'})
+            .reset_index(drop=True)
+        ),
+    }
+
+
+# Vehicle category and brand performance
+def compute_vehicle_performance(rollup_cube, date_range=None, category=None, brand=None):
+    category_perf = rollup_cube.aggregate(
+        'vehicle_type', date_range, vehicle_type=category, make=brand
+    )[['vehicle_type', 'count', 'revenue', 'avg_rating']]
+    category_perf.columns = ['Category', 'Number of Rentals', 'Total Revenue', 'Avg Rating']
+    category_perf['Avg Rating'] = category_perf['Avg Rating'].round(1)
+
+    brand_perf = rollup_cube.aggregate(
+        'make', date_range, vehicle_type=category, make=brand
+    )[['make', 'count', 'revenue', 'avg_rating']]
+    brand_perf.columns = ['Brand', 'Number of Rentals', 'Total Revenue', 'Avg Rating']
+    brand_perf['Avg Rating'] = brand_perf['Avg Rating'].round(1)
+
+    return {
+        'category_perf': category_perf,
+        'brand_perf': brand_perf.sort_values('Number of Rentals', ascending=False),
+    }
+
+
+# Vehicle status distribution
+def compute_fleet_status(filtered_vehicles):
+    status_counts = _value_counts(filtered_vehicles['status']).reset_index()
+    status_counts.columns = ['Status', 'Count']
+    return {'status_counts': status_counts}
+
+
+# Top clients by rental frequency
+def compute_top_clients(filtered_rentals):
+    top_clients = _value_counts(filtered_rentals['client_name']).reset_index()
+    top_clients.columns = ['Client Name', 'Number of Rentals']
+    return {'top_clients': top_clients.head(10)}
+
+
+# Return delay analysis
+def compute_delays(filtered_rentals):
+    delays = filtered_rentals['return_delay_days']
+    delay_counts = _value_counts(delays).reset_index()
+    delay_counts.columns = ['Delay Days', 'Count']
+
+    delayed = int((delays > 0).sum())
+    return {
+        'delay_counts': delay_counts.sort_values('Delay Days'),
+        'avg_delay': delays.mean(),
+        'delayed_rentals': delayed,
+        'percent_delayed': (delayed / len(filtered_rentals)) * 100 if len(filtered_rentals) > 0 else 0,
+        'delay_pie': pd.DataFrame({
+            "Status": ["On Time", "Delayed"],
+            "Count": [int((delays == 0).sum()), delayed]
+        }),
+    }
+
+
+# Customer ratings analysis
+def compute_ratings(filtered_rentals):
+    # Ratings are stored as float32: back to one-decimal float64 for labelling
+    valid_ratings = filtered_rentals['customer_rating'].dropna().astype('float64').round(1)
+    rating_counts = _value_counts(valid_ratings).reset_index()
+    rating_counts.columns = ['Rating', 'Count']
+    high_ratings = (valid_ratings >= 4).sum()
+    return {
+        'rating_counts': rating_counts.sort_values('Rating'),
+        'rating_percentage': (high_ratings / len(valid_ratings)) * 100 if len(valid_ratings) > 0 else 0,
+    }
+
+
+# Revenue by payment method
+def compute_payments(rollup_cube, date_range=None, category=None):
+    payment_revenue = rollup_cube.aggregate(
+        'payment_method', date_range, vehicle_type=category
+    )[['payment_method', 'revenue', 'count']]
+    payment_revenue.columns = ['Payment Method', 'Total Revenue', 'Number of Rentals']
+    return {'payment_revenue': payment_revenue}
+
+
+# Rental duration vs. price points; large selections are binned into a
+# bounded 2D density instead of one marker per rental
+def compute_duration_price(filtered_rentals, point_limit=SCATTER_POINT_LIMIT):
+    # Remove rows with missing rental_days or total_price, and 0 or negative rental days
+    safe_data = filtered_rentals.dropna(subset=["rental_days", "total_price"])
+    safe_data = safe_data[safe_data["rental_days"] > 0]
+    if len(safe_data) <= point_limit:
+        return {'duration_price': safe_data, 'duration_price_binned': False, 'duration_price_rentals': len(safe_data)}
+    binned = bin_duration_price(safe_data['rental_days'], safe_data['total_price'], safe_data['return_delay_days'])
+    return {'duration_price': binned, 'duration_price_binned': True, 'duration_price_rentals': len(safe_data)}
+
+
+# All chart data at once (every section of the dashboard except the row-level scatter)
+def compute_chart_data(rollup_cube, filtered_vehicles, filtered_rentals, date_range=None, category=None, brand=None):
+    charts = {}
+    charts.update(compute_trends(rollup_cube, date_range, category))
+    charts.update(compute_vehicle_performance(rollup_cube, date_range, category, brand))
+    charts.update(compute_fleet_status(filtered_vehicles))
+    charts.update(compute_top_clients(filtered_rentals))
+    charts.update(compute_delays(filtered_rentals))
+    charts.update(compute_ratings(filtered_rentals))
+    charts.update(compute_payments(rollup_cube, date_range, category))
+    return charts
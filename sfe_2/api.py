@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import secrets
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from filters import ALL
+from service import SECTIONS, DataService, to_json_value
+
+# Local HTTP API over the dashboard's data service (see service.py), for other
+# systems that need the same KPIs and aggregates without rendering the page.
+#
+#   python api.py                                  # http://127.0.0.1:8600
+#   curl http://127.0.0.1:8600/api                 # data version, filter values, sections
+#   curl "http://127.0.0.1:8600/api/kpis?start=2024-01-01&end=2024-03-31&category=SUV"
+#
+# Section endpoints take the sidebar filters as query parameters: start / end
+# (ISO dates, default: the data's first / last day), category, status, brand
+# (default: All). Responses carry an ETag tied to the data version: pollers
+# sending it back in If-None-Match get an empty 304 until the data changes,
+# without anything being computed. The dashboard can serve the same API from its
+# own process (sharing its dataset and result cache) on DASHBOARD_API_PORT.
+
+API_HOST = os.environ.get("DASHBOARD_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("DASHBOARD_API_PORT", "0")) or 8600
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _date_param(params, name, default):
+    value = params.get(name, [''])[0]
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, "{} must be an ISO date (YYYY-MM-DD), got {!r}".format(name, value))
+
+
+# Sidebar filters of a request, as the dashboard passes them to the sections
+def request_filters(params, dataset):
+    date_range = (_date_param(params, 'start', dataset.min_date), _date_param(params, 'end', dataset.max_date))
+    if date_range[0] > date_range[1]:
+        raise ApiError(400, "start must not be after end")
+    category, status, brand = (params.get(name, [ALL])[0] or ALL for name in ('category', 'status', 'brand'))
+    return date_range, category, status, brand
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    service = None
+    # Random per server, so that ETags of a previous run (whose data versions
+    # also started at 0) never match
+    instance = None
+    quiet = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        try:
+            if not parts or parts[0] != 'api' or len(parts) > 2:
+                raise ApiError(404, "not found: {}".format(url.path))
+            if len(parts) == 2 and parts[1] not in SECTIONS:
+                raise ApiError(404, "unknown section {!r}, expected one of: {}".format(parts[1], ", ".join(SECTIONS)))
+            data_version, dataset = self.service.current()
+            etag = '"{}-{}"'.format(self.instance, data_version)
+            # The filters are checked first: a bad query is a 400, whatever the ETag
+            filters = request_filters(parse_qs(url.query), dataset) if len(parts) == 2 else None
+            if self._not_modified(etag):
+                self._send(304, None, etag)
+                return
+            if len(parts) == 1:
+                body = self._index(data_version, dataset)
+            else:
+                body = self._section(parts[1], filters, data_version, dataset)
+            self._send(200, body, etag)
+        except ApiError as error:
+            self._send(error.status, {'error': str(error)})
+
+    def _not_modified(self, etag):
+        tags = self.headers.get('If-None-Match')
+        if tags is None:
+            return False
+        tags = [tag.strip() for tag in tags.split(',')]
+        return '*' in tags or etag in tags or 'W/' + etag in tags
+
+    def _index(self, data_version, dataset):
+        filter_index = dataset.filter_index
+        return {
+            'version': data_version,
+            'min_date': dataset.min_date.isoformat(),
+            'max_date': dataset.max_date.isoformat(),
+            'categories': filter_index.categories,
+            'statuses': filter_index.statuses,
+            'brands': filter_index.brands,
+            'sections': SECTIONS,
+        }
+
+    def _section(self, name, filters, data_version, dataset):
+        date_range, category, status, brand = filters
+        result = self.service.section(name, data_version, dataset, date_range, category, status, brand)
+        # Counted like the dashboard's views, so the views polled through the
+        # API are warmed up for the next data version too
+        self.service.usage_log.record(date_range, category, status, brand, span=(dataset.min_date, dataset.max_date))
+        return {
+            'version': data_version,
+            'section': name,
+            'filters': {
+                'start': date_range[0].isoformat(),
+                'end': date_range[1].isoformat(),
+                'category': category,
+                'status': status,
+                'brand': brand,
+            },
+            'result': to_json_value(result),
+        }
+
+    def _send(self, status, body, etag=None):
+        payload = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Cached copies must be revalidated, which is what the ETag makes cheap
+            self.send_header('Cache-Control', 'no-cache')
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service, host=API_HOST, port=API_PORT, quiet=False):
+    handler = type('Handler', (ApiHandler,), {'service': service, 'instance': secrets.token_hex(4), 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# Serve the API on a background thread (e.g. next to the Streamlit UI)
+def start_server(service, host=API_HOST, port=API_PORT, quiet=True):
+    server = make_server(service, host, port, quiet)
+    threading.Thread(target=server.serve_forever, name="dashboard-api", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard's KPIs and aggregates as JSON over HTTP.")
+    parser.add_argument('--host', default=API_HOST, help="interface to listen on")
+    parser.add_argument('--port', type=int, default=API_PORT, help="port to listen on")
+    args = parser.parse_args()
+
+    server = make_server(DataService(), args.host, args.port)
+    print("Serving the dashboard API on http://{}:{}/api".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
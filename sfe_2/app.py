@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 import numpy as np
 import os
-from plotly.subplots import make_subplots
+import time
+from pipeline import build_frames
+from result_cache import ResultCache
+import figures
+from figures import FIGURE_CACHE_ENTRIES, cached_figure
+from plotly.colors import qualitative
+from service import DataService
+from api import start_server as start_api_server
+from instrumentation import MetricsExporter, Profiler, profiling_requested
+from exports import EXPORT_CHUNK_ROWS, MIME_TYPES, export_report, export_table, report_tables
+from functools import partial
 
 # Set page configuration
 st.set_page_config(
@@ -59,80 +67,96 @@ st.markdown("""
 # Page header
 st.markdown("<h1 class='main-header'> KECH Car Rental Agency Dashboard</h1>", unsafe_allow_html=True)
 
-# Function to load data
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_data():
-    try:
-        # Try to load from the provided Excel files
-        vehicles_df = pd.read_excel("C:/Users/ayala/Downloads/sfe_2/vehicles .xlsx")
-        rentals_df = pd.read_excel("C:/Users/ayala/Downloads/sfe_2/rentals .xlsx")
-    except FileNotFoundError:
-        # If files not found, use sample data
-        st.warning("Excel files not found. Using sample data instead.")
-        
-        # Create sample vehicles data
-        vehicles_data = {
-            'vehicle_id': list(range(1, 21)),
-            'brand': np.random.choice(['Toyota', 'Honda', 'Ford', 'BMW', 'Mercedes', 'Audi', 'Hyundai'], 20),
-            'model': np.random.choice(['Sedan', 'SUV', 'Compact', 'Luxury', 'Van'], 20),
-            'year': np.random.choice(range(2018, 2023), 20),
-            'category': np.random.choice(['Economy', 'Standard', 'Premium', 'Luxury'], 20),
-            'daily_rate': np.random.uniform(30, 150, 20).round(2),
-            'status': np.random.choice(['Available', 'Rented', 'Maintenance'], 20, p=[0.6, 0.3, 0.1]),
-            'mileage': np.random.uniform(10000, 80000, 20).round(0),
-            'last_maintenance': pd.date_range(start='2023-01-01', periods=20),
-            'condition_score': np.random.uniform(3, 5, 20).round(1)
-        }
-        vehicles_df = pd.DataFrame(vehicles_data)
-        
-        # Create sample rentals data
-        today = datetime.now()
-        num_rentals = 200
-        start_dates = pd.date_range(end=today, periods=365).tolist()
-        
-        rentals_data = {
-            'rental_id': list(range(1, num_rentals + 1)),
-            'vehicle_id': np.random.choice(vehicles_df['vehicle_id'], num_rentals),
-            'client_name': np.random.choice(['John Smith', 'Mary Johnson', 'Robert Williams', 'Sarah Davis', 
-                                             'Michael Brown', 'Jennifer Miller', 'David Garcia', 'Lisa Wilson',
-                                             'James Moore', 'Patricia Taylor'], num_rentals),
-            'start_date': np.random.choice(start_dates, num_rentals),
-            'rental_days': np.random.choice(range(1, 15), num_rentals),
-            'total_price': np.random.uniform(100, 2000, num_rentals).round(2),
-            'payment_method': np.random.choice(['Credit Card', 'Debit Card', 'Cash', 'Online Payment'], num_rentals),
-            'status': np.random.choice(['Completed', 'Active', 'Reserved'], num_rentals, p=[0.7, 0.2, 0.1]),
-            'return_delay_days': np.random.choice(range(0, 5), num_rentals, p=[0.8, 0.1, 0.05, 0.03, 0.02]),
-            'customer_rating': np.random.choice([None, 3, 4, 5], num_rentals, p=[0.2, 0.1, 0.3, 0.4])
-        }
-        rentals_df = pd.DataFrame(rentals_data)
-        
-        # Calculate end dates based on start_date and rental_days
-        rentals_df['end_date'] = rentals_df.apply(lambda x: x['start_date'] + timedelta(days=x['rental_days']), axis=1)
-        
-    # Process and clean the data
-    rentals_df['start_date'] = pd.to_datetime(rentals_df['start_date'])
-    if 'end_date' not in rentals_df.columns:
-        rentals_df['end_date'] = rentals_df.apply(lambda x: x['start_date'] + timedelta(days=x['rental_days']), axis=1)
+# Opt-in performance instrumentation (DASHBOARD_PROFILE=1 or ?profile=1):
+# stage timers for this run, shown in the sidebar "Performance" panel
+profiler = Profiler(enabled=profiling_requested(st.query_params.get("profile")))
+
+# Profiled runs are exported (JSON lines / Prometheus text files) by one
+# process-wide exporter
+@st.cache_resource
+def get_metrics_exporter():
+    return MetricsExporter.from_environment()
+
+CHANGE_CHECK_INTERVAL = 5  # seconds between checks in open sessions
+
+# Sample data, used when the workbooks are not found
+def load_sample_data():
+    st.warning("Excel files not found. Using sample data instead.")
     
-    # Add month and year columns for time-based analysis
-    rentals_df['month'] = rentals_df['start_date'].dt.month_name()
-    rentals_df['year'] = rentals_df['start_date'].dt.year
-    rentals_df['month_year'] = rentals_df['start_date'].dt.strftime('%b %Y')
+    # Create sample vehicles data
+    vehicles_data = {
+        'vehicle_id': list(range(1, 21)),
+        'brand': np.random.choice(['Toyota', 'Honda', 'Ford', 'BMW', 'Mercedes', 'Audi', 'Hyundai'], 20),
+        'model': np.random.choice(['Sedan', 'SUV', 'Compact', 'Luxury', 'Van'], 20),
+        'year': np.random.choice(range(2018, 2023), 20),
+        'category': np.random.choice(['Economy', 'Standard', 'Premium', 'Luxury'], 20),
+        'daily_rate': np.random.uniform(30, 150, 20).round(2),
+        'status': np.random.choice(['Available', 'Rented', 'Maintenance'], 20, p=[0.6, 0.3, 0.1]),
+        'mileage': np.random.uniform(10000, 80000, 20).round(0),
+        'last_maintenance': pd.date_range(start='2023-01-01', periods=20),
+        'condition_score': np.random.uniform(3, 5, 20).round(1)
+    }
+    vehicles_df = pd.DataFrame(vehicles_data)
     
-    # Merge dataframes for comprehensive analysis
-    merged_df = pd.merge(rentals_df, vehicles_df, on='vehicle_id', how='left')
+    # Create sample rentals data
+    today = datetime.now()
+    num_rentals = 200
+    start_dates = pd.date_range(end=today, periods=365).tolist()
     
-    return vehicles_df, rentals_df, merged_df
-
-# Load the data
-vehicles_df, rentals_df, merged_df = load_data()
+    rentals_data = {
+        'rental_id': list(range(1, num_rentals + 1)),
+        'vehicle_id': np.random.choice(vehicles_df['vehicle_id'], num_rentals),
+        'client_name': np.random.choice(['John Smith', 'Mary Johnson', 'Robert Williams', 'Sarah Davis', 
+                                         'Michael Brown', 'Jennifer Miller', 'David Garcia', 'Lisa Wilson',
+                                         'James Moore', 'Patricia Taylor'], num_rentals),
+        'start_date': np.random.choice(start_dates, num_rentals),
+        'rental_days': np.random.choice(range(1, 15), num_rentals),
+        'total_price': np.random.uniform(100, 2000, num_rentals).round(2),
+        'payment_method': np.random.choice(['Credit Card', 'Debit Card', 'Cash', 'Online Payment'], num_rentals),
+        'status': np.random.choice(['Completed', 'Active', 'Reserved'], num_rentals, p=[0.7, 0.2, 0.1]),
+        'return_delay_days': np.random.choice(range(0, 5), num_rentals, p=[0.8, 0.1, 0.05, 0.03, 0.02]),
+        'customer_rating': np.random.choice([None, 3, 4, 5], num_rentals, p=[0.2, 0.1, 0.3, 0.4])
+    }
+    rentals_df = pd.DataFrame(rentals_data)
+    
+    # Process and clean the data (end dates come from start_date and rental_days)
+    return build_frames(vehicles_df, rentals_df)
+
+# One data service per process, shared by all sessions (see service.py): the
+# dataset, loaded once here and then rebuilt by a background worker when the
+# source files change (or every 5 minutes with DASHBOARD_RELOAD_MODE=ttl), which
+# fills the result cache for the default view and the most requested filter
+# combinations before swapping the new data in, so sessions move to it with warm
+# results. KPIs and chart data are memoized per (data version, filters, section)
+# in its result cache. With DASHBOARD_API_PORT set, the same data is also served
+# as JSON over HTTP (see api.py).
+@st.cache_resource
+def get_data_service():
+    service = DataService(fallback=load_sample_data, profiler=profiler)
+    if os.environ.get("DASHBOARD_API_PORT"):
+        start_api_server(service)
+    return service
+
+data_service = get_data_service()
+
+# Load the data: the same (version, dataset) pair for the whole run
+data_version, dataset = data_service.current()
+filter_index = dataset.filter_index
+
+# Rerun open sessions as soon as a new data version is ready
+@st.fragment(run_every=CHANGE_CHECK_INTERVAL)
+def watch_for_changes():
+    if data_service.version != data_version:
+        st.rerun(scope="app")
+
+watch_for_changes()
 
 # Sidebar for filters
 st.sidebar.header("Filters")
 
 # Date range filter
-min_date = rentals_df['start_date'].min().date()
-max_date = rentals_df['start_date'].max().date()
+min_date = dataset.min_date
+max_date = dataset.max_date
 
 date_range = st.sidebar.date_input(
     "Select Date Range",
@@ -141,100 +165,125 @@ date_range = st.sidebar.date_input(
     max_value=max_date
 )
 
-if len(date_range) == 2:
-    start_date, end_date = date_range
-    filtered_rentals = rentals_df[(rentals_df['start_date'].dt.date >= start_date) & 
-                                 (rentals_df['start_date'].dt.date <= end_date)]
-    filtered_merged = merged_df[(merged_df['start_date'].dt.date >= start_date) & 
-                               (merged_df['start_date'].dt.date <= end_date)]
-else:
-    filtered_rentals = rentals_df
-    filtered_merged = merged_df
-
 # Vehicle category filter
-all_categories = ['All'] + sorted(vehicles_df['vehicle_type'].unique().tolist())
+all_categories = ['All'] + filter_index.categories
 selected_category = st.sidebar.selectbox("Vehicle Category", all_categories)
 
-if selected_category != 'All':
-    filtered_vehicles = vehicles_df[vehicles_df['vehicle_type'] == selected_category]
-    vehicle_ids = filtered_vehicles['vehicle_id'].tolist()
-    filtered_rentals = filtered_rentals[filtered_rentals['vehicle_id'].isin(vehicle_ids)]
-    filtered_merged = filtered_merged[filtered_merged['vehicle_type'] == selected_category]
-else:
-    filtered_vehicles = vehicles_df
-
 # Vehicle status filter
-all_statuses = ['All'] + sorted(vehicles_df['status'].unique().tolist())
+all_statuses = ['All'] + filter_index.statuses
 selected_status = st.sidebar.selectbox("Vehicle Status", all_statuses)
 
-if selected_status != 'All':
-    filtered_vehicles = filtered_vehicles[filtered_vehicles['status'] == selected_status]
-
 # Vehicle brand filter
-all_brands = ['All'] + sorted(vehicles_df['make'].unique().tolist())
+all_brands = ['All'] + filter_index.brands
 selected_brand = st.sidebar.selectbox("Vehicle Brand", all_brands)
 
-if selected_brand != 'All':
-    filtered_vehicles = filtered_vehicles[filtered_vehicles['make'] == selected_brand]
-    filtered_merged = filtered_merged[filtered_merged['make'] == selected_brand]
+# Apply the filters through the backend (index positions in memory, WHERE
+# clauses in SQL); each section's data is computed on first use
+rental_date_range = date_range if len(date_range) == 2 else None
+
+# Count each filter combination once per session when it is selected, so the
+# most requested ones are warmed up for the next data version
+current_view = (rental_date_range, selected_category, selected_status, selected_brand)
+if st.session_state.get("recorded_view") != current_view:
+    st.session_state["recorded_view"] = current_view
+    data_service.usage_log.record(*current_view, span=(min_date, max_date))
+
+with profiler.stage('filter', 'sidebar', rows_in=dataset.rental_count) as filter_record:
+    sections = dataset.sections(
+        date_range=rental_date_range,
+        category=selected_category,
+        status=selected_status,
+        brand=selected_brand
+    )
+    filtered_vehicles = sections.fleet()
+    if profiler.enabled:
+        filter_record['rows_out'] = len(sections)
 
 # Main dashboard content
 # KPIs section
 st.markdown("<h2 class='sub-header'>📊 Key Performance Indicators</h2>", unsafe_allow_html=True)
 
-# Calculate KPIs
-total_rentals = len(filtered_rentals)
-total_revenue = filtered_rentals['total_price'].sum()
-avg_rental_price = filtered_rentals['total_price'].mean() if total_rentals > 0 else 0
-# Ensure dates are datetime objects
-filtered_rentals["start_date"] = pd.to_datetime(filtered_rentals["start_date"])
-filtered_rentals["end_date"] = pd.to_datetime(filtered_rentals["end_date"])
+result_cache = data_service.result_cache
+view_key = (data_version, rental_date_range, selected_category, selected_status, selected_brand)
+
+def cached_section(name, compute):
+    return profiler.call('aggregate', name, lambda: result_cache.get_or_compute(view_key + (name,), compute))
+
+# Finished figures per chart, input data and template, shared by all sessions:
+# a chart is only built when its data is new (see figures.py)
+@st.cache_resource
+def get_figure_cache():
+    return ResultCache(max_entries=FIGURE_CACHE_ENTRIES)
+
+figure_cache = get_figure_cache()
 
-# Calculate rental duration
-filtered_rentals["rental_days"] = (filtered_rentals["end_date"] - filtered_rentals["start_date"]).dt.days
+def chart_figure(name, inputs, build):
+    with profiler.stage('figure', name):
+        return cached_figure(figure_cache, name, inputs, build)
 
-# Now calculate average rental duration
-avg_rental_days = filtered_rentals['rental_days'].mean() if total_rentals > 0 else 0
+# Send a figure to the browser (timed, with its JSON size, when profiling)
+def plot_chart(name, fig):
+    profiler.render_figure(name, fig, lambda f: st.plotly_chart(f, use_container_width=True))
 
-avg_rating = filtered_rentals['customer_rating'].mean() if total_rentals > 0 else 0
-total_available = len(filtered_vehicles[filtered_vehicles['status'] == 'Available'])
-total_rented = len(filtered_vehicles[filtered_vehicles['status'] == 'Rented'])
-total_maintenance = len(filtered_vehicles[filtered_vehicles['status'] == 'Maintenance'])
+# Calculate KPIs
+kpis = cached_section('kpis', sections.kpis)
+
+total_rentals = kpis['total_rentals']
+total_revenue = kpis['total_revenue']
+avg_rental_price = kpis['avg_rental_price']
+# Dates and rental duration are derived once at load time (see pipeline.py)
+avg_rental_days = kpis['avg_rental_days']
+avg_rating = kpis['avg_rating']
+total_available = kpis['total_available']
+total_rented = kpis['total_rented']
+total_maintenance = kpis['total_maintenance']
+
+# Period-over-period deltas: the selected range against the same number of
+# days just before it, from the daily prefix sums (see kpi_engine.py)
+period_kpis = cached_section('period_kpis', sections.period_kpis)
+previous_period = period_kpis['previous']
+comparison = "Compared with the previous {} days".format(period_kpis['period_days'])
+
+def kpi_delta(current, previous, key, percent=False):
+    if not previous['rentals'] or current[key] is None or previous[key] is None:
+        return None
+    change = current[key] - previous[key]
+    if percent:
+        return f"{change / previous[key] * 100:+.1f}%" if previous[key] else None
+    return change
 
 # Display KPIs in columns
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    st.markdown("""
-    <div class='kpi-container' style='background-color: #EFF6FF;color: black;'>
-        <p class='kpi-value'>{}</p>
-        <p class='kpi-label'>Total Rentals</p>
-    </div>
-    """.format(total_rentals), unsafe_allow_html=True)
+    st.metric(
+        "Total Rentals", f"{total_rentals:,}",
+        delta=kpi_delta(period_kpis['current'], previous_period, 'rentals'),
+        help=comparison, border=True
+    )
 
 with col2:
-    st.markdown("""
-    <div class='kpi-container' style='background-color: #ECFDF5;color: black;'>
-        <p class='kpi-value'> {:.2f} MAD</p>
-        <p class='kpi-label'>Total Revenue</p>
-    </div>
-    """.format(total_revenue), unsafe_allow_html=True)
+    st.metric(
+        "Total Revenue", f"{total_revenue:,.2f} MAD",
+        delta=kpi_delta(period_kpis['current'], previous_period, 'revenue', percent=True),
+        help=comparison, border=True
+    )
 
 with col3:
-    st.markdown("""
-    <div class='kpi-container' style='background-color: #F3F4F6;color: black;'>
-        <p class='kpi-value'> {:.2f} MAD</p>
-        <p class='kpi-label'>Avg. Rental Price</p>
-    </div>
-    """.format(avg_rental_price), unsafe_allow_html=True)
+    price_delta = kpi_delta(period_kpis['current'], previous_period, 'avg_price')
+    st.metric(
+        "Avg. Rental Price", f"{avg_rental_price:,.2f} MAD",
+        delta=None if price_delta is None else f"{price_delta:+.2f} MAD",
+        help=comparison, border=True
+    )
 
 with col4:
-    st.markdown("""
-    <div class='kpi-container' style='background-color: #FEF3C7;color: black;'>
-        <p class='kpi-value'>{:.1f} ⭐</p>
-        <p class='kpi-label'>Avg. Customer Rating</p>
-    </div>
-    """.format(avg_rating), unsafe_allow_html=True)
+    rating_delta = kpi_delta(period_kpis['current'], previous_period, 'avg_rating')
+    st.metric(
+        "Avg. Customer Rating", f"{avg_rating:.1f} ⭐",
+        delta=None if rating_delta is None else f"{rating_delta:+.2f}",
+        help=comparison, border=True
+    )
 
 # Vehicle status summary
 col1, col2, col3 = st.columns(3)
@@ -263,365 +312,530 @@ with col3:
     </div>
     """.format(total_maintenance), unsafe_allow_html=True)
 
-# Time series analysis
-st.markdown("<h2 class='sub-header'>📈 Rental Trends</h2>", unsafe_allow_html=True)
-
-# Prepare time series data - group by month
-monthly_rentals = filtered_rentals.groupby('month_year').size().reset_index(name='count')
-monthly_revenue = filtered_rentals.groupby('month_year').agg({'total_price': 'sum'}).reset_index()
-
-# Ensure chronological order
-all_months = pd.date_range(start=min_date, end=max_date, freq='MS').strftime('%b %Y').tolist()
-monthly_rentals['month_year'] = pd.Categorical(monthly_rentals['month_year'], categories=all_months, ordered=True)
-monthly_rentals = monthly_rentals.sort_values('month_year')
-
-monthly_revenue['month_year'] = pd.Categorical(monthly_revenue['month_year'], categories=all_months, ordered=True)
-monthly_revenue = monthly_revenue.sort_values('month_year')
-
-# Create tabs for different time series visualizations
-trend_tabs = st.tabs(["Rentals Over Time", "Revenue Over Time", "Combined View"])
-
-with trend_tabs[0]:
-    fig_rentals = px.line(
-        monthly_rentals, 
-        x='month_year', 
-        y='count',
-        markers=True,
-        title='Number of Rentals by Month',
-        labels={'count': 'Number of Rentals', 'month_year': 'Month'},
-        template='plotly_white'
+# Rolling windows ending with the selected range, each against the window before
+@st.fragment
+def rolling_kpis_section():
+    window_days = st.radio(
+        "Rolling window", [rolling['window'] for rolling in period_kpis['rolling']],
+        index=1, format_func=lambda days: f"{days} days", horizontal=True, key="rolling_window"
     )
-    fig_rentals.update_layout(height=400)
-    st.plotly_chart(fig_rentals, use_container_width=True)
-
-with trend_tabs[1]:
-    fig_revenue = px.line(
-        monthly_revenue, 
-        x='month_year', 
-        y='total_price',
-        markers=True,
-        title='Revenue by Month',
-        labels={'total_price': 'Revenue (MAD)', 'month_year': 'Month'},
-        template='plotly_white'
+    rolling = next(r for r in period_kpis['rolling'] if r['window'] == window_days)
+    current, previous = rolling['current'], rolling['previous']
+    st.caption("{} days up to {:%Y-%m-%d}, compared with the {} days before".format(
+        window_days, period_kpis['as_of'], window_days))
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rentals", f"{current['rentals']:,}", delta=kpi_delta(current, previous, 'rentals'))
+    col2.metric(
+        "Revenue", f"{current['revenue']:,.2f} MAD",
+        delta=kpi_delta(current, previous, 'revenue', percent=True)
     )
-    fig_revenue.update_layout(height=400)
-    st.plotly_chart(fig_revenue, use_container_width=True)
-
-with trend_tabs[2]:
-    # Create a figure with secondary y-axis
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-
-    # Add traces
-    fig.add_trace(
-        go.Scatter(
-            x=monthly_rentals['month_year'], 
-            y=monthly_rentals['count'],
-            name="Number of Rentals",
-            mode='lines+markers',
-            line=dict(color='#3B82F6')
-        ),
-        secondary_y=False
+    rating_delta = kpi_delta(current, previous, 'avg_rating')
+    col3.metric(
+        "Avg. Customer Rating",
+        "–" if current['avg_rating'] is None else f"{current['avg_rating']:.2f} ⭐",
+        delta=None if rating_delta is None else f"{rating_delta:+.2f}"
     )
+
+rolling_kpis_section()
+
+# Time series analysis
+st.markdown("<h2 class='sub-header'>📈 Rental Trends</h2>", unsafe_allow_html=True)
+
+# Lazy sections: each tabbed or collapsible section is a fragment, so switching
+# its tab or opening its expander reruns only that section, and only the open
+# tab's (or expander's) data prep and figures are built
+@st.fragment
+def rental_trends_section():
+    # Prepare time series data - monthly totals (chronological order)
+    trends = cached_section('trends', sections.trends)
+    monthly_rentals = trends['monthly_rentals']
+    monthly_revenue = trends['monthly_revenue']
+
+    # Demand forecast of the selected category, drawn after the monthly charts
+    # when the date range reaches the last rental
+    forecast = cached_section('forecast', sections.forecast)
+    show_forecast = rental_date_range is None or rental_date_range[1] >= dataset.max_date
+    forecast_df = forecast['forecast'] if show_forecast else forecast['forecast'].iloc[:0]
+
+    # Create tabs for different time series visualizations (only the open one is built)
+    trend_tabs = st.tabs(["Rentals Over Time", "Revenue Over Time", "Combined View", "Forecast"], key="trend_tabs", on_change="rerun")
+
+    if trend_tabs[0].open:
+        with trend_tabs[0]:
+            fig_rentals = chart_figure('monthly_rentals', (monthly_rentals, forecast_df), lambda: figures.add_forecast(
+                figures.line(
+                    monthly_rentals,
+                    x='month_year',
+                    y='count',
+                    markers=True,
+                    title='Number of Rentals by Month',
+                    labels={'count': 'Number of Rentals', 'month_year': 'Month'}
+                ),
+                forecast_df, x='month_year', y='rentals', lower='rentals_lower', upper='rentals_upper'
+            ))
+            plot_chart('monthly_rentals', fig_rentals)
+
+    if trend_tabs[1].open:
+        with trend_tabs[1]:
+            fig_revenue = chart_figure('monthly_revenue', (monthly_revenue, forecast_df), lambda: figures.add_forecast(
+                figures.line(
+                    monthly_revenue,
+                    x='month_year',
+                    y='total_price',
+                    markers=True,
+                    title='Revenue by Month',
+                    labels={'total_price': 'Revenue (MAD)', 'month_year': 'Month'}
+                ),
+                forecast_df, x='month_year', y='revenue', lower='revenue_lower', upper='revenue_upper'
+            ))
+            plot_chart('monthly_revenue', fig_revenue)
+
+    if trend_tabs[2].open:
+        with trend_tabs[2]:
+            # Create a figure with secondary y-axis (revenue on the right)
+            fig = chart_figure('combined_trends', (monthly_rentals, monthly_revenue), lambda: figures.dual_axis_lines(
+                monthly_rentals['month_year'],
+                ("Number of Rentals", monthly_rentals['count'], '#3B82F6'),
+                ("Revenue (MAD)", monthly_revenue['total_price'], '#10B981'),
+                title="Rentals and Revenue by Month",
+                x_title="Month"
+            ))
     
-    fig.add_trace(
-        go.Scatter(
-            x=monthly_revenue['month_year'], 
-            y=monthly_revenue['total_price'],
-            name="Revenue (MAD)",
-            mode='lines+markers',
-            line=dict(color='#10B981')
-        ),
-        secondary_y=True
-    )
-    
-    # Set titles
-    fig.update_layout(
-        title_text="Rentals and Revenue by Month",
-        template='plotly_white',
-        height=400
-    )
-    
-    # Set x-axis title
-    fig.update_xaxes(title_text="Month")
-    
-    # Set y-axes titles
-    fig.update_yaxes(title_text="Number of Rentals", secondary_y=False)
-    fig.update_yaxes(title_text="Revenue (MAD)", secondary_y=True)
-    
-    st.plotly_chart(fig, use_container_width=True)
+            plot_chart('combined_trends', fig)
+
+    if trend_tabs[3].open:
+        with trend_tabs[3]:
+            # Next month's forecast of every category and make, with its 95% band
+            st.caption("{} forecast for {} ({}), from complete months only.".format(
+                forecast['forecast_model'], forecast['forecast_month'], "all categories" if selected_category == "All" else selected_category
+            ))
+            st.dataframe(forecast['next_month'], use_container_width=True, hide_index=True)
+
+rental_trends_section()
 
 # Vehicle performance section
 st.markdown("<h2 class='sub-header'>🚙 Vehicle Performance</h2>", unsafe_allow_html=True)
 
+vehicle_performance = cached_section('vehicle_performance', sections.vehicle_performance)
+
 # Create two columns for this section
 col1, col2 = st.columns(2)
 
 with col1:
     # Vehicle category performance
-    category_perf = filtered_merged.groupby('vehicle_type').agg({
-        'rental_id': 'count',
-        'total_price': 'sum',
-        'customer_rating': 'mean'
-    }).reset_index()
-    
-    category_perf.columns = ['Category', 'Number of Rentals', 'Total Revenue', 'Avg Rating']
-    category_perf['Avg Rating'] = category_perf['Avg Rating'].round(1)
+    category_perf = vehicle_performance['category_perf']
     
-    fig_category = px.bar(
+    fig_category = chart_figure('category_performance', (category_perf,), lambda: figures.bar(
         category_perf,
         x='Category',
         y='Number of Rentals',
         color='Total Revenue',
         text='Number of Rentals',
         title='Rentals by Vehicle Category',
-        color_continuous_scale='Blues',
-        template='plotly_white'
-    )
-    fig_category.update_layout(height=400)
-    st.plotly_chart(fig_category, use_container_width=True)
+        color_scale='Blues'
+    ))
+    plot_chart('category_performance', fig_category)
 
 with col2:
     # Vehicle brand performance
-    brand_perf = filtered_merged.groupby('make').agg({
-        'rental_id': 'count',
-        'total_price': 'sum',
-        'customer_rating': 'mean'
-    }).reset_index()
-    
-    brand_perf.columns = ['Brand', 'Number of Rentals', 'Total Revenue', 'Avg Rating']
-    brand_perf['Avg Rating'] = brand_perf['Avg Rating'].round(1)
-    brand_perf = brand_perf.sort_values('Number of Rentals', ascending=False)
+    brand_perf = vehicle_performance['brand_perf']
     
-    fig_brand = px.bar(
-        brand_perf.head(10),
+    top_brands = brand_perf.head(10)
+    fig_brand = chart_figure('brand_performance', (top_brands,), lambda: figures.bar(
+        top_brands,
         x='Brand',
         y='Number of Rentals',
         color='Total Revenue',
         text='Number of Rentals',
         title='Top 10 Vehicle Brands by Rental Count',
-        color_continuous_scale='Greens',
-        template='plotly_white'
-    )
-    fig_brand.update_layout(height=400)
-    st.plotly_chart(fig_brand, use_container_width=True)
+        color_scale='Greens'
+    ))
+    plot_chart('brand_performance', fig_brand)
 
 # Vehicle status and condition visualizations
 col1, col2 = st.columns(2)
 
 with col1:
     # Vehicle status distribution
-    status_counts = filtered_vehicles['status'].value_counts().reset_index()
-    status_counts.columns = ['Status', 'Count']
+    status_counts = cached_section('fleet_status', sections.fleet_status)['status_counts']
     
-    fig_status = px.pie(
-        status_counts, 
-        values='Count', 
+    fig_status = chart_figure('fleet_status', (status_counts,), lambda: figures.pie(
+        status_counts,
+        values='Count',
         names='Status',
         title='Vehicle Status Distribution',
-        color_discrete_sequence=px.colors.qualitative.Pastel,
-        hole=0.4,
-        template='plotly_white'
-    )
-    fig_status.update_layout(height=400)
-    st.plotly_chart(fig_status, use_container_width=True)
+        colors=qualitative.Pastel,
+        hole=0.4
+    ))
+    plot_chart('fleet_status', fig_status)
 
 with col2:
     # Vehicle condition score distribution
     if 'condition_score' in filtered_vehicles.columns:
-        fig_condition = px.histogram(
-            filtered_vehicles,
+        condition_scores = filtered_vehicles[['condition_score']]
+        fig_condition = chart_figure('vehicle_condition', (condition_scores,), lambda: figures.histogram(
+            condition_scores,
             x='condition_score',
             nbins=10,
             title='Vehicle Condition Score Distribution',
-            color_discrete_sequence=['#3B82F6'],
-            template='plotly_white'
-        )
-        fig_condition.update_layout(height=400)
-        st.plotly_chart(fig_condition, use_container_width=True)
+            color='#3B82F6'
+        ))
+        plot_chart('vehicle_condition', fig_condition)
+
+# Fleet utilization section
+st.markdown("<h2 class='sub-header'>📅 Fleet Utilization</h2>", unsafe_allow_html=True)
+
+# Conflicts listed in the dashboard (check_conflicts.py exports them all)
+CONFLICT_DISPLAY_LIMIT = 1000
+
+@st.fragment
+def fleet_utilization_section():
+    # Day-by-day occupancy of the filtered fleet over the selected dates
+    utilization = cached_section('utilization', sections.utilization)
+    st.metric("Fleet Utilization", f"{utilization['fleet_utilization']:.1f}%")
+
+    utilization_tabs = st.tabs(["Cars Out per Day", "Occupancy Heatmap", "Utilization by Vehicle", "Conflicts"], key="utilization_tabs", on_change="rerun")
+
+    if utilization_tabs[0].open:
+        with utilization_tabs[0]:
+            daily_cars_out = utilization['daily_cars_out']
+            fig_cars_out = chart_figure('daily_cars_out', (daily_cars_out,), lambda: figures.line(
+                daily_cars_out,
+                x='Date',
+                y=['Cars Out', 'Fleet Size'],
+                title='Vehicles Rented Out per Day',
+                labels={'value': 'Vehicles', 'variable': ''}
+            ))
+            plot_chart('daily_cars_out', fig_cars_out)
+
+    if utilization_tabs[1].open:
+        with utilization_tabs[1]:
+            heatmap = utilization['heatmap']
+            weekly = utilization['heatmap_weekly']
+            fig_heatmap = chart_figure('utilization_heatmap', (heatmap, weekly), lambda: figures.heatmap(
+                heatmap,
+                title='Share of Each Week Rented Out' if weekly else 'Days Rented Out',
+                color_scale='Blues',
+                zmin=0,
+                zmax=1,
+                labels={'x': 'Week' if weekly else 'Date', 'y': 'Vehicle', 'color': 'Rented'},
+                height=max(400, min(1200, 12 * len(heatmap)))
+            ))
+            plot_chart('utilization_heatmap', fig_heatmap)
+
+    if utilization_tabs[2].open:
+        with utilization_tabs[2]:
+            with profiler.stage('render', 'vehicle_utilization'):
+                st.dataframe(utilization['vehicle_utilization'], use_container_width=True, hide_index=True)
+
+    if utilization_tabs[3].open:
+        with utilization_tabs[3]:
+            # Double bookings: rentals starting before an earlier rental of the
+            # same vehicle was returned (late returns included)
+            conflicts = cached_section('conflicts', sections.conflicts)['conflicts']
+            if conflicts.empty:
+                st.success("No overlapping rentals for the selected vehicles and dates.")
+            else:
+                st.warning(f"{len(conflicts):,} rentals overlap an earlier rental of the same vehicle.")
+                if len(conflicts) > CONFLICT_DISPLAY_LIMIT:
+                    st.caption(f"Showing the first {CONFLICT_DISPLAY_LIMIT:,}; run check_conflicts.py for the full list.")
+                with profiler.stage('render', 'conflicts'):
+                    st.dataframe(conflicts.head(CONFLICT_DISPLAY_LIMIT), use_container_width=True, hide_index=True)
+
+fleet_utilization_section()
 
 # Client insights section
 st.markdown("<h2 class='sub-header'>👥 Client Insights</h2>", unsafe_allow_html=True)
 
-# Create tabs for different client insights
-client_tabs = st.tabs(["Top Clients", "Return Delay Analysis", "Customer Ratings"])
+@st.fragment
+def client_insights_section():
+    # Create tabs for different client insights
+    client_tabs = st.tabs(["Top Clients", "Return Delay Analysis", "Customer Ratings", "Client Value (RFM)"], key="client_tabs", on_change="rerun")
 
-with client_tabs[0]:
-    # Top clients by rental frequency
-    top_clients = filtered_rentals['client_name'].value_counts().reset_index()
-    top_clients.columns = ['Client Name', 'Number of Rentals']
-    top_clients = top_clients.head(10)
+    if client_tabs[0].open:
+        with client_tabs[0]:
+            # Top clients by rental frequency
+            top_clients = cached_section('top_clients', sections.top_clients)['top_clients']
     
-    fig_top_clients = px.bar(
-        top_clients,
-        x='Client Name',
-        y='Number of Rentals',
-        title='Top 10 Clients by Rental Frequency',
-        color='Number of Rentals',
-        color_continuous_scale='Blues',
-        template='plotly_white'
-    )
-    fig_top_clients.update_layout(height=400)
-    st.plotly_chart(fig_top_clients, use_container_width=True)
-
-with client_tabs[1]:
-    st.markdown("### ⏱️ Return Delay Analysis")
-    # Return delay analysis
-    delay_counts = filtered_rentals['return_delay_days'].value_counts().reset_index()
-    delay_counts.columns = ['Delay Days', 'Count']
-    delay_counts = delay_counts.sort_values('Delay Days')
+            fig_top_clients = chart_figure('top_clients', (top_clients,), lambda: figures.bar(
+                top_clients,
+                x='Client Name',
+                y='Number of Rentals',
+                title='Top 10 Clients by Rental Frequency',
+                color='Number of Rentals',
+                color_scale='Blues'
+            ))
+            plot_chart('top_clients', fig_top_clients)
+
+    if client_tabs[1].open:
+        with client_tabs[1]:
+            st.markdown("### ⏱️ Return Delay Analysis")
+            # Return delay analysis
+            delays = cached_section('delays', sections.delays)
+            delay_counts = delays['delay_counts']
     
-    fig_delay = px.bar(
-        delay_counts,
-        x='Delay Days',
-        y='Count',
-        title='Return Delay Distribution',
-        color='Count',
-        color_continuous_scale='Reds',
-        template='plotly_white'
-    )
-    fig_delay.update_layout(height=400)
-    st.plotly_chart(fig_delay, use_container_width=True)
+            fig_delay = chart_figure('delay_distribution', (delay_counts,), lambda: figures.bar(
+                delay_counts,
+                x='Delay Days',
+                y='Count',
+                title='Return Delay Distribution',
+                color='Count',
+                color_scale='Reds'
+            ))
+            plot_chart('delay_distribution', fig_delay)
     
-    # Calculate average delay
-    avg_delay = filtered_rentals['return_delay_days'].mean()
-    st.info(f"Average Return Delay: {avg_delay:.2f} days")
-    # Total delayed rentals
-    delayed_rentals = filtered_rentals[filtered_rentals['return_delay_days'] > 0]
-    percent_delayed = (len(delayed_rentals) / len(filtered_rentals)) * 100 if len(filtered_rentals) > 0 else 0
-
-    # Show KPIs
-    col1, col2 = st.columns(2)
-    col1.metric("📦 Delayed Rentals", len(delayed_rentals))
-    col2.metric("📊 % of Delayed Rentals", f"{percent_delayed:.1f}%")
-
-    # Pie chart of delayed vs on-time
-    delay_pie = pd.DataFrame({
-        "Status": ["On Time", "Delayed"],
-        "Count": [
-            (filtered_rentals['return_delay_days'] == 0).sum(),
-            (filtered_rentals['return_delay_days'] > 0).sum()
-        ]
-    })
-
-    fig_pie = px.pie(
-        delay_pie,
-        names="Status",
-        values="Count",
-        title="Rental Return Timeliness",
-        color_discrete_sequence=["#10B981", "#EF4444"],
-        hole=0.4,
-        template='plotly_white'
-    )
-    fig_pie.update_layout(height=400)
-    st.plotly_chart(fig_pie, use_container_width=True)
-
-with client_tabs[2]:
-    # Customer ratings analysis
-    valid_ratings = filtered_rentals.dropna(subset=['customer_rating'])
-    rating_counts = valid_ratings['customer_rating'].value_counts().reset_index()
-    rating_counts.columns = ['Rating', 'Count']
-    rating_counts = rating_counts.sort_values('Rating')
+            # Calculate average delay
+            avg_delay = delays['avg_delay']
+            st.info(f"Average Return Delay: {avg_delay:.2f} days")
+            # Total delayed rentals
+            delayed_rentals = delays['delayed_rentals']
+            percent_delayed = delays['percent_delayed']
+
+            # Show KPIs
+            col1, col2 = st.columns(2)
+            col1.metric("📦 Delayed Rentals", delayed_rentals)
+            col2.metric("📊 % of Delayed Rentals", f"{percent_delayed:.1f}%")
+
+            # Pie chart of delayed vs on-time
+            delay_pie = delays['delay_pie']
+
+            fig_pie = chart_figure('delay_pie', (delay_pie,), lambda: figures.pie(
+                delay_pie,
+                names="Status",
+                values="Count",
+                title="Rental Return Timeliness",
+                colors=["#10B981", "#EF4444"],
+                hole=0.4
+            ))
+            plot_chart('delay_pie', fig_pie)
+
+    if client_tabs[2].open:
+        with client_tabs[2]:
+            # Customer ratings analysis
+            ratings = cached_section('ratings', sections.ratings)
+            rating_counts = ratings['rating_counts']
     
-    fig_ratings = px.bar(
-        rating_counts,
-        x='Rating',
-        y='Count',
-        title='Customer Rating Distribution',
-        color='Rating',
-        color_continuous_scale='YlGn',
-        template='plotly_white'
-    )
-    fig_ratings.update_layout(height=400)
-    st.plotly_chart(fig_ratings, use_container_width=True)
+            fig_ratings = chart_figure('ratings', (rating_counts,), lambda: figures.bar(
+                rating_counts,
+                x='Rating',
+                y='Count',
+                title='Customer Rating Distribution',
+                color='Rating',
+                color_scale='YlGn'
+            ))
+            plot_chart('ratings', fig_ratings)
     
-    # Calculate percentage of 4+ ratings
-    high_ratings = valid_ratings[valid_ratings['customer_rating'] >= 4]['customer_rating'].count()
-    rating_percentage = (high_ratings / len(valid_ratings)) * 100 if len(valid_ratings) > 0 else 0
-    st.info(f"Percentage of 4+ Star Ratings: {rating_percentage:.2f}%")
+            # Calculate percentage of 4+ ratings
+            rating_percentage = ratings['rating_percentage']
+            st.info(f"Percentage of 4+ Star Ratings: {rating_percentage:.2f}%")
+
+    if client_tabs[3].open:
+        with client_tabs[3]:
+            # Recency / frequency / monetary segmentation of the clients
+            client_value = cached_section('clients', sections.clients)
+            col1, col2 = st.columns(2)
+
+            with col1:
+                segments = client_value['segments']
+                fig_segments = chart_figure('client_segments', (segments,), lambda: figures.bar(
+                    segments,
+                    x='Segment',
+                    y='Clients',
+                    color='Revenue',
+                    text='Clients',
+                    title='Clients by RFM Segment',
+                    color_scale='Blues'
+                ))
+                plot_chart('client_segments', fig_segments)
+
+            with col2:
+                st.markdown("**Top 10 Clients by Lifetime Revenue**")
+                leaderboard = client_value['leaderboard'][['Client', 'Rentals', 'Lifetime Revenue', 'Avg Rating', 'Late Returns (%)', 'RFM Score', 'Segment']]
+                with profiler.stage('render', 'client_leaderboard'):
+                    st.dataframe(leaderboard, use_container_width=True, hide_index=True)
+
+client_insights_section()
 
 # Advanced analytics section
 st.markdown("<h2 class='sub-header'>🔍 Advanced Analytics</h2>", unsafe_allow_html=True)
 
 # Create two columns
 col1, col2 = st.columns(2)
-# 📌 Ensure clean data for Plotly chart
-# Remove rows with missing rental_days or total_price
-safe_data = filtered_rentals.dropna(subset=["rental_days", "total_price"])
-
-# Optional: Remove entries with 0 or negative rental days
-safe_data = safe_data[safe_data["rental_days"] > 0]
+# 📌 Ensure clean data for Plotly chart (binned above SCATTER_POINT_LIMIT rentals)
+duration_price = cached_section('duration_price', sections.duration_price)
+safe_data = duration_price['duration_price']
 
 
 with col1:
     # Rental duration vs. price relationship
-    fig_duration_price = px.scatter(
+    labels = {'rental_days': 'Rental Duration (days)', 'total_price': 'Total Price (MAD)', 'return_delay_days': 'Return Delay (days)'}
+    if duration_price['duration_price_binned']:
+        # Density view: one marker per (duration, price) cell, sized by rental count
+        # and coloured by the cell's mean return delay
+        labels['count'] = 'Rentals'
+        labels['return_delay_days'] = 'Mean Return Delay (days)'
+        size, hover_data = 'count', ['count']
+        title = 'Rental Duration vs. Price ({:,} rentals, binned)'.format(duration_price['duration_price_rentals'])
+    else:
+        size, hover_data = 'rental_days', []
+        title = 'Rental Duration vs. Price'
+    fig_duration_price = chart_figure('duration_price', (safe_data, title), lambda: figures.scatter(
         safe_data,
         x='rental_days',
         y='total_price',
         color='return_delay_days',
-        size='rental_days',
-        title='Rental Duration vs. Price',
-        labels={'rental_days': 'Rental Duration (days)', 'total_price': 'Total Price (MAD)', 'return_delay_days': 'Return Delay (days)'},
-        template='plotly_white'
-    )
-    fig_duration_price.update_layout(height=400)
-    st.plotly_chart(fig_duration_price, use_container_width=True)
+        size=size,
+        hover_data=hover_data,
+        title=title,
+        labels=labels
+    ))
+    plot_chart('duration_price', fig_duration_price)
 
 with col2:
     # Revenue by payment method
-    payment_revenue = filtered_rentals.groupby('payment_method').agg({
-        'total_price': 'sum',
-        'rental_id': 'count'
-    }).reset_index()
+    payment_revenue = cached_section('payments', sections.payments)['payment_revenue']
     
-    payment_revenue.columns = ['Payment Method', 'Total Revenue', 'Number of Rentals']
-    
-    fig_payment = px.pie(
+    fig_payment = chart_figure('payment_revenue', (payment_revenue,), lambda: figures.pie(
         payment_revenue,
         values='Total Revenue',
         names='Payment Method',
         title='Revenue by Payment Method',
-        hover_data=['Number of Rentals'],
-        template='plotly_white'
-    )
-    fig_payment.update_layout(height=400)
-    st.plotly_chart(fig_payment, use_container_width=True)
+        hover_data=['Number of Rentals']
+    ))
+    plot_chart('payment_revenue', fig_payment)
 
 # Vehicle details table
 st.markdown("<h2 class='sub-header'>🚗 Vehicle Fleet Details</h2>", unsafe_allow_html=True)
 
-# Create an expander for this section
-with st.expander("View Vehicle Fleet Details"):
-    # Prepare the data for display
-    display_cols = ['vehicle_id', 'make', 'model', 'year', 'vehicle_type', 'fuel_type', 'color', 'rental_price_per_day', 'status']
+@st.fragment
+def fleet_details_section():
+    # Create an expander for this section (the table is only built while it is open)
+    fleet_expander = st.expander("View Vehicle Fleet Details", key="fleet_expander", on_change="rerun")
+    if fleet_expander.open:
+        with fleet_expander:
+            # Prepare the data for display
+            display_cols = ['vehicle_id', 'make', 'model', 'year', 'vehicle_type', 'fuel_type', 'color', 'rental_price_per_day', 'status']
 
-    vehicle_table = filtered_vehicles[display_cols].copy()
+            vehicle_table = filtered_vehicles[display_cols].copy()
     
-    # Rename columns for better display
-    vehicle_table.columns = ['ID', 'Brand', 'Model', 'Year', 'Category', 'Daily Rate (MAD)', 'Status', 'Mileage', 'Condition Score']
+            # Rename columns for better display
+            vehicle_table.columns = ['ID', 'Brand', 'Model', 'Year', 'Category', 'Daily Rate (MAD)', 'Status', 'Mileage', 'Condition Score']
     
-    # Display the table
-    st.dataframe(vehicle_table, use_container_width=True)
+            # Display the table
+            with profiler.stage('render', 'vehicle_table') as record:
+                st.dataframe(vehicle_table, use_container_width=True)
+                record['rows_out'] = len(vehicle_table)
+
+fleet_details_section()
 
 # Recent rentals table
 st.markdown("<h2 class='sub-header'>📝 Recent Rentals</h2>", unsafe_allow_html=True)
 
-# Create an expander for this section
-with st.expander("View Recent Rentals"):
-    # Prepare the data for display
-    display_cols = ['rental_id', 'vehicle_id', 'client_name', 'start_date', 'end_date', 'rental_days', 'total_price', 'status', 'return_delay_days', 'customer_rating']
-    recent_rentals = filtered_rentals.sort_values('start_date', ascending=False).head(20)
-    rentals_table = recent_rentals[display_cols].copy()
+@st.fragment
+def recent_rentals_section():
+    # Create an expander for this section (the table is only built while it is open)
+    recent_expander = st.expander("View Recent Rentals", key="recent_expander", on_change="rerun")
+    if recent_expander.open:
+        with recent_expander:
+            # Prepare the data for display
+            display_cols = ['rental_id', 'vehicle_id', 'client_name', 'start_date', 'end_date', 'rental_days', 'total_price', 'status', 'return_delay_days', 'customer_rating']
+            rentals_table = sections.recent_rentals(20, display_cols)
     
-    # Rename columns for better display
-    rentals_table.columns = ['ID', 'Vehicle ID', 'Client', 'Start Date', 'End Date', 'Duration (days)', 'Price (MAD)', 'Status', 'Delay (days)', 'Rating']
+            # Rename columns for better display
+            rentals_table.columns = ['ID', 'Vehicle ID', 'Client', 'Start Date', 'End Date', 'Duration (days)', 'Price (MAD)', 'Status', 'Delay (days)', 'Rating']
     
-    # Format dates
-    rentals_table['Start Date'] = rentals_table['Start Date'].dt.strftime('%Y-%m-%d')
-    rentals_table['End Date'] = rentals_table['End Date'].dt.strftime('%Y-%m-%d')
+            # Format dates
+            rentals_table['Start Date'] = rentals_table['Start Date'].dt.strftime('%Y-%m-%d')
+            rentals_table['End Date'] = rentals_table['End Date'].dt.strftime('%Y-%m-%d')
     
-    # Display the table
-    st.dataframe(rentals_table, use_container_width=True)
+            # Display the table
+            with profiler.stage('render', 'recent_rentals_table') as record:
+                st.dataframe(rentals_table, use_container_width=True)
+                record['rows_out'] = len(rentals_table)
+
+recent_rentals_section()
+
+# Export section
+st.markdown("<h2 class='sub-header'>📤 Export</h2>", unsafe_allow_html=True)
+
+# Sections whose results make up the report bundle (heatmaps and the scatter
+# sample are chart data, not tables)
+REPORT_SECTIONS = ['kpis', 'trends', 'forecast', 'vehicle_performance', 'fleet_status', 'top_clients', 'clients', 'delays', 'ratings', 'payments', 'utilization', 'conflicts']
+
+def build_table_export(sections, table, file_format):
+    return export_table(sections.export_chunks(table, EXPORT_CHUNK_ROWS), file_format)
+
+def build_report(sections, view_key, file_format):
+    results = {
+        name: result_cache.get_or_compute(view_key + (name,), getattr(sections, name))
+        for name in REPORT_SECTIONS
+    }
+    return export_report(report_tables(results, skip=('heatmap',)), file_format)
+
+@st.fragment
+def export_section():
+    # Files are only generated when a download button is clicked: filtered rows
+    # are written chunk by chunk (see exports.py), the report from the cached
+    # section results
+    export_format = st.radio("Format", ["csv", "parquet", "xlsx"], horizontal=True, key="export_format")
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(
+        "Filtered rentals",
+        partial(build_table_export, sections, 'rentals', export_format),
+        file_name=f"rentals.{export_format}",
+        mime=MIME_TYPES[export_format],
+        on_click="ignore"
+    )
+    col2.download_button(
+        "Rentals with vehicle details",
+        partial(build_table_export, sections, 'merged', export_format),
+        file_name=f"rentals-vehicles.{export_format}",
+        mime=MIME_TYPES[export_format],
+        on_click="ignore"
+    )
+    report_extension = "xlsx" if export_format == "xlsx" else "zip"
+    col3.download_button(
+        "Report (all sections)",
+        partial(build_report, sections, view_key, export_format),
+        file_name=f"dashboard-report.{report_extension}",
+        mime=MIME_TYPES["xlsx"] if export_format == "xlsx" else "application/zip",
+        on_click="ignore"
+    )
+
+export_section()
+
+# Performance panel: where this run's time went, stage by stage
+if profiler.enabled:
+    get_metrics_exporter().export(profiler, data_version=data_version)
+    with st.sidebar.expander("Performance", expanded=False):
+        run_seconds = time.time() - profiler.started
+        st.caption("Run: {:.0f} ms".format(run_seconds * 1000))
+        stage_totals = profiler.totals()
+        st.dataframe(
+            (stage_totals * 1000).round(1).rename('ms').reset_index(),
+            hide_index=True, use_container_width=True
+        )
+        stage_records = profiler.frame()
+        stage_records['ms'] = (stage_records.pop('seconds') * 1000).round(1)
+        st.dataframe(stage_records, hide_index=True, use_container_width=True)
+        st.download_button(
+            "Download (JSON lines)",
+            stage_records.to_json(orient='records', lines=True),
+            file_name="dashboard-profile.jsonl"
+        )
+
+# Result cache counters
+cache_stats = result_cache.stats()
+st.sidebar.caption("Result cache: {hits} hits / {misses} misses ({entries} cached views)".format(**cache_stats))
+
+# Last background refresh of the data
+last_refresh = data_service.datasets.last_refresh
+if last_refresh is not None:
+    if 'error' in last_refresh:
+        st.sidebar.caption("Data reload failed, still showing version {}: {}".format(data_version, last_refresh['error']))
+    else:
+        st.sidebar.caption("Data version {version} loaded and warmed up ({warmed} views) in {seconds:.1f} s".format(**last_refresh))
 
 # Footer
 st.markdown("""
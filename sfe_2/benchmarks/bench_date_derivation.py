@@ -0,0 +1,63 @@
+# Micro-benchmark: row-wise vs vectorized date derivation
+#
+#   python benchmarks/bench_date_derivation.py            # 10^5 and 10^6 rentals
+#   python benchmarks/bench_date_derivation.py 50000      # custom sizes
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import derive_rental_columns  # noqa: E402
+
+DEFAULT_SIZES = [10 ** 5, 10 ** 6]
+
+
+def make_rentals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01') + rng.integers(0, 365, n).astype('timedelta64[D]')
+    return pd.DataFrame({
+        'rental_id': np.arange(1, n + 1),
+        'start_date': start.astype('datetime64[ns]'),
+        'rental_days': rng.integers(1, 15, n),
+    })
+
+
+# The derivation as load_data() used to do it
+def derive_row_wise(rentals_df):
+    rentals_df = rentals_df.copy()
+    rentals_df['start_date'] = pd.to_datetime(rentals_df['start_date'])
+    rentals_df['end_date'] = rentals_df.apply(lambda x: x['start_date'] + timedelta(days=x['rental_days']), axis=1)
+    rentals_df['rental_days'] = (pd.to_datetime(rentals_df['end_date']) - rentals_df['start_date']).dt.days
+    rentals_df['month'] = rentals_df['start_date'].dt.month_name()
+    rentals_df['year'] = rentals_df['start_date'].dt.year
+    rentals_df['month_year'] = rentals_df['start_date'].dt.strftime('%b %Y')
+    return rentals_df
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print("{:>10}  {:>12}  {:>12}  {:>8}".format("rentals", "row-wise (s)", "vector (s)", "speedup"))
+    for n in sizes:
+        rentals_df = make_rentals(n)
+        old_time, old = timed(derive_row_wise, rentals_df)
+        new_time, new = timed(derive_rental_columns, rentals_df)
+        # month / month_year are categorical now; compare their values
+        new = new.astype({column: str for column in new.select_dtypes('category').columns})
+        pd.testing.assert_frame_equal(
+            old[new.columns].reset_index(drop=True), new, check_dtype=False
+        )
+        print("{:>10}  {:>12.3f}  {:>12.3f}  {:>7.0f}x".format(n, old_time, new_time, old_time / new_time))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,83 @@
+# Memory footprint of the in-memory tables: denormalized frames with default
+# dtypes (as load_data() used to hold them) vs the compact schema + join key
+#
+#   python benchmarks/bench_memory.py            # 1M rentals
+#   python benchmarks/bench_memory.py 200000
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import build_frames  # noqa: E402
+from schema import memory_usage  # noqa: E402
+
+DEFAULT_SIZE = 10 ** 6
+
+
+def make_tables(n_rentals, n_vehicles=20, seed=0):
+    rng = np.random.default_rng(seed)
+    vehicle_ids = np.array(["VEH{:03d}".format(i) for i in range(1, n_vehicles + 1)], dtype=object)
+    vehicles_df = pd.DataFrame({
+        'vehicle_id': vehicle_ids,
+        'make': rng.choice(['Renault', 'Dacia', 'Peugeot', 'Ford', 'BMW'], n_vehicles),
+        'model': rng.choice(['Clio', 'Logan', '208', 'Focus', 'X1'], n_vehicles),
+        'year': rng.integers(2015, 2024, n_vehicles),
+        'vehicle_type': rng.choice(['Sedan', 'SUV', 'Hatchback', 'Truck'], n_vehicles),
+        'fuel_type': rng.choice(['Petrol', 'Diesel', 'Hybrid', 'Electric'], n_vehicles),
+        'color': rng.choice(['Red', 'White', 'Black', 'Blue'], n_vehicles),
+        'rental_price_per_day': rng.uniform(40, 300, n_vehicles).round(2),
+        'status': rng.choice(['Available', 'Rented', 'Under Maintenance'], n_vehicles),
+    })
+    start = np.datetime64('2023-01-01') + rng.integers(0, 365, n_rentals).astype('timedelta64[D]')
+    days = rng.integers(1, 15, n_rentals)
+    completed = rng.random(n_rentals) < 0.7
+    rentals_df = pd.DataFrame({
+        'rental_id': np.char.add('RENT', np.arange(1, n_rentals + 1).astype(str)).astype(object),
+        'vehicle_id': rng.choice(vehicle_ids, n_rentals),
+        'start_date': pd.to_datetime(start).strftime('%Y-%m-%d'),
+        'end_date': pd.to_datetime(start + days.astype('timedelta64[D]')).strftime('%Y-%m-%d'),
+        'total_price': rng.uniform(40, 4000, n_rentals).round(2),
+        'status': rng.choice(['Completed', 'Cancelled', 'Ongoing'], n_rentals),
+        'customer_rating': np.where(completed, rng.integers(10, 51, n_rentals) / 10, np.nan),
+        'client_name': rng.choice(['client{}'.format(i) for i in range(5000)], n_rentals),
+        'return_delay_days': np.where(completed, rng.integers(0, 11, n_rentals), np.nan),
+        'payment_method': rng.choice(['cash', 'credit card', 'debit card', 'online payment'], n_rentals),
+    })
+    return vehicles_df, rentals_df
+
+
+# The previous representation: default dtypes, string month labels, full merge
+def denormalized(vehicles_df, rentals_df):
+    rentals_df = rentals_df.copy()
+    rentals_df['start_date'] = pd.to_datetime(rentals_df['start_date'])
+    rentals_df['end_date'] = pd.to_datetime(rentals_df['end_date'])
+    rentals_df['rental_days'] = (rentals_df['end_date'] - rentals_df['start_date']).dt.days
+    rentals_df['month'] = rentals_df['start_date'].dt.month_name()
+    rentals_df['year'] = rentals_df['start_date'].dt.year
+    rentals_df['month_year'] = rentals_df['start_date'].dt.strftime('%b %Y')
+    merged_df = pd.merge(rentals_df, vehicles_df, on='vehicle_id', how='left')
+    return vehicles_df, rentals_df, merged_df
+
+
+def main(n):
+    vehicles_df, rentals_df = make_tables(n)
+
+    before = denormalized(vehicles_df, rentals_df)
+    after = build_frames(vehicles_df, rentals_df)
+
+    mb = 1024 * 1024
+    before_sizes = [memory_usage(df) for df in before]
+    after_sizes = [memory_usage(after[0]), memory_usage(after[1]), after[2].nbytes]
+
+    print("{} rentals, {} vehicles\n".format(n, len(vehicles_df)))
+    print("{:<12} {:>12} {:>12}".format("table", "before (MB)", "after (MB)"))
+    for name, old, new in zip(["vehicles", "rentals", "merged/join"], before_sizes, after_sizes):
+        print("{:<12} {:>12.1f} {:>12.1f}".format(name, old / mb, new / mb))
+    print("{:<12} {:>12.1f} {:>12.1f}".format("total", sum(before_sizes) / mb, sum(after_sizes) / mb))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE)
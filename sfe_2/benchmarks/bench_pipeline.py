@@ -0,0 +1,238 @@
+# Scaling benchmark of the dashboard's data pipeline, stage by stage, on
+# generated datasets (see generate_data.py). For each size it reports the wall
+# time (best of --repeat runs) and the peak traced memory of:
+#
+#   read          load_table() of both tables from xlsx workbooks without snapshots:
+#                 workbook parsing plus the Parquet snapshot writes (first load)
+#   read_snapshot load_table() of the same workbooks through their current
+#                 snapshots (every later load of unchanged workbooks)
+#   read_parquet  load_table() of both tables from Parquet files
+#   build         build_frames(): cleaning, derived columns, compact schema, join key
+#   dataset       SharedDataset(): filter index, rollup cube and daily KPI prefix sums
+#   filter        dataset.select() for the FILTER_CASES sidebar combinations
+#   kpis          compute_kpis() for each of those selections
+#   aggregations  per-section chart aggregates for each of those selections
+#
+#   python benchmarks/bench_pipeline.py                              # 1k, 100k, 1M rentals
+#   python benchmarks/bench_pipeline.py --sizes 1000 100000
+#   python benchmarks/bench_pipeline.py --save-baseline baseline.json
+#   python benchmarks/bench_pipeline.py --baseline baseline.json     # exit 1 on regression
+#
+# A stage regresses when its time exceeds the baseline by more than
+# --tolerance (default 1.5x) or its peak memory by more than --memory-tolerance
+# (default 1.25x). Baselines are machine-specific: record them on the machine
+# that checks them. Peak memory is measured with tracemalloc, which sees
+# NumPy/pandas buffers but not Arrow-backed string storage. The workbook stages
+# only run up to --xlsx-max rentals: larger workbooks take minutes to write and
+# parse.
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Snapshots of the benchmark's workbooks stay out of the dashboard's own (set
+# before the imports, and inherited by the workers parsing the workbooks)
+os.environ['DASHBOARD_SNAPSHOT_DIR'] = tempfile.mkdtemp(prefix='bench_pipeline_snapshots_')
+
+from aggregates import (  # noqa: E402
+    compute_delays, compute_duration_price, compute_fleet_status, compute_kpis,
+    compute_payments, compute_ratings, compute_top_clients, compute_trends,
+    compute_vehicle_performance
+)
+import snapshot  # noqa: E402
+from dataset import SharedDataset  # noqa: E402
+from exports import write_table  # noqa: E402
+from generate_data import client_pool, generate_rentals, generate_vehicles  # noqa: E402
+from pipeline import build_frames  # noqa: E402
+from sources import load_table  # noqa: E402
+
+DEFAULT_SIZES = [10 ** 3, 10 ** 5, 10 ** 6]
+STAGES = ['read', 'read_snapshot', 'read_parquet', 'build', 'dataset', 'filter', 'kpis', 'aggregations']
+XLSX_STAGES = ['read', 'read_snapshot']
+XLSX_MAX_RENTALS = 10 ** 5
+
+# (date_range, category, status, brand) as picked in the sidebar
+FILTER_CASES = [
+    (None, 'All', 'All', 'All'),
+    ((date(2023, 1, 1), date(2023, 12, 31)), 'All', 'All', 'All'),
+    ((date(2023, 3, 15), date(2023, 8, 20)), 'SUV', 'All', 'All'),
+    ((date(2023, 2, 1), date(2023, 2, 28)), 'All', 'Available', 'Renault'),
+]
+
+
+def make_dataset(n_rentals, n_vehicles=200, n_clients=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    vehicles_df = generate_vehicles(n_vehicles, rng)
+    rentals_df = generate_rentals(1, n_rentals, vehicles_df, client_pool(n_clients), len(str(n_rentals)), rng)
+    return vehicles_df, rentals_df
+
+
+# Both tables written as vehicles.<format> / rentals.<format> into data_dir
+def write_sources(data_dir, vehicles_df, rentals_df, file_format):
+    for name, df in (('vehicles', vehicles_df), ('rentals', rentals_df)):
+        write_table(os.path.join(data_dir, '{}.{}'.format(name, file_format)), None, [df], file_format)
+
+
+def read_sources(data_dir, file_format):
+    return [load_table('{}*.{}'.format(name, file_format), data_dir) for name in ('vehicles', 'rentals')]
+
+
+def read_workbooks_cold(data_dir):
+    shutil.rmtree(snapshot.SNAPSHOT_DIR, ignore_errors=True)
+    return read_sources(data_dir, 'xlsx')
+
+
+def _filter_arguments(case):
+    date_range, category, status, brand = case
+    return date_range, None if category == 'All' else category, None if brand == 'All' else brand
+
+
+def run_filter(dataset):
+    return [dataset.select(*case) for case in FILTER_CASES]
+
+
+def run_kpis(views):
+    return [compute_kpis(view.vehicles, view.rentals) for view in views]
+
+
+def run_aggregations(dataset, views):
+    results = []
+    for case, view in zip(FILTER_CASES, views):
+        date_range, category, brand = _filter_arguments(case)
+        cube = dataset.rollup_cube
+        results.append([
+            compute_trends(cube, date_range, category),
+            compute_vehicle_performance(cube, date_range, category, brand),
+            compute_fleet_status(view.vehicles),
+            compute_top_clients(view.rentals),
+            compute_delays(view.rentals),
+            compute_ratings(view.rentals),
+            compute_payments(cube, date_range, category),
+            compute_duration_price(view.frame('rentals', ['rental_days', 'total_price', 'return_delay_days'])),
+        ])
+    return results
+
+
+# Stage callables for one generated dataset, whose source files are in
+# data_dir; each stage consumes the output of the previous ones, which are
+# computed once up front
+def _stages(vehicles_df, rentals_df, data_dir):
+    frames = build_frames(vehicles_df, rentals_df)
+    dataset = SharedDataset(*frames)
+    # Filtered views cache their gathered rows: KPIs and aggregations get fresh ones
+    return {
+        'read': lambda: read_workbooks_cold(data_dir),
+        'read_snapshot': lambda: read_sources(data_dir, 'xlsx'),
+        'read_parquet': lambda: read_sources(data_dir, 'parquet'),
+        'build': lambda: build_frames(vehicles_df, rentals_df),
+        'dataset': lambda: SharedDataset(*frames),
+        'filter': lambda: [(view.vehicles, view.rentals) for view in run_filter(dataset)],
+        'kpis': lambda: run_kpis(run_filter(dataset)),
+        'aggregations': lambda: run_aggregations(dataset, run_filter(dataset)),
+    }
+
+
+def _best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(n_rentals, repeat, xlsx_max=XLSX_MAX_RENTALS):
+    vehicles_df, rentals_df = make_dataset(n_rentals)
+    with_xlsx = n_rentals <= xlsx_max
+    names = [stage for stage in STAGES if with_xlsx or stage not in XLSX_STAGES]
+    data_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        write_sources(data_dir, vehicles_df, rentals_df, 'parquet')
+        if with_xlsx:
+            write_sources(data_dir, vehicles_df, rentals_df, 'xlsx')
+        stages = _stages(vehicles_df, rentals_df, data_dir)
+        # In STAGES order: 'read' leaves current snapshots for 'read_snapshot'
+        return {
+            stage: {'seconds': _best_time(stages[stage], repeat), 'peak_bytes': _peak_memory(stages[stage])}
+            for stage in names
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        shutil.rmtree(snapshot.SNAPSHOT_DIR, ignore_errors=True)
+
+
+def check_regressions(results, baseline, tolerance, memory_tolerance):
+    failures = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if reference is None:
+                continue
+            if result['seconds'] > reference['seconds'] * tolerance:
+                failures.append("{} rentals / {}: {:.4f}s vs baseline {:.4f}s".format(
+                    size, stage, result['seconds'], reference['seconds']))
+            if result['peak_bytes'] > reference['peak_bytes'] * memory_tolerance:
+                failures.append("{} rentals / {}: {:.1f} MB vs baseline {:.1f} MB".format(
+                    size, stage, result['peak_bytes'] / 2 ** 20, reference['peak_bytes'] / 2 ** 20))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline stages.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="numbers of rentals")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--xlsx-max', type=int, default=XLSX_MAX_RENTALS,
+                        help="largest number of rentals for the workbook read stages")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--save-baseline', help="write the results as a baseline JSON file")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="allowed time ratio vs the baseline")
+    parser.add_argument('--memory-tolerance', type=float, default=1.25, help="allowed peak memory ratio vs the baseline")
+    args = parser.parse_args()
+
+    print("{:>10} {:<14} {:>12} {:>12}".format("rentals", "stage", "time (ms)", "peak (MB)"))
+    results = {}
+    for n in args.sizes:
+        results[str(n)] = measure(n, args.repeat, args.xlsx_max)
+        for stage, result in results[str(n)].items():
+            print("{:>10} {:<14} {:>12.1f} {:>12.1f}".format(
+                n, stage, result['seconds'] * 1000, result['peak_bytes'] / 2 ** 20))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print("\nBaseline written to {}".format(args.save_baseline))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.tolerance, args.memory_tolerance)
+        if failures:
+            print("\nRegressions against {}:".format(args.baseline))
+            for failure in failures:
+                print("  " + failure)
+            sys.exit(1)
+        print("\nNo regression against {}".format(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
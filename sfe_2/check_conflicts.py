@@ -0,0 +1,49 @@
+import argparse
+import sys
+import time
+
+from conflicts import RentalConflicts
+from pipeline import clean_rentals
+from sources import DATA_DIR, RENTALS_GLOB, load_table
+
+# Batch double-booking check of the rental history, e.g. after each data refresh.
+#
+#   python check_conflicts.py                                     # DASHBOARD_DATA_DIR, rentals*.xlsx
+#   python check_conflicts.py --data-dir data --rentals "rentals*.parquet"
+#   python check_conflicts.py --output conflicts.csv
+#
+# Exits with status 1 when conflicts are found (0 with --no-fail).
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find rentals that overlap another rental of the same vehicle.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="directory of the rental files")
+    parser.add_argument('--rentals', default=RENTALS_GLOB, help="glob of the rental files")
+    parser.add_argument('--output', help="write every conflict to this CSV file")
+    parser.add_argument('--show', type=int, default=10, help="conflicts to print")
+    parser.add_argument('--no-fail', action='store_true', help="exit with status 0 even if conflicts are found")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rentals_df = clean_rentals(load_table(args.rentals, args.data_dir))
+    loaded = time.perf_counter()
+    conflicts = RentalConflicts(rentals_df)
+    checked = time.perf_counter()
+
+    print("{:,} rentals loaded in {:.2f}s, checked in {:.2f}s: {:,} conflicting rentals".format(
+        len(rentals_df), loaded - start, checked - loaded, len(conflicts)))
+    if not len(conflicts):
+        return
+
+    conflicts_df = conflicts.frame()
+    if args.show:
+        print(conflicts_df.head(args.show).to_string(index=False))
+    if args.output:
+        conflicts_df.to_csv(args.output, index=False)
+        print("Conflicts written to {}".format(args.output))
+    if not args.no_fail:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
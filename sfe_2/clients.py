@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from filters import day_numbers
+
+LEADERBOARD_SIZE = 10
+
+# Day number of undated rentals (see filters.day_numbers)
+MISSING_DAY = np.iinfo(np.int32).min
+
+# RFM segments from the recency (R) and frequency (F) scores, first match wins
+SEGMENT_RULES = [
+    ('Champions', lambda r, f: (r >= 4) & (f >= 4)),
+    ('Loyal', lambda r, f: (r >= 3) & (f >= 3)),
+    ('Promising', lambda r, f: (r >= 4) & (f <= 2)),
+    ('At Risk', lambda r, f: (r <= 2) & (f >= 3)),
+    ('Lost', lambda r, f: (r <= 2) & (f <= 2)),
+]
+DEFAULT_SEGMENT = 'Needs Attention'
+
+CLIENT_COLUMNS = [
+    'Client', 'Rentals', 'Lifetime Revenue', 'Avg Revenue', 'First Rental', 'Last Rental',
+    'Recency (days)', 'Avg Rating', 'Late Returns (%)', 'R', 'F', 'M', 'RFM Score', 'Segment',
+]
+
+
+# Positions of the k largest values, largest first: a partial selection
+# (argpartition, O(n)) and a sort of those k only
+def top_k(values, k):
+    values = np.asarray(values)
+    if k >= len(values):
+        return np.argsort(-values, kind='stable')
+    candidates = np.argpartition(-values, k - 1)[:k]
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+
+# RFM score (1-5) of each client: the quintile of its rank, ties sharing a
+# score, missing values at the bottom
+def _quintile_scores(values):
+    if not len(values):
+        return np.zeros(0, dtype=np.int8)
+    percentiles = pd.Series(values).rank(method='average', pct=True, na_option='bottom').to_numpy()
+    return np.ceil(percentiles * 5).clip(1, 5).astype(np.int8)
+
+
+# Per-client metrics, RFM scores, segments and the revenue leaderboard from
+# per-client totals (one entry per client). Shared by both backends: the
+# in-memory one computes the totals with ClientIndex, SQLite with a GROUP BY.
+def client_analytics(names, rentals, revenue, rating_sum, rating_count, late, first_day, last_day, as_of_day):
+    rentals = np.asarray(rentals, dtype=np.int64)
+    revenue = np.asarray(revenue, dtype='float64')
+    rating_count = np.asarray(rating_count, dtype=np.int64)
+    first_day = np.asarray(first_day, dtype=np.int64)
+    last_day = np.asarray(last_day, dtype=np.int64)
+    # Clients whose rentals are all undated have no dates nor recency
+    undated = last_day == MISSING_DAY
+    recency = np.where(undated, np.nan, as_of_day - last_day)
+
+    def dates(days):
+        return pd.to_datetime(np.where(undated, np.datetime64('NaT', 'D'), days.astype('datetime64[D]')))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_rating = np.where(rating_count > 0, np.asarray(rating_sum, dtype='float64') / rating_count, np.nan)
+        avg_revenue = np.where(rentals > 0, revenue / rentals, np.nan)
+        late_rate = np.where(rentals > 0, np.asarray(late, dtype='float64') / rentals * 100, np.nan)
+
+    # Recent clients score high on recency: rank the negated days since
+    r_score = _quintile_scores(-recency)
+    f_score = _quintile_scores(rentals)
+    m_score = _quintile_scores(revenue)
+    segment = np.select(
+        [rule(r_score, f_score) for _, rule in SEGMENT_RULES],
+        [name for name, _ in SEGMENT_RULES],
+        default=DEFAULT_SEGMENT,
+    )
+
+    clients = pd.DataFrame({
+        'Client': np.asarray(names, dtype=object),
+        'Rentals': rentals,
+        'Lifetime Revenue': revenue.round(2),
+        'Avg Revenue': avg_revenue.round(2),
+        'First Rental': dates(first_day),
+        'Last Rental': dates(last_day),
+        'Recency (days)': recency,
+        'Avg Rating': avg_rating.round(2),
+        'Late Returns (%)': late_rate.round(1),
+        'R': r_score,
+        'F': f_score,
+        'M': m_score,
+        'RFM Score': pd.Series(r_score, dtype=str) + pd.Series(f_score, dtype=str) + pd.Series(m_score, dtype=str),
+        'Segment': segment,
+    }, columns=CLIENT_COLUMNS)
+
+    segments = (
+        clients.groupby('Segment', sort=False)
+        .agg(**{'Clients': ('Client', 'size'), 'Revenue': ('Lifetime Revenue', 'sum')})
+        .reset_index()
+        .sort_values('Revenue', ascending=False, kind='stable', ignore_index=True)
+    )
+    return {
+        'clients': clients,
+        'segments': segments,
+        'leaderboard': clients.iloc[top_k(revenue, LEADERBOARD_SIZE)].reset_index(drop=True),
+    }
+
+
+# Rentals grouped by client once per dataset: rows sorted by integer client
+# code, so any filtered subset is still grouped after a boolean gather (O(n),
+# no new sort), and every per-client total comes from one segmented
+# reduction (np.add.reduceat) over the group boundaries.
+class ClientIndex:
+    def __init__(self, rentals_df):
+        names = rentals_df['client_name']
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            codes, self.names = names.cat.codes.to_numpy(), names.cat.categories.to_numpy(dtype=object)
+        else:
+            codes, self.names = pd.factorize(names)
+            self.names = np.asarray(self.names, dtype=object)
+        # Rentals without a client name are left out
+        order = np.flatnonzero(codes >= 0)
+        self.order = order[np.argsort(codes[order], kind='stable')]
+        self.codes = codes
+
+        self.start_days = day_numbers(rentals_df['start_date']).astype(np.int64)
+        ratings = rentals_df['customer_rating'].to_numpy(dtype='float64', na_value=np.nan)
+        delays = rentals_df['return_delay_days'].to_numpy(dtype='float64', na_value=np.nan)
+        rated = ~np.isnan(ratings)
+        # Columns summed per client in a single reduceat: revenue, rating sum,
+        # rated rentals, late returns
+        self.summed = np.column_stack([
+            np.nan_to_num(rentals_df['total_price'].to_numpy(dtype='float64', na_value=np.nan)),
+            np.where(rated, ratings, 0.0),
+            rated,
+            delays > 0,
+        ])
+
+    # Client analytics of the rentals at `rows` (positions; all rentals when None)
+    def compute(self, rows=None, as_of_day=None):
+        order = self.order
+        if rows is not None:
+            selected = np.zeros(len(self.codes), dtype=bool)
+            selected[rows] = True
+            order = order[selected[order]]
+
+        codes = self.codes[order]
+        start_days = self.start_days[order]
+        undated = start_days == MISSING_DAY
+        if not len(order):
+            boundaries = np.zeros(0, dtype=np.intp)
+            summed = np.zeros((0, self.summed.shape[1]))
+            first_day = last_day = np.zeros(0, dtype=np.int64)
+        else:
+            boundaries = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            summed = np.add.reduceat(self.summed[order], boundaries, axis=0)
+            # Undated rentals sort last for the minimum, first for the maximum
+            first_day = np.minimum.reduceat(np.where(undated, np.iinfo(np.int64).max, start_days), boundaries)
+            last_day = np.maximum.reduceat(start_days, boundaries)
+            first_day[last_day == MISSING_DAY] = MISSING_DAY
+        if as_of_day is None:
+            as_of_day = last_day.max() if len(last_day) else 0
+
+        return client_analytics(
+            self.names[codes[boundaries]],
+            np.diff(np.append(boundaries, len(order))),
+            summed[:, 0], summed[:, 1], summed[:, 2], summed[:, 3],
+            first_day, last_day, as_of_day,
+        )
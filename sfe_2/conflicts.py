@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from utilization import rental_intervals
+
+CONFLICT_COLUMNS = [
+    'Vehicle', 'Rental', 'Start', 'Returned', 'Conflicts With', 'Other Start', 'Other Returned', 'Overlap (days)'
+]
+
+
+# Double bookings: rentals that start before an earlier rental of the same
+# vehicle is back (late returns included, see utilization.rental_intervals).
+# Intervals are sorted by (vehicle, start) once; a running maximum of the end
+# days, keyed by vehicle so it never carries over from one vehicle to the
+# next, then tells which rentals start before an earlier one has ended.
+# O(n log n) for the sort, the rest is linear.
+# Returns the row of every conflicting rental, with the earlier rental it
+# overlaps the longest (the one returned last).
+def overlapping_pairs(vehicle_codes, start_days, end_days):
+    active = np.flatnonzero((vehicle_codes >= 0) & (end_days > start_days))
+    order = active[np.lexsort((start_days[active], vehicle_codes[active]))]
+    if len(order) < 2:
+        return order[:0], order[:0]
+
+    first_day = start_days[order].min()
+    span = end_days[order].max() - first_day + 1
+    vehicle_offset = vehicle_codes[order].astype(np.int64) * span
+    keyed_start = vehicle_offset + (start_days[order] - first_day)
+    keyed_end = vehicle_offset + (end_days[order] - first_day)
+
+    latest_end = np.maximum.accumulate(keyed_end)
+    latest_holder = np.maximum.accumulate(np.where(keyed_end == latest_end, np.arange(len(order)), 0))
+    conflicting = np.flatnonzero(keyed_start[1:] < latest_end[:-1]) + 1
+    return order[conflicting], order[latest_holder[conflicting - 1]]
+
+
+# Conflicts of a set of rentals (rental_id, vehicle_id, start_date, end_date,
+# return_delay_days and status columns), detected once
+class RentalConflicts:
+    def __init__(self, rentals_df):
+        self.rentals = rentals_df
+        start_days, end_days = rental_intervals(
+            rentals_df['start_date'], rentals_df['end_date'],
+            rentals_df['return_delay_days'], rentals_df['status']
+        )
+        vehicle_codes = pd.factorize(rentals_df['vehicle_id'])[0]
+        self.rows, self.others = overlapping_pairs(vehicle_codes, start_days, end_days)
+        self.start_days, self.end_days = start_days, end_days
+        # Days both rentals had the vehicle: [start of the later one, first return)
+        self.overlap_start = start_days[self.rows]
+        self.overlap_end = np.minimum(end_days[self.rows], end_days[self.others])
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Conflicts whose overlap falls (at least partly) in a date range
+    def in_range(self, date_range=None):
+        if date_range is None:
+            return np.ones(len(self.rows), dtype=bool)
+        first_day, last_day = (np.datetime64(d, 'D').astype(np.int64) for d in date_range)
+        return (self.overlap_start <= last_day) & (self.overlap_end > first_day)
+
+    def frame(self, keep=None):
+        rows, others = self.rows, self.others
+        overlap_days = self.overlap_end - self.overlap_start
+        if keep is not None:
+            rows, others, overlap_days = rows[keep], others[keep], overlap_days[keep]
+
+        def dates(days):
+            return pd.to_datetime(days.astype('datetime64[D]'))
+
+        rental_ids = self.rentals['rental_id'].to_numpy()
+        conflicts = pd.DataFrame({
+            'Vehicle': self.rentals['vehicle_id'].to_numpy()[rows],
+            'Rental': rental_ids[rows],
+            'Start': dates(self.start_days[rows]),
+            'Returned': dates(self.end_days[rows]),
+            'Conflicts With': rental_ids[others],
+            'Other Start': dates(self.start_days[others]),
+            'Other Returned': dates(self.end_days[others]),
+            'Overlap (days)': overlap_days,
+        }, columns=CONFLICT_COLUMNS)
+        return conflicts.sort_values(['Vehicle', 'Start'], kind='stable', ignore_index=True)
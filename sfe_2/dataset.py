@@ -0,0 +1,217 @@
+from functools import cached_property
+
+import numpy as np
+
+from aggregates import (
+    compute_delays, compute_duration_price, compute_fleet_status, compute_kpis,
+    compute_payments, compute_ratings, compute_top_clients, compute_trends,
+    compute_vehicle_performance
+)
+from clients import ClientIndex
+from conflicts import RentalConflicts
+from filters import ALL, FilterIndex
+from forecast import DemandForecaster, compute_forecast
+from kpi_engine import DailyKpis, compute_period_kpis
+from pipeline import join_vehicles
+from rollup import RollupCube
+from utilization import UtilizationIntervals
+
+
+# Read-only dataset shared by every session of the process (held through
+# st.cache_resource). Derived columns, the filter index and the rollup cube are
+# all built once per data load; sessions only hold row positions into it.
+# The frames must never be modified in place.
+class SharedDataset:
+    def __init__(self, vehicles_df, rentals_df, vehicle_pos, version=None, forecaster=None):
+        self.version = version
+        # Shared with the other versions' datasets, to refit incrementally
+        self.forecaster = forecaster if forecaster is not None else DemandForecaster()
+        self.vehicles = vehicles_df
+        self.rentals = rentals_df
+        # Position of each rental's vehicle in `vehicles` (the join key)
+        self.vehicle_pos = vehicle_pos
+
+        self.filter_index = FilterIndex(vehicles_df, rentals_df, vehicle_pos)
+        self.rollup_cube = RollupCube(vehicles_df, rentals_df, vehicle_pos)
+        self.daily_kpis = DailyKpis.from_rentals(vehicles_df, rentals_df, vehicle_pos)
+
+        self.rental_count = len(rentals_df)
+        start_dates = rentals_df['start_date']
+        self.min_date = start_dates.min().date()
+        self.max_date = start_dates.max().date()
+
+    # Rentals with their vehicle attributes, only joined when someone asks for it
+    @cached_property
+    def merged(self):
+        return join_vehicles(self.rentals, self.vehicles, self.vehicle_pos)
+
+    # Occupancy interval of every rental, built on first use of the utilization section
+    @cached_property
+    def utilization_intervals(self):
+        return UtilizationIntervals(self.rentals, self.vehicle_pos)
+
+    # Rentals grouped by client, sorted once on first use of the client analytics
+    @cached_property
+    def client_index(self):
+        return ClientIndex(self.rentals)
+
+    # Double bookings of the whole history, detected on first use
+    @cached_property
+    def rental_conflicts(self):
+        return RentalConflicts(self.rentals)
+
+    # Demand forecasts fitted on the monthly rollup cells, on first use
+    @cached_property
+    def demand_forecast(self):
+        return self.forecaster.fit(self.rollup_cube.cells, self.max_date)
+
+    def select(self, date_range=None, category=ALL, status=ALL, brand=ALL):
+        return FilteredView(self, self.filter_index.select(date_range, category, status, brand))
+
+    # Per-section chart data for the sidebar filters (see FrameSections)
+    def sections(self, date_range=None, category=ALL, status=ALL, brand=ALL):
+        return FrameSections(self, date_range, category, status, brand)
+
+
+# A filtered view is just index arrays over the shared frames. Rows are only
+# gathered when a consumer actually needs them, and then only the requested columns.
+class FilteredView:
+    def __init__(self, dataset, selection):
+        self.dataset = dataset
+        self.selection = selection
+
+    def __len__(self):
+        return len(self.selection.rentals)
+
+    def frame(self, table, columns=None):
+        df = getattr(self.dataset, table)
+        positions = getattr(self.selection, table)
+        if columns is not None:
+            df = df[columns]
+        return df.iloc[positions]
+
+    def column(self, table, name):
+        positions = getattr(self.selection, table)
+        return getattr(self.dataset, table)[name].to_numpy()[positions]
+
+    # The rows of a table (original order) as frames of at most chunk_size
+    # rows; at least one, possibly empty, so consumers always get the columns.
+    # Merged rows are joined chunk by chunk rather than taken from the full
+    # merged frame.
+    def iter_frames(self, table, chunk_size, columns=None):
+        positions = getattr(self.selection, table)
+        source = self.dataset.rentals if table == 'merged' else getattr(self.dataset, table)
+        for start in range(0, max(len(positions), 1), chunk_size):
+            chunk = positions[start:start + chunk_size]
+            df = source.iloc[chunk]
+            if table == 'merged':
+                df = join_vehicles(df, self.dataset.vehicles, self.dataset.vehicle_pos[chunk])
+            yield df if columns is None else df[columns]
+
+    # The n most recent rows by start date (newest first)
+    def latest(self, table, n, columns=None):
+        positions = getattr(self.selection, table)
+        start_dates = self.column(table, 'start_date')
+        newest = positions[np.argsort(start_dates, kind='stable')[::-1][:n]]
+        df = getattr(self.dataset, table)
+        if columns is not None:
+            df = df[columns]
+        return df.iloc[newest]
+
+    # Full filtered frames, materialized on first access only
+    @cached_property
+    def vehicles(self):
+        return self.frame('vehicles')
+
+    @cached_property
+    def rentals(self):
+        return self.frame('rentals')
+
+    @cached_property
+    def merged(self):
+        return self.frame('merged')
+
+
+# Chart data of each dashboard section for one set of sidebar filters, from
+# the in-memory dataset: rollup cube for trends, performance and payments,
+# filtered views for the rest. sql_store.SqlSections has the same methods.
+class FrameSections:
+    def __init__(self, dataset, date_range=None, category=ALL, status=ALL, brand=ALL):
+        self.dataset = dataset
+        self.view = dataset.select(date_range, category, status, brand)
+        self.date_range = date_range
+        self.category, self.brand = (None if v == ALL else v for v in (category, brand))
+
+    def __len__(self):
+        return len(self.view)
+
+    def fleet(self):
+        return self.view.vehicles
+
+    def recent_rentals(self, n, columns):
+        return self.view.latest('rentals', n, columns)
+
+    # Filtered 'rentals' or 'merged' rows for export, in chunks
+    def export_chunks(self, table, chunk_size):
+        return self.view.iter_frames(table, chunk_size)
+
+    def kpis(self):
+        return compute_kpis(self.view.vehicles, self.view.rentals)
+
+    # Period-over-period and rolling-window KPIs from the daily prefix sums
+    def period_kpis(self):
+        return compute_period_kpis(
+            self.dataset.daily_kpis, self.date_range, self.category, span=(self.dataset.min_date, self.dataset.max_date)
+        )
+
+    def trends(self):
+        return compute_trends(self.dataset.rollup_cube, self.date_range, self.category)
+
+    # Next months' demand of the category (or the whole fleet), whatever the dates
+    def forecast(self):
+        return compute_forecast(self.dataset.demand_forecast, self.category)
+
+    def vehicle_performance(self):
+        return compute_vehicle_performance(self.dataset.rollup_cube, self.date_range, self.category, self.brand)
+
+    def fleet_status(self):
+        return compute_fleet_status(self.view.vehicles)
+
+    def top_clients(self):
+        return compute_top_clients(self.view.rentals)
+
+    # Per-client RFM metrics of the filtered rentals, recency counted at the
+    # end of the date range (or the latest rental)
+    def clients(self):
+        as_of = self.date_range[1] if self.date_range is not None else self.dataset.max_date
+        return self.dataset.client_index.compute(self.view.selection.rentals, np.datetime64(as_of, 'D').astype(np.int64))
+
+    def delays(self):
+        return compute_delays(self.view.rentals)
+
+    def ratings(self):
+        return compute_ratings(self.view.rentals)
+
+    def payments(self):
+        return compute_payments(self.dataset.rollup_cube, self.date_range, self.category)
+
+    def duration_price(self):
+        return compute_duration_price(self.view.frame('rentals', ['rental_days', 'total_price', 'return_delay_days']))
+
+    # Occupancy of the filtered fleet over the date range (all rentals of those
+    # vehicles that overlap it, whatever their start date)
+    def utilization(self):
+        positions = self.view.selection.vehicles
+        vehicle_ids = self.dataset.vehicles['vehicle_id'].to_numpy()[positions]
+        return self.dataset.utilization_intervals.compute(
+            vehicle_ids, positions, len(self.dataset.vehicles), self.date_range
+        )
+
+    # Double bookings of the filtered fleet overlapping the date range
+    def conflicts(self):
+        conflicts = self.dataset.rental_conflicts
+        selected = np.zeros(len(self.dataset.vehicles) + 1, dtype=bool)
+        selected[self.view.selection.vehicles] = True
+        # Rentals of unknown vehicles (position -1) hit the always-False last slot
+        keep = selected[self.dataset.vehicle_pos[conflicts.rows]] & conflicts.in_range(self.date_range)
+        return {'conflicts': conflicts.frame(keep)}
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# Above this many rentals the duration/price scatter is sent as binned cells
+SCATTER_POINT_LIMIT = 5000
+MAX_DAY_BINS = 60
+PRICE_BINS = 60
+
+
+# Bin edges for integer rental durations: one bin per day, merged into at most
+# MAX_DAY_BINS bins for very long durations
+def _day_edges(rental_days):
+    low, high = np.floor(rental_days.min()), np.ceil(rental_days.max())
+    return np.linspace(low - 0.5, high + 0.5, int(min(high - low + 1, MAX_DAY_BINS)) + 1)
+
+
+# 2D density of rentals over (rental_days x total_price) computed with
+# NumPy histogramming. Returns one row per non-empty cell at the cell centre,
+# with the number of rentals and the mean return delay of the cell, so the
+# payload is bounded by the number of bins whatever the number of rentals.
+def bin_duration_price(rental_days, total_price, return_delay_days, price_bins=PRICE_BINS):
+    rental_days = np.asarray(rental_days, dtype='float64')
+    total_price = np.asarray(total_price, dtype='float64')
+    delays = np.asarray(return_delay_days, dtype='float64')
+    if len(rental_days) == 0:
+        return pd.DataFrame(columns=['rental_days', 'total_price', 'count', 'return_delay_days'])
+
+    bins = [_day_edges(rental_days), price_bins]
+    counts, day_edges, price_edges = np.histogram2d(rental_days, total_price, bins=bins)
+
+    has_delay = ~np.isnan(delays)
+    delay_sum, _, _ = np.histogram2d(
+        rental_days[has_delay], total_price[has_delay], bins=[day_edges, price_edges],
+        weights=delays[has_delay]
+    )
+    delay_count, _, _ = np.histogram2d(
+        rental_days[has_delay], total_price[has_delay], bins=[day_edges, price_edges]
+    )
+
+    day_index, price_index = np.nonzero(counts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_delay = delay_sum[day_index, price_index] / delay_count[day_index, price_index]
+    return pd.DataFrame({
+        'rental_days': ((day_edges[:-1] + day_edges[1:]) / 2)[day_index],
+        'total_price': ((price_edges[:-1] + price_edges[1:]) / 2)[price_index],
+        'count': counts[day_index, price_index].astype(np.int64),
+        'return_delay_days': mean_delay,
+    })
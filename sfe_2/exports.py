@@ -0,0 +1,161 @@
+import io
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Table writers shared by the dashboard downloads and generate_data.py. Each
+# one takes a path or an open binary file (which is left open) and is fed the
+# table a chunk (DataFrame) at a time, so only one chunk is ever converted in
+# memory.
+
+# Excel sheets hold at most 1,048,576 rows, header included
+XLSX_MAX_ROWS = 1_048_575
+
+# Rows gathered and converted per chunk for the dashboard downloads
+EXPORT_CHUNK_ROWS = 50_000
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _open_binary(target):
+    if isinstance(target, (str, bytes)) or hasattr(target, '__fspath__'):
+        return open(target, "wb"), True
+    return target, False
+
+
+class CsvWriter:
+    def __init__(self, target, columns=None):
+        self.file, self._owned = _open_binary(target)
+        self.header = True
+
+    def write(self, df):
+        self.file.write(df.to_csv(index=False, header=self.header).encode("utf-8"))
+        self.header = False
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, target, columns=None):
+        import pyarrow.parquet as pq
+        self._pq = pq
+        self.target = target
+        self.writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        # Text columns typed as strings even when a chunk holds only missing values,
+        # so every chunk has the schema of the first one
+        text = {column: "string" for column in df.columns if df[column].dtype == object}
+        table = pa.Table.from_pandas(df.astype(text), preserve_index=False)
+        if self.writer is None:
+            self.writer = self._pq.ParquetWriter(self.target, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Tables longer than a sheet continue on "<title> (2)", "<title> (3)", ...
+class XlsxWriter:
+    def __init__(self, target, columns=None, title="Sheet"):
+        from openpyxl import Workbook
+        # Write-only workbooks stream rows to disk instead of keeping cells in memory
+        self.target = target
+        self.workbook = Workbook(write_only=True)
+        self.start(title, columns)
+
+    # Following writes go to a new table on its own sheet
+    def start(self, title, columns=None):
+        self.title, self.columns = title, columns
+        self.sheet, self.sheets, self.rows = None, 0, 0
+
+    def _add_sheet(self, columns):
+        self.sheets += 1
+        suffix = "" if self.sheets == 1 else " ({})".format(self.sheets)
+        # Sheet titles are limited to 31 characters
+        self.sheet = self.workbook.create_sheet(self.title[:31 - len(suffix)] + suffix)
+        self.sheet.append(list(columns))
+        self.rows = 0
+
+    def write(self, df):
+        columns = self.columns if self.columns is not None else df.columns
+        if self.sheet is None:
+            self._add_sheet(columns)
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            if self.rows == XLSX_MAX_ROWS:
+                self._add_sheet(columns)
+            self.sheet.append(row)
+            self.rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self._add_sheet(self.columns if self.columns is not None else [])
+        self.workbook.save(self.target)
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "xlsx": XlsxWriter}
+
+
+def write_table(target, columns, chunks, file_format):
+    writer = WRITERS[file_format](target, columns)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.close()
+
+
+# A filtered table for download, from its row chunks (the sections'
+# export_chunks), as bytes. The file is built one chunk at a time in a
+# temporary file on disk, so the full table never sits in memory as one frame
+# or one string next to the file's bytes.
+def export_table(chunks, file_format):
+    with tempfile.TemporaryFile() as buffer:
+        write_table(buffer, None, chunks, file_format)
+        buffer.seek(0)
+        return buffer.read()
+
+
+# Section results (name -> dict as returned by the sections) as named tables:
+# their DataFrames, plus a 'summary' table of their scalar figures
+def report_tables(results, skip=()):
+    summary = []
+    tables = {}
+    for section, result in results.items():
+        for key, value in result.items():
+            if key in skip:
+                continue
+            if isinstance(value, pd.DataFrame):
+                tables[key] = value.reset_index(drop=True)
+            elif not isinstance(value, (bool, np.bool_)):
+                summary.append((section, key, value.item() if isinstance(value, np.generic) else value))
+    return dict(summary=pd.DataFrame(summary, columns=['Section', 'Metric', 'Value']), **tables)
+
+
+# Report bundle: one workbook with a sheet per table, or a zip archive of
+# CSV / Parquet files (as bytes). Aggregates are small, so it is built in memory.
+def export_report(tables, file_format):
+    buffer = io.BytesIO()
+    if file_format == "xlsx":
+        writer = XlsxWriter(buffer)
+        for name, df in tables.items():
+            writer.start(name)
+            writer.write(df)
+        writer.close()
+        return buffer.getvalue()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, df in tables.items():
+            with archive.open("{}.{}".format(name, file_format), "w") as member:
+                write_table(member, None, [df], file_format)
+    return buffer.getvalue()
@@ -0,0 +1,266 @@
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.colors import get_colorscale
+
+# Dashboard charts as plain figure specs (dicts of traces and layout, the JSON
+# Plotly Express would produce for the same call), plus a cache of the finished
+# figures.
+#
+# Plotly Express and graph_objects validate every property of a figure against
+# the schema and expand the named template into objects, which costs tens of
+# milliseconds even for a 10-row aggregate. The builders below skip all of it:
+# the template is inlined once per process as JSON and colour scales are
+# resolved to their colour lists up front, and the figure is created without
+# validation. Streamlit serialises go.Figure objects as they are (dicts would
+# be validated again), so that is what the cache keeps.
+
+DEFAULT_TEMPLATE = 'plotly_white'
+DEFAULT_HEIGHT = 400
+SIZE_MAX = 20  # largest marker diameter of sized scatter plots (px's default)
+
+FIGURE_CACHE_ENTRIES = 512
+
+
+@lru_cache(maxsize=None)
+def _template_json(name):
+    return pio.templates[name].to_plotly_json()
+
+
+def _colorscale(name):
+    return [list(stop) for stop in get_colorscale(name)]
+
+
+def _values(series):
+    return series.to_numpy()
+
+
+def _hover(labels, column, field):
+    return "{}=%{{{}}}".format(labels.get(column, column), field)
+
+
+def _layout(title, labels, x, y, template, height=DEFAULT_HEIGHT, **layout):
+    spec = {
+        'template': _template_json(template),
+        'title': {'text': title},
+        'height': height,
+        'legend': {'tracegroupgap': 0},
+    }
+    if x is not None:
+        spec['xaxis'] = {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': labels.get(x, x)}}
+        spec['yaxis'] = {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': labels.get(y, y)}}
+    spec.update(layout)
+    return spec
+
+
+def _coloraxis(column, labels, scale):
+    return {'colorbar': {'title': {'text': labels.get(column, column)}}, 'colorscale': _colorscale(scale)}
+
+
+# Line chart of one or more columns (px.line)
+def line(df, x, y, title, labels=None, markers=False, template=DEFAULT_TEMPLATE):
+    labels = labels or {}
+    columns = [y] if isinstance(y, str) else list(y)
+    traces = []
+    for column in columns:
+        trace = {
+            'type': 'scatter',
+            'mode': 'lines+markers' if markers else 'lines',
+            'x': _values(df[x]),
+            'y': _values(df[column]),
+            'name': column if len(columns) > 1 else '',
+            'showlegend': len(columns) > 1,
+            'hovertemplate': "{}<br>{}<extra></extra>".format(
+                _hover(labels, x, 'x'), _hover(labels, column if len(columns) == 1 else 'value', 'y')
+            ),
+        }
+        traces.append(trace)
+    y_title = y if len(columns) == 1 else 'value'
+    layout = _layout(title, labels, x, y_title, template)
+    if len(columns) > 1:
+        layout['legend']['title'] = {'text': labels.get('variable', 'variable')}
+    return {'data': traces, 'layout': layout}
+
+
+# Bar chart, bars optionally coloured by a numeric column on a continuous scale
+# (px.bar with color=, color_continuous_scale=)
+def bar(df, x, y, title, color=None, text=None, color_scale=None, labels=None, template=DEFAULT_TEMPLATE):
+    labels = labels or {}
+    trace = {
+        'type': 'bar',
+        'x': _values(df[x]),
+        'y': _values(df[y]),
+        'name': '',
+        'showlegend': False,
+        'hovertemplate': "{}<br>{}".format(_hover(labels, x, 'x'), _hover(labels, y, 'y')),
+    }
+    layout = _layout(title, labels, x, y, template, barmode='relative')
+    if text is not None:
+        trace['text'] = _values(df[text])
+        trace['textposition'] = 'auto'
+    if color is not None:
+        trace['marker'] = {'color': _values(df[color]), 'coloraxis': 'coloraxis'}
+        trace['hovertemplate'] += "<br>" + _hover(labels, color, 'marker.color')
+        layout['coloraxis'] = _coloraxis(color, labels, color_scale or 'Plasma')
+    trace['hovertemplate'] += "<extra></extra>"
+    return {'data': [trace], 'layout': layout}
+
+
+# Pie or donut chart (px.pie); hover_data columns are listed in the tooltip
+def pie(df, values, names, title, colors=None, hole=None, hover_data=(), labels=None, template=DEFAULT_TEMPLATE):
+    labels = labels or {}
+    hover = [_hover(labels, names, 'label'), _hover(labels, values, 'value')]
+    trace = {
+        'type': 'pie',
+        'labels': _values(df[names]),
+        'values': _values(df[values]),
+        'name': '',
+        'showlegend': True,
+    }
+    if hole is not None:
+        trace['hole'] = hole
+    if hover_data:
+        trace['customdata'] = df[list(hover_data)].to_numpy()
+        hover += [_hover(labels, column, 'customdata[{}]'.format(i)) for i, column in enumerate(hover_data)]
+    trace['hovertemplate'] = "<br>".join(hover) + "<extra></extra>"
+    layout = _layout(title, labels, None, None, template)
+    if colors is not None:
+        layout['piecolorway'] = list(colors)
+    return {'data': [trace], 'layout': layout}
+
+
+# Histogram of one column (px.histogram)
+def histogram(df, x, title, nbins=None, color=None, labels=None, template=DEFAULT_TEMPLATE):
+    labels = labels or {}
+    trace = {
+        'type': 'histogram',
+        'x': _values(df[x]),
+        'name': '',
+        'showlegend': False,
+        'hovertemplate': "{}<br>count=%{{y}}<extra></extra>".format(_hover(labels, x, 'x')),
+    }
+    if nbins is not None:
+        trace['nbinsx'] = nbins
+    if color is not None:
+        trace['marker'] = {'color': color}
+    return {'data': [trace], 'layout': _layout(title, labels, x, 'count', template, barmode='relative')}
+
+
+# Heatmap of a frame: rows top to bottom, columns left to right (px.imshow)
+def heatmap(df, title, color_scale, zmin=None, zmax=None, labels=None, template=DEFAULT_TEMPLATE, height=DEFAULT_HEIGHT):
+    labels = labels or {}
+    x_label, y_label, z_label = (labels.get(axis, axis) for axis in ('x', 'y', 'color'))
+    trace = {
+        'type': 'heatmap',
+        'z': df.to_numpy(),
+        'x': _values(df.columns),
+        'y': _values(df.index),
+        'coloraxis': 'coloraxis',
+        'hovertemplate': "{}: %{{x}}<br>{}: %{{y}}<br>{}: %{{z}}<extra></extra>".format(x_label, y_label, z_label),
+    }
+    layout = _layout(title, {'x': x_label, 'y': y_label}, 'x', 'y', template, height=height)
+    layout['yaxis']['autorange'] = 'reversed'
+    layout['coloraxis'] = _coloraxis('color', labels, color_scale)
+    if zmin is not None:
+        layout['coloraxis']['cmin'] = zmin
+    if zmax is not None:
+        layout['coloraxis']['cmax'] = zmax
+    return {'data': [trace], 'layout': layout}
+
+
+# Scatter plot, markers coloured by a numeric column and optionally sized by
+# another (px.scatter with color=, size=)
+def scatter(df, x, y, color, title, size=None, hover_data=(), labels=None, template=DEFAULT_TEMPLATE):
+    labels = labels or {}
+    marker = {'color': _values(df[color]), 'coloraxis': 'coloraxis'}
+    hover = [_hover(labels, x, 'x'), _hover(labels, y, 'y'), _hover(labels, color, 'marker.color')]
+    if size is not None:
+        sizes = _values(df[size])
+        largest = np.nanmax(sizes) if len(sizes) else 1
+        marker.update(size=sizes, sizemode='area', sizeref=2.0 * largest / SIZE_MAX ** 2)
+        hover.append(_hover(labels, size, 'marker.size'))
+    trace = {'type': 'scatter', 'mode': 'markers', 'x': _values(df[x]), 'y': _values(df[y]), 'marker': marker, 'name': '', 'showlegend': False}
+    if hover_data:
+        trace['customdata'] = df[list(hover_data)].to_numpy()
+        hover += [_hover(labels, column, 'customdata[{}]'.format(i)) for i, column in enumerate(hover_data) if column != size]
+    trace['hovertemplate'] = "<br>".join(hover) + "<extra></extra>"
+    layout = _layout(title, labels, x, y, template)
+    layout['coloraxis'] = _coloraxis(color, labels, 'Plasma')
+    layout['legend']['itemsizing'] = 'constant'
+    return {'data': [trace], 'layout': layout}
+
+
+# Two line series sharing the x axis, the second on a right-hand y axis
+# (make_subplots with secondary_y)
+def dual_axis_lines(x, left, right, title, x_title, template=DEFAULT_TEMPLATE):
+    traces = []
+    for (name, values, color), axis in zip((left, right), ('y', 'y2')):
+        traces.append({
+            'type': 'scatter',
+            'mode': 'lines+markers',
+            'x': _values(x),
+            'y': _values(values),
+            'name': name,
+            'line': {'color': color},
+            'xaxis': 'x',
+            'yaxis': axis,
+        })
+    layout = _layout(title, {}, None, None, template)
+    layout.update(
+        xaxis={'anchor': 'y', 'domain': [0.0, 0.94], 'title': {'text': x_title}},
+        yaxis={'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': left[0]}},
+        yaxis2={'anchor': 'x', 'overlaying': 'y', 'side': 'right', 'title': {'text': right[0]}},
+    )
+    return {'data': traces, 'layout': layout}
+
+
+# Forecast of a line chart's series drawn after it (on a spec from line()):
+# a shaded band between the lower and upper columns and a dashed mean line
+def add_forecast(spec, df, x, y, lower, upper, name='Forecast', color='#F59E0B', fill='rgba(245, 158, 11, 0.2)'):
+    months = _values(df[x])
+    bound = {'type': 'scatter', 'mode': 'lines', 'x': months, 'line': {'width': 0}, 'showlegend': False, 'hoverinfo': 'skip'}
+    traces = [
+        dict(bound, y=_values(df[upper]), name=name + ' (high)'),
+        dict(bound, y=_values(df[lower]), name=name + ' (low)', fill='tonexty', fillcolor=fill),
+        {
+            'type': 'scatter',
+            'mode': 'lines+markers',
+            'x': months,
+            'y': _values(df[y]),
+            'name': name,
+            'showlegend': False,
+            'line': {'color': color, 'dash': 'dash'},
+            'customdata': df[[lower, upper]].to_numpy(),
+            'hovertemplate': "%{x}<br>" + name + "=%{y:,.0f} (%{customdata[0]:,.0f} - %{customdata[1]:,.0f})<extra></extra>",
+        },
+    ]
+    return dict(spec, data=list(spec['data']) + traces)
+
+
+# Content hash of a chart's inputs: frames by their values, index and column
+# names, anything else (titles, flags) by its repr
+def inputs_digest(inputs):
+    digest = hashlib.blake2b(digest_size=16)
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+            digest.update(pd.util.hash_pandas_object(value.columns.to_series(), index=False).to_numpy().tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+# Figure of a chart from a ResultCache of finished figures keyed on (chart id,
+# hash of its inputs, template): `build` (returning a spec) only runs for
+# inputs not seen before by any session, e.g. not for another filter
+# combination that yields the same aggregate. Cached figures are shared, so
+# they must not be modified.
+def cached_figure(cache, chart_id, inputs, build, template=DEFAULT_TEMPLATE):
+    key = (chart_id, inputs_digest(inputs), template)
+    return cache.get_or_compute(key, lambda: go.Figure(build(), _validate=False))
@@ -0,0 +1,112 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline import vehicle_attribute_codes
+
+# Row positions (in original order) selected in each table
+Selection = namedtuple('Selection', ['vehicles', 'rentals', 'merged'])
+
+ALL = 'All'
+
+
+# Day numbers (days since epoch) of a datetime column as int32; missing dates
+# get the smallest int32 so they sort first and never fall inside a date range
+def day_numbers(dates):
+    days = pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    missing = np.isnat(days)
+    days = days.astype(np.int64)
+    days[missing] = np.iinfo(np.int32).min
+    return days.astype(np.int32)
+
+
+# One boolean bitmap per value, from integer codes already laid out in index order
+def _code_bitmaps(codes, values):
+    return {value: codes == code for code, value in enumerate(values)}
+
+
+# One boolean bitmap per distinct value of `values`, laid out in `order`
+def _bitmaps(values, order):
+    codes, uniques = pd.factorize(values)
+    return _code_bitmaps(codes[order], uniques)
+
+
+# Rows of a table sorted by start date, with per-value bitmaps in the same order
+class _DateIndexedTable:
+    def __init__(self, start_dates, bitmaps=None):
+        days = day_numbers(start_dates)
+        self.order = np.argsort(days, kind='stable')
+        self.days = days[self.order]
+        self.bitmaps = {name: _bitmaps(values, self.order) for name, values in (bitmaps or {}).items()}
+
+    # Binary search the date range, then intersect the bitmaps of the chosen values
+    def select(self, date_range=None, **values):
+        if date_range is None:
+            lo, hi = 0, len(self.days)
+        else:
+            start, end = (np.datetime64(d, 'D').astype(np.int64) for d in date_range)
+            lo = np.searchsorted(self.days, start, side='left')
+            hi = np.searchsorted(self.days, end, side='right')
+
+        mask = None
+        for name, value in values.items():
+            if value is None:
+                continue
+            bitmap = self.bitmaps[name].get(value)
+            if bitmap is None:
+                return np.empty(0, dtype=np.intp)
+            mask = bitmap[lo:hi] if mask is None else mask & bitmap[lo:hi]
+
+        positions = self.order[lo:hi]
+        if mask is not None:
+            positions = positions[mask]
+        # Keep the original row order
+        return np.sort(positions)
+
+
+# Filter engine built once per data load: answers the sidebar filters with
+# binary searches on sorted start dates and intersections of value bitmaps
+# instead of rescanning the frames on every rerun
+class FilterIndex:
+    def __init__(self, vehicles_df, rentals_df, vehicle_pos):
+        vehicle_order = np.arange(len(vehicles_df))
+        self._vehicle_bitmaps = {
+            'category': _bitmaps(vehicles_df['vehicle_type'], vehicle_order),
+            'status': _bitmaps(vehicles_df['status'], vehicle_order),
+            'brand': _bitmaps(vehicles_df['make'], vehicle_order),
+        }
+        self._vehicle_count = len(vehicles_df)
+
+        self.categories = sorted(vehicles_df['vehicle_type'].dropna().unique().tolist())
+        self.statuses = sorted(vehicles_df['status'].dropna().unique().tolist())
+        self.brands = sorted(vehicles_df['make'].dropna().unique().tolist())
+
+        # Rentals get the category and brand of their vehicle through the join key
+        self._rentals = _DateIndexedTable(rentals_df['start_date'])
+        for name, column in (('category', 'vehicle_type'), ('brand', 'make')):
+            codes, values = vehicle_attribute_codes(vehicles_df, vehicle_pos, column)
+            self._rentals.bitmaps[name] = _code_bitmaps(codes[self._rentals.order], values)
+
+    def _select_vehicles(self, category, status, brand):
+        mask = np.ones(self._vehicle_count, dtype=bool)
+        for name, value in (('category', category), ('status', status), ('brand', brand)):
+            if value is None:
+                continue
+            bitmap = self._vehicle_bitmaps[name].get(value)
+            if bitmap is None:
+                return np.empty(0, dtype=np.intp)
+            mask &= bitmap
+        return np.flatnonzero(mask)
+
+    # Same semantics as the sidebar always had: the date range and category apply
+    # to rentals, date range, category and brand to the merged view (rentals
+    # with their vehicle attributes, so positions are rental rows too), and
+    # category, status and brand to the fleet. "All" (or None) disables a filter.
+    def select(self, date_range=None, category=ALL, status=ALL, brand=ALL):
+        category, status, brand = (None if v == ALL else v for v in (category, status, brand))
+        return Selection(
+            vehicles=self._select_vehicles(category, status, brand),
+            rentals=self._rentals.select(date_range, category=category),
+            merged=self._rentals.select(date_range, category=category, brand=brand),
+        )
@@ -0,0 +1,252 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rollup import month_label
+
+# Next months' rentals and revenue per vehicle category and per make, plus the
+# fleet total, from additive Holt-Winters exponential smoothing (Holt's linear
+# trend while there are fewer than two years of history).
+#
+# Every series is fitted at once: the monthly history is one (series x month)
+# matrix, the smoothing recursion loops over months only, and the parameter
+# search runs the whole grid as an extra array axis, so the cost hardly depends
+# on the number of categories and makes.
+
+FORECAST_HORIZON = 3  # months forecast after the last complete month
+SEASON_LENGTH = 12
+INTERVAL_Z = 1.96  # half-width of the bands, in one-step error standard deviations
+
+# Smoothing parameters tried for each series (level, trend, season)
+ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.0, 0.1, 0.3])
+GAMMAS = np.array([0.0, 0.1, 0.3])
+
+MEASURES = ['count', 'revenue']
+TOTAL = ('All', 'All')
+
+# Month number of undated rentals in the rollup cells (see rollup.py)
+_NO_MONTH = np.iinfo(np.int64).min
+
+
+def _month(day):
+    return np.datetime64(day, 'M').astype(np.int64)
+
+
+# Last month whose every day is covered by the data ending on `last_day`
+def last_complete_month(last_day):
+    month = _month(last_day)
+    next_day = np.datetime64(last_day, 'D') + 1
+    return month if _month(next_day) != month else month - 1
+
+
+# Monthly history (series x measure x month) of the fleet total, each vehicle
+# type and each make, from rollup cells (month, vehicle_type, make, count,
+# revenue) up to `last_month`
+def monthly_history(cells, last_month):
+    cells = cells[(cells['month'] != _NO_MONTH) & (cells['month'] <= last_month)]
+    keys = [TOTAL]
+    if not len(cells):
+        return keys, last_month + 1, np.zeros((1, len(MEASURES), 0))
+
+    first_month = int(cells['month'].min())
+    n_months = int(last_month - first_month + 1)
+    month_idx = cells['month'].to_numpy(dtype=np.int64) - first_month
+    rows = [np.zeros(len(cells), dtype=np.int64)]
+    for group, column in (('Category', 'vehicle_type'), ('Brand', 'make')):
+        codes, values = pd.factorize(cells[column], sort=True)
+        rows.append(np.where(codes >= 0, len(keys) + codes, -1))
+        keys += [(group, value) for value in values]
+
+    history = np.zeros((len(keys), len(MEASURES), n_months))
+    for row in rows:
+        known = row >= 0
+        flat = row[known] * n_months + month_idx[known]
+        for m, measure in enumerate(MEASURES):
+            weights = cells[measure].to_numpy(dtype='float64')[known]
+            history[:, m] += np.bincount(flat, weights=weights, minlength=len(keys) * n_months).reshape(len(keys), n_months)
+    return keys, first_month, history
+
+
+# Smoothing state of every (parameter set x series): level, trend, seasonal
+# terms, and the one-step squared errors so far
+def _initial_state(y, shape, seasonal):
+    if seasonal:
+        # Trend from the first two years' means; the seasonal terms are the first
+        # year's deviations from that trend line (centred on the year's middle,
+        # t = 5.5), and the level is the line's value at t = -1
+        first_year = y[:, :SEASON_LENGTH].mean(axis=1)
+        trend = (y[:, SEASON_LENGTH:2 * SEASON_LENGTH].mean(axis=1) - first_year) / SEASON_LENGTH
+        level = first_year - trend * (SEASON_LENGTH + 1) / 2
+        line = first_year[:, None] + trend[:, None] * (np.arange(SEASON_LENGTH) - (SEASON_LENGTH - 1) / 2)
+        season = y[:, :SEASON_LENGTH] - line
+        start = 0
+    else:
+        level = y[:, 0]
+        trend = y[:, 1] - y[:, 0]
+        season = np.zeros((len(y), 1))
+        start = 1
+    state = {
+        'level': np.broadcast_to(level, shape).copy(),
+        'trend': np.broadcast_to(trend, shape).copy(),
+        'season': np.broadcast_to(season, shape + season.shape[-1:]).copy(),
+        'sse': np.zeros(shape),
+        'errors': 0,
+    }
+    return state, start
+
+
+# Holt-Winters recursion over the months [start, end) of y, in place on `state`
+def _smooth(y, start, end, params, state, seasonal):
+    alpha, beta, gamma = params
+    level, trend, season = state['level'], state['trend'], state['season']
+    for t in range(start, end):
+        phase = t % SEASON_LENGTH if seasonal else 0
+        observed = y[:, t]
+        seasonal_term = season[..., phase]
+        error = observed - (level + trend + seasonal_term)
+        state['sse'] += error ** 2
+        new_level = alpha * (observed - seasonal_term) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        if seasonal:
+            season[..., phase] = gamma * (observed - new_level) + (1 - gamma) * seasonal_term
+        level = new_level
+    state['level'], state['trend'] = level, trend
+    state['errors'] += max(end - start, 0)
+
+
+# Fitted models of every series for one monthly history
+class DemandForecast:
+    def __init__(self, keys, first_month, history, params, state, seasonal, refit):
+        self.keys = keys
+        self.first_month = first_month
+        self.history = history
+        self.params = params
+        self.state = state
+        self.seasonal = seasonal
+        self.refit = refit  # "full", "incremental" or "unchanged"
+
+    @property
+    def n_months(self):
+        return self.history.shape[-1]
+
+    @property
+    def model(self):
+        if not self.n_months:
+            return "no complete month"
+        return "Holt-Winters (seasonal)" if self.seasonal else "Holt (level + trend)"
+
+    # Mean, lower and upper bound (series x measure x horizon) of the next months
+    def predict(self, horizon=FORECAST_HORIZON):
+        shape = self.history.shape[:2] + (horizon,)
+        if self.state is None:
+            return np.zeros(shape), np.zeros(shape), np.zeros(shape)
+        steps = np.arange(1, horizon + 1)
+        level = self.state['level'].reshape(self.history.shape[:2])[..., None]
+        trend = self.state['trend'].reshape(self.history.shape[:2])[..., None]
+        season = self.state['season'].reshape(self.history.shape[:2] + (-1,))
+        phases = (self.n_months + steps - 1) % season.shape[-1]
+        mean = level + steps * trend + season[..., phases]
+        sigma = np.sqrt(self.state['sse'] / max(self.state['errors'], 1)).reshape(self.history.shape[:2])[..., None]
+        # The one-step error spread, widened with the horizon
+        half_width = INTERVAL_Z * sigma * np.sqrt(steps)
+        return np.maximum(mean, 0), np.maximum(mean - half_width, 0), np.maximum(mean + half_width, 0)
+
+
+# Fits the forecasts of each data version, keeping the last fit: when a new
+# version only appends months to the same history, the fitted parameters are
+# kept and the recursion just continues over the new months instead of
+# searching the parameters again. Shared by the datasets of a process.
+class DemandForecaster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = None
+
+    def fit(self, cells, last_day):
+        keys, first_month, history = monthly_history(cells, last_complete_month(last_day))
+        with self._lock:
+            forecast = self._update(self._last, keys, first_month, history)
+            if forecast is None:
+                forecast = _fit(keys, first_month, history)
+            self._last = forecast
+            return forecast
+
+    @staticmethod
+    def _update(last, keys, first_month, history):
+        n_months = history.shape[-1]
+        if (
+            last is None or last.state is None or keys != last.keys or first_month != last.first_month
+            or n_months < last.n_months or last.seasonal != (n_months >= 2 * SEASON_LENGTH)
+            or not np.array_equal(history[..., :last.n_months], last.history)
+        ):
+            return None
+        if n_months == last.n_months:
+            return DemandForecast(keys, first_month, history, last.params, last.state, last.seasonal, "unchanged")
+        y = history.reshape(-1, n_months)
+        state = {name: value.copy() if isinstance(value, np.ndarray) else value for name, value in last.state.items()}
+        _smooth(y, last.n_months, n_months, last.params, state, last.seasonal)
+        return DemandForecast(keys, first_month, history, last.params, state, last.seasonal, "incremental")
+
+
+# Full fit: every parameter set of the grid on every series, then the set with
+# the smallest one-step squared error per series
+def _fit(keys, first_month, history):
+    n_months = history.shape[-1]
+    if n_months < 2:
+        return DemandForecast(keys, first_month, history, None, None, False, "full")
+    seasonal = n_months >= 2 * SEASON_LENGTH
+    y = history.reshape(-1, n_months)
+
+    grid = np.array(np.meshgrid(ALPHAS, BETAS, GAMMAS if seasonal else [0.0], indexing='ij')).reshape(3, -1)
+    state, start = _initial_state(y, (grid.shape[1], len(y)), seasonal)
+    _smooth(y, start, n_months, [p[:, None] for p in grid], state, seasonal)
+
+    best = np.argmin(state['sse'], axis=0)
+    series = np.arange(len(y))
+    params = [p[best] for p in grid]
+    state = {
+        name: value[best, series] if isinstance(value, np.ndarray) else value
+        for name, value in state.items()
+    }
+    return DemandForecast(keys, first_month, history, params, state, seasonal, "full")
+
+
+# Forecast table of a chart series (the fleet total or one category), starting
+# with the last complete month's actual values so that the band joins the
+# history line, and next month's forecast of every category and make
+def compute_forecast(forecast, category=None, horizon=FORECAST_HORIZON):
+    mean, lower, upper = forecast.predict(horizon)
+    months = forecast.first_month + forecast.n_months + np.arange(horizon)
+    labels = [month_label(month) for month in months]
+    columns = ['month_year', 'rentals', 'rentals_lower', 'rentals_upper', 'revenue', 'revenue_lower', 'revenue_upper']
+
+    key = TOTAL if category is None else ('Category', category)
+    if forecast.state is None or key not in forecast.keys:
+        series = pd.DataFrame(columns=columns)
+    else:
+        row = forecast.keys.index(key)
+        last = forecast.history[row, :, -1]
+        series = pd.DataFrame({'month_year': [month_label(months[0] - 1)] + labels})
+        for m, name in enumerate(['rentals', 'revenue']):
+            series[name] = np.r_[last[m], mean[row, m]]
+            series[name + '_lower'] = np.r_[last[m], lower[row, m]]
+            series[name + '_upper'] = np.r_[last[m], upper[row, m]]
+
+    groups = [] if forecast.state is None else [i for i, series_key in enumerate(forecast.keys) if series_key != TOTAL]
+    next_month = pd.DataFrame({
+        'Group': [forecast.keys[i][0] for i in groups],
+        'Name': [forecast.keys[i][1] for i in groups],
+        'Rentals': mean[groups, 0, 0].round(1),
+        'Rentals Low': lower[groups, 0, 0].round(1),
+        'Rentals High': upper[groups, 0, 0].round(1),
+        'Revenue': mean[groups, 1, 0].round(2),
+        'Revenue Low': lower[groups, 1, 0].round(2),
+        'Revenue High': upper[groups, 1, 0].round(2),
+    })
+    return {
+        'forecast': series,
+        'next_month': next_month,
+        'forecast_month': labels[0],
+        'forecast_model': forecast.model,
+    }
@@ -1,11 +1,24 @@
-import csv
-import random
-from datetime import datetime, timedelta
+import argparse
+import os
 
-# Vehicle data generation
-vehicles = [
-    ["vehicle_id", "make", "model", "year", "vehicle_type", "fuel_type", "color", "rental_price_per_day", "status"]
-]
+import numpy as np
+import pandas as pd
+
+from exports import WRITERS, XLSX_MAX_ROWS, write_table
+
+# Synthetic fleet and rental data for the dashboard.
+#
+#   python generate_data.py                                   # 21 vehicles, 250 rentals, CSV
+#   python generate_data.py --rentals 10000000 --format parquet
+#   python generate_data.py --vehicles 200 --rentals 500000 --format xlsx --seed 7
+#
+# Rentals are generated and written CHUNK_SIZE rows at a time, so memory use
+# does not grow with --rentals.
+
+CHUNK_SIZE = 250_000
+
+VEHICLE_COLUMNS = ["vehicle_id", "make", "model", "year", "vehicle_type", "fuel_type", "color", "rental_price_per_day", "status"]
+RENTAL_COLUMNS = ["rental_id", "vehicle_id", "start_date", "end_date", "total_price", "status", "customer_rating", "client_name", "return_delay_days", "payment_method"]
 
 makes = ["Renault", "Dacia", "Peugeot", "Citroen", "Ford"]
 models = {
@@ -20,67 +33,123 @@ fuel_types = ["Petrol", "Diesel", "Hybrid", "Electric"]
 colors = ["Red", "White", "Black", "Blue", "Silver", "Grey"]
 statuses = ["Available", "Under Maintenance", "Rented"]
 
-for i in range(1, 22):  # 21 vehicles
-    make = random.choice(makes)
-    model = random.choice(models[make])
-    year = random.randint(2015, 2023)
-    v_type = random.choice(vehicle_types)
-    fuel = random.choice(fuel_types)
-    color = random.choice(colors)
-    price = round(random.uniform(150, 500), 2)  # MAD price range
-    status = random.choice(statuses)
-    vehicles.append([
-        f"VEH{str(i).zfill(3)}", make, model, year, v_type, fuel, color, price, status
-    ])
-
-# Write vehicles to CSV
-with open("vehicles.csv", "w", newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerows(vehicles)
-
-# Rentals data generation
-rentals = [
-    ["rental_id", "vehicle_id", "start_date", "end_date", "total_price", "status", "customer_rating", "client_name", "return_delay_days", "payment_method"]
-]
-
 statuses_rental = ["Completed", "Cancelled", "Ongoing"]
 payment_methods = ["cash", "credit card", "debit card", "online payment"]
 client_names = ["Aya", "Salma", "Koki", "Chadi", "Imad", "Sana", "Amine", "Laila", "Youssef", "Fatima"]
 
-def random_date(start, end):
-    return start + timedelta(days=random.randint(0, (end - start).days))
-
-start_range = datetime.strptime("2023-01-01", "%Y-%m-%d")
-end_range = datetime.strptime("2023-12-31", "%Y-%m-%d")
-
-for i in range(1, 251):  # 250 rentals
-    vehicle_id = f"VEH{random.randint(1,21):03d}"
-    start_date = random_date(start_range, end_range)
-    rental_days = random.randint(1, 14)
-    end_date = start_date + timedelta(days=rental_days)
-    price_per_day = next(v[7] for v in vehicles if v[0] == vehicle_id)
-    total_price = round(price_per_day * rental_days, 2)
-    status = random.choice(statuses_rental)
-    rating = round(random.uniform(1, 5), 1) if status == "Completed" else ""
-    client = random.choice(client_names)
-    delay = random.randint(0, 10) if status == "Completed" else ""
-    payment = random.choice(payment_methods) if status == "Completed" else ""
-    rentals.append([
-        f"RENT{str(i).zfill(4)}",
-        vehicle_id,
-        start_date.strftime("%Y-%m-%d"),
-        end_date.strftime("%Y-%m-%d"),
-        total_price,
-        status,
-        rating,
-        client,
-        delay,
-        payment
-    ])
-
-# Write rentals to CSV
-with open("rentals.csv", "w", newline='', encoding='utf-8') as file:
-    writer = csv.writer(file)
-    writer.writerows(rentals)
-
-print("CSV files 'vehicles.csv' and 'rentals.csv' generated successfully.")
+start_range = np.datetime64("2023-01-01")
+end_range = np.datetime64("2023-12-31")
+
+
+# Prefixed, zero-padded ids (VEH001, RENT0001, ...) for a range of numbers
+def make_ids(prefix, start, stop, width):
+    if stop <= start:
+        return np.empty(0, dtype=object)
+    numbers = np.arange(start, stop).astype(str)
+    return np.char.add(prefix, np.char.zfill(numbers, width)).astype(object)
+
+
+def generate_vehicles(n_vehicles, rng):
+    make_index = rng.integers(0, len(makes), n_vehicles)
+    # One model per vehicle, picked among the models of its make
+    model_table = np.array([models[m] for m in makes], dtype=object)
+    model = model_table[make_index, rng.integers(0, model_table.shape[1], n_vehicles)]
+
+    return pd.DataFrame({
+        "vehicle_id": make_ids("VEH", 1, n_vehicles + 1, max(3, len(str(n_vehicles)))),
+        "make": np.asarray(makes, dtype=object)[make_index],
+        "model": model,
+        "year": rng.integers(2015, 2024, n_vehicles),
+        "vehicle_type": rng.choice(vehicle_types, n_vehicles),
+        "fuel_type": rng.choice(fuel_types, n_vehicles),
+        "color": rng.choice(colors, n_vehicles),
+        "rental_price_per_day": rng.uniform(150, 500, n_vehicles).round(2),  # MAD price range
+        "status": rng.choice(statuses, n_vehicles),
+    }, columns=VEHICLE_COLUMNS)
+
+
+# One chunk of rentals numbered first_id .. first_id + size - 1.
+# Daily prices are looked up by vehicle position instead of scanning the fleet.
+def generate_rentals(first_id, size, vehicles, clients, id_width, rng):
+    vehicle_index = rng.integers(0, len(vehicles), size)
+    prices = vehicles["rental_price_per_day"].to_numpy()
+
+    start_date = start_range + rng.integers(0, (end_range - start_range).astype(int) + 1, size).astype("timedelta64[D]")
+    rental_days = rng.integers(1, 15, size)
+    end_date = start_date + rental_days.astype("timedelta64[D]")
+
+    status = rng.choice(statuses_rental, size)
+    completed = status == "Completed"
+    rating = np.where(completed, rng.uniform(1, 5, size).round(1), np.nan)
+    delay = pd.array(rng.integers(0, 11, size), dtype="Int64")
+    delay[~completed] = pd.NA
+    payment = np.asarray(payment_methods, dtype=object)[rng.integers(0, len(payment_methods), size)]
+    payment[~completed] = None
+
+    return pd.DataFrame({
+        "rental_id": make_ids("RENT", first_id, first_id + size, id_width),
+        "vehicle_id": vehicles["vehicle_id"].to_numpy()[vehicle_index],
+        "start_date": np.datetime_as_string(start_date, unit="D").astype(object),
+        "end_date": np.datetime_as_string(end_date, unit="D").astype(object),
+        "total_price": (prices[vehicle_index] * rental_days).round(2),
+        "status": status.astype(object),
+        "customer_rating": rating,
+        "client_name": clients[rng.integers(0, len(clients), size)],
+        "return_delay_days": delay,
+        "payment_method": payment,
+    }, columns=RENTAL_COLUMNS)
+
+
+def client_pool(n_clients):
+    if n_clients <= len(client_names):
+        return np.asarray(client_names[:n_clients], dtype=object)
+    # Beyond the base names: Aya 2, Salma 2, ...
+    base = np.resize(np.asarray(client_names, dtype=object), n_clients)
+    round_number = np.arange(n_clients) // len(client_names) + 1
+    suffix = np.where(round_number > 1, np.char.add(" ", round_number.astype(str)), "")
+    return np.char.add(base.astype(str), suffix).astype(object)
+
+
+def generate(n_vehicles=21, n_rentals=250, seed=None, file_format="csv", output_dir=".", n_clients=len(client_names), chunk_size=CHUNK_SIZE):
+    rng = np.random.default_rng(seed)
+    vehicles = generate_vehicles(n_vehicles, rng)
+    clients = client_pool(n_clients)
+    id_width = max(4, len(str(n_rentals)))
+
+    os.makedirs(output_dir, exist_ok=True)
+    vehicles_path = os.path.join(output_dir, f"vehicles.{file_format}")
+    rentals_path = os.path.join(output_dir, f"rentals.{file_format}")
+    write_table(vehicles_path, VEHICLE_COLUMNS, [vehicles], file_format)
+
+    chunks = (
+        generate_rentals(first_id, max(0, min(chunk_size, n_rentals + 1 - first_id)), vehicles, clients, id_width, rng)
+        # An empty first chunk still writes the header / schema when there are no rentals
+        for first_id in range(1, max(n_rentals, 1) + 1, chunk_size)
+    )
+    write_table(rentals_path, RENTAL_COLUMNS, chunks, file_format)
+    return vehicles_path, rentals_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic vehicles and rentals files.")
+    parser.add_argument("--vehicles", type=int, default=21, help="number of vehicles (default: 21)")
+    parser.add_argument("--rentals", type=int, default=250, help="number of rentals (default: 250)")
+    parser.add_argument("--clients", type=int, default=len(client_names), help="number of distinct client names (default: 10)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible output")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv", help="output file format (default: csv)")
+    parser.add_argument("--output-dir", default=".", help="directory to write the files to (default: current directory)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rentals generated and written per chunk")
+    args = parser.parse_args()
+
+    if args.vehicles < 1 or args.rentals < 0 or args.clients < 1 or args.chunk_size < 1:
+        parser.error("--vehicles, --clients and --chunk-size must be positive, --rentals non-negative")
+    if args.format == "xlsx" and max(args.vehicles, args.rentals) > XLSX_MAX_ROWS:
+        parser.error(f"xlsx sheets are limited to {XLSX_MAX_ROWS} rows, use csv or parquet")
+    vehicles_path, rentals_path = generate(
+        args.vehicles, args.rentals, args.seed, args.format, args.output_dir, args.clients, args.chunk_size
+    )
+    print(f"Files '{vehicles_path}' and '{rentals_path}' generated successfully.")
+
+
+if __name__ == "__main__":
+    main()
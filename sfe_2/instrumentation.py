@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Opt-in profiling of a dashboard run: enabled with DASHBOARD_PROFILE=1 or the
+# ?profile=1 query parameter. Each run's stage records can be appended as JSON
+# lines to DASHBOARD_METRICS_FILE and/or published in the Prometheus text
+# format to DASHBOARD_PROMETHEUS_FILE (for the node_exporter textfile collector).
+PROFILE_ENV = "DASHBOARD_PROFILE"
+METRICS_FILE_ENV = "DASHBOARD_METRICS_FILE"
+PROMETHEUS_FILE_ENV = "DASHBOARD_PROMETHEUS_FILE"
+
+METRIC_PREFIX = "dashboard"
+
+
+def profiling_requested(query_value=None):
+    return (
+        os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+        or str(query_value).lower() in ("1", "true", "yes")
+    )
+
+
+# Number of rows in a stage result: a frame, a sized object, or the total rows of
+# the frames held in a dict of results
+def count_rows(value):
+    if isinstance(value, dict):
+        frames = [v for v in value.values() if isinstance(v, (pd.DataFrame, pd.Series))]
+        return sum(len(frame) for frame in frames) if frames else None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+# Timers for the stages of one run. A disabled profiler records nothing, so the
+# stage() blocks cost a single attribute check when profiling is off.
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        self.records = []
+        self._lock = threading.Lock()
+
+    # Time a block: `stage` is the pipeline step (read, process, index, filter,
+    # aggregate, figure, render), `name` what it was applied to. The yielded
+    # record can be given rows_out (and bytes) inside the block.
+    @contextmanager
+    def stage(self, stage, name=None, rows_in=None):
+        if not self.enabled:
+            yield {}
+            return
+        record = {'stage': stage, 'name': name, 'rows_in': rows_in, 'rows_out': None, 'bytes': None}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            with self._lock:
+                self.records.append(record)
+
+    def call(self, stage, name, compute, rows_in=None):
+        with self.stage(stage, name, rows_in) as record:
+            result = compute()
+            if self.enabled:
+                record['rows_out'] = count_rows(result)
+        return result
+
+    # Render a figure, recording the serialization + send time and the size of its JSON
+    def render_figure(self, name, fig, render):
+        if not self.enabled:
+            return render(fig)
+        with self.stage('render', name) as record:
+            record['bytes'] = len(fig.to_json().encode('utf-8'))
+            return render(fig)
+
+    def frame(self):
+        columns = ['stage', 'name', 'seconds', 'rows_in', 'rows_out', 'bytes']
+        return pd.DataFrame(self.records, columns=columns)
+
+    def totals(self):
+        return self.frame().groupby('stage', sort=False)['seconds'].sum()
+
+
+# Process-wide sink for profiled runs: writes JSON lines per stage record and
+# keeps cumulative per-stage counters for the Prometheus export.
+class MetricsExporter:
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self.runs = 0
+        # (stage, name) -> [count, seconds sum, last seconds, last rows_out, last bytes]
+        self._stages = {}
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get(METRICS_FILE_ENV), os.environ.get(PROMETHEUS_FILE_ENV))
+
+    def export(self, profiler, **labels):
+        if not profiler.records:
+            return
+        with self._lock:
+            self.runs += 1
+            for record in profiler.records:
+                stats = self._stages.setdefault((record['stage'], record['name'] or ''), [0, 0.0, 0.0, None, None])
+                stats[0] += 1
+                stats[1] += record['seconds']
+                stats[2:] = [record['seconds'], record['rows_out'], record['bytes']]
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    for record in profiler.records:
+                        f.write(json.dumps(dict(record, timestamp=profiler.started, **labels), default=str) + '\n')
+            if self.prometheus_path:
+                # Written to a temporary file then renamed, so scrapers never read a partial file
+                tmp_path = self.prometheus_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self._prometheus_text())
+                os.replace(tmp_path, self.prometheus_path)
+
+    def prometheus_text(self):
+        with self._lock:
+            return self._prometheus_text()
+
+    def _prometheus_text(self):
+        lines = [
+            "# HELP {0}_profiled_runs_total Profiled dashboard runs.".format(METRIC_PREFIX),
+            "# TYPE {0}_profiled_runs_total counter".format(METRIC_PREFIX),
+            "{0}_profiled_runs_total {1}".format(METRIC_PREFIX, self.runs),
+        ]
+        series = [
+            ('stage_seconds_sum', 'counter', 'Cumulative time spent in the stage.', 1),
+            ('stage_seconds_count', 'counter', 'Times the stage ran.', 0),
+            ('stage_last_seconds', 'gauge', 'Duration of the latest run of the stage.', 2),
+            ('stage_last_rows_out', 'gauge', 'Rows produced by the latest run of the stage.', 3),
+            ('figure_json_bytes', 'gauge', 'Size of the latest figure JSON sent to the browser.', 4),
+        ]
+        for metric, metric_type, help_text, position in series:
+            lines.append("# HELP {0}_{1} {2}".format(METRIC_PREFIX, metric, help_text))
+            lines.append("# TYPE {0}_{1} {2}".format(METRIC_PREFIX, metric, metric_type))
+            for (stage, name), stats in self._stages.items():
+                if stats[position] is None:
+                    continue
+                lines.append('{0}_{1}{{stage="{2}",name="{3}"}} {4}'.format(
+                    METRIC_PREFIX, metric, _escape(stage), _escape(name), stats[position]))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label):
+    return str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared do-nothing profiler for code that can run with or without profiling
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from filters import day_numbers
+from pipeline import vehicle_attribute_codes
+
+KPI_MEASURES = ['count', 'revenue', 'rating_sum', 'rating_count', 'delay_sum', 'delay_count']
+ROLLING_WINDOWS = [7, 30, 90]
+
+# Day number of undated rentals (see filters.day_numbers)
+MISSING_DAY = np.iinfo(np.int32).min
+
+
+def _day(value):
+    return np.datetime64(value, 'D').astype(np.int64)
+
+
+# Daily prefix sums of the KPI measures, per group (vehicle category) plus a
+# last group for records without one: prefix[g, i] holds the totals of group
+# g over the days before first_day + i. The totals of any window are then the
+# difference of two rows, O(1) whatever its length, so rolling windows and
+# comparison periods cost nothing more than the selected range itself.
+class DailyKpis:
+    def __init__(self, days, measures, groups=None, labels=()):
+        days = np.asarray(days, dtype=np.int64)
+        dated = days != MISSING_DAY
+        self.labels = list(labels)
+        n_groups = len(self.labels) + 1
+        groups = np.full(len(days), n_groups - 1) if groups is None else np.where(groups >= 0, groups, n_groups - 1)
+
+        self.first_day, self.last_day = (days[dated].min(), days[dated].max()) if dated.any() else (0, -1)
+        self.n_days = self.last_day - self.first_day + 1
+        width = self.n_days + 1
+        cells = groups[dated] * width + (days[dated] - self.first_day + 1)
+        sums = np.column_stack([
+            np.bincount(cells, weights=np.asarray(values, dtype='float64')[dated], minlength=n_groups * width)
+            for values in measures
+        ]).reshape(n_groups, width, len(KPI_MEASURES))
+        self.prefix = np.cumsum(sums, axis=1)
+        self.prefix_all = self.prefix.sum(axis=0)
+
+    # Built at load time from the processed frames, grouped by vehicle category
+    @classmethod
+    def from_rentals(cls, vehicles_df, rentals_df, vehicle_pos):
+        type_codes, types = vehicle_attribute_codes(vehicles_df, vehicle_pos, 'vehicle_type')
+        rating = rentals_df['customer_rating'].to_numpy(dtype='float64', na_value=np.nan)
+        delay = rentals_df['return_delay_days'].to_numpy(dtype='float64', na_value=np.nan)
+        measures = [
+            np.ones(len(rentals_df)),
+            np.nan_to_num(rentals_df['total_price'].to_numpy(dtype='float64', na_value=np.nan)),
+            np.nan_to_num(rating),
+            ~np.isnan(rating),
+            np.nan_to_num(delay),
+            ~np.isnan(delay),
+        ]
+        return cls(day_numbers(rentals_df['start_date']), measures, type_codes, types)
+
+    # Totals of the measures over the days [first_day, last_day], for one
+    # category (None: all)
+    def totals(self, first_day, last_day, category=None):
+        if category is None:
+            prefix = self.prefix_all
+        elif category in self.labels:
+            prefix = self.prefix[self.labels.index(category)]
+        else:
+            return dict.fromkeys(KPI_MEASURES, 0.0)
+        lo = int(np.clip(first_day - self.first_day, 0, self.n_days))
+        hi = int(np.clip(last_day - self.first_day + 1, lo, self.n_days))
+        return dict(zip(KPI_MEASURES, prefix[hi] - prefix[lo]))
+
+
+def kpi_values(totals):
+    count = totals['count']
+    return {
+        'rentals': int(round(count)),
+        'revenue': totals['revenue'],
+        'avg_price': totals['revenue'] / count if count else None,
+        'avg_rating': totals['rating_sum'] / totals['rating_count'] if totals['rating_count'] else None,
+        'avg_delay': totals['delay_sum'] / totals['delay_count'] if totals['delay_count'] else None,
+    }
+
+
+# KPIs of the selected period and of the period of the same length just
+# before it, plus the ROLLING_WINDOWS days ending with the period, each
+# against the window before. Without a date range the period is `span`
+# (the data's first and last day).
+def compute_period_kpis(daily, date_range=None, category=None, span=None):
+    if date_range is not None:
+        first_day, last_day = (_day(d) for d in date_range)
+    elif span is not None:
+        first_day, last_day = (_day(d) for d in span)
+    else:
+        first_day, last_day = daily.first_day, daily.last_day
+    length = last_day - first_day + 1
+
+    rolling = []
+    for window in ROLLING_WINDOWS:
+        current = kpi_values(daily.totals(last_day - window + 1, last_day, category))
+        previous = kpi_values(daily.totals(last_day - 2 * window + 1, last_day - window, category))
+        rolling.append({'window': window, 'current': current, 'previous': previous})
+
+    return {
+        'period_days': int(length),
+        'current': kpi_values(daily.totals(first_day, last_day, category)),
+        'previous': kpi_values(daily.totals(first_day - length, first_day - 1, category)),
+        'rolling': rolling,
+        'as_of': pd.Timestamp(np.int64(last_day).astype('datetime64[D]')),
+    }
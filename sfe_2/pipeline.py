@@ -0,0 +1,171 @@
+import calendar
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import NULL_PROFILER
+from schema import RENTAL_SCHEMA, VEHICLE_SCHEMA, apply_schema, concat_compact
+from sources import DATA_DIR, RENTALS_GLOB, VEHICLES_GLOB, load_table
+
+
+# Blank spreadsheet rows come through as rentals without an id
+def clean_rentals(rentals_df):
+    return rentals_df[rentals_df['rental_id'].notna()].reset_index(drop=True)
+
+
+MONTH_YEAR_FORMAT = '%b %Y'
+MONTH_NAMES = list(calendar.month_name)[1:]
+
+
+# Add the derived date columns used throughout the dashboard.
+# Everything is computed on datetime64/timedelta64 arrays; month labels are
+# formatted once per distinct month and broadcast back to the rows.
+def derive_rental_columns(rentals_df):
+    rentals_df = rentals_df.copy()
+    rentals_df['start_date'] = pd.to_datetime(rentals_df['start_date'])
+    start = rentals_df['start_date'].to_numpy(dtype='datetime64[ns]')
+
+    if 'end_date' in rentals_df.columns:
+        rentals_df['end_date'] = pd.to_datetime(rentals_df['end_date'])
+    else:
+        days = rentals_df['rental_days'].to_numpy(dtype='float64')
+        rentals_df['end_date'] = start + days.astype('timedelta64[D]')
+    end = rentals_df['end_date'].to_numpy(dtype='datetime64[ns]')
+
+    # Rental duration in whole days (NaN when a date is missing)
+    duration = end - start
+    known = ~np.isnat(duration)
+    if known.all():
+        rentals_df['rental_days'] = duration // np.timedelta64(1, 'D')
+    else:
+        rental_days = np.full(len(duration), np.nan)
+        rental_days[known] = duration[known] // np.timedelta64(1, 'D')
+        rentals_df['rental_days'] = rental_days
+
+    # Add month and year columns for time-based analysis, built directly as
+    # categoricals (one label per distinct month)
+    unique_months, month_codes = np.unique(start.astype('datetime64[M]'), return_inverse=True)
+    unique_months = pd.DatetimeIndex(unique_months)
+    if len(unique_months) and pd.isna(unique_months[-1]):
+        # Missing start dates (NaT sorts last) get no month
+        month_codes = np.where(month_codes == len(unique_months) - 1, -1, month_codes)
+        unique_months = unique_months[:-1]
+    month_numbers = np.append(unique_months.month.to_numpy() - 1, -1)
+    rentals_df['month'] = pd.Categorical.from_codes(month_numbers[month_codes], categories=MONTH_NAMES)
+    rentals_df['year'] = rentals_df['start_date'].dt.year
+    rentals_df['month_year'] = pd.Categorical.from_codes(
+        month_codes, categories=unique_months.strftime(MONTH_YEAR_FORMAT)
+    )
+    return apply_schema(rentals_df, RENTAL_SCHEMA)
+
+
+# Position of each rental's vehicle in vehicles_df (-1 for unknown vehicles).
+# Vehicle attributes are resolved through this join key instead of being
+# repeated on every rental row; vehicle_id is the key of the fleet table.
+def vehicle_positions(rentals_df, vehicles_df):
+    vehicle_ids = pd.Index(np.asarray(vehicles_df['vehicle_id'], dtype=object))
+    first = ~vehicle_ids.duplicated()
+    rows = np.flatnonzero(first)
+    found = vehicle_ids[first].get_indexer(np.asarray(rentals_df['vehicle_id'], dtype=object))
+    return np.where(found >= 0, rows[found] if len(rows) else -1, -1).astype(np.int32)
+
+
+# Integer codes (and their values) of a vehicle attribute for every rental, -1 when unknown
+def vehicle_attribute_codes(vehicles_df, vehicle_pos, column):
+    codes, values = pd.factorize(vehicles_df[column])
+    codes = np.append(codes, -1)
+    return codes[vehicle_pos], list(values)
+
+
+# Rentals joined with their vehicle attributes; same columns as a left
+# pd.merge on vehicle_id (overlapping names get _x/_y suffixes)
+def join_vehicles(rentals_df, vehicles_df, vehicle_pos):
+    attributes = vehicles_df.drop(columns=['vehicle_id']).reset_index(drop=True)
+    attributes = attributes.reindex(vehicle_pos).reset_index(drop=True)
+    overlap = set(rentals_df.columns) & set(attributes.columns)
+    left = rentals_df.reset_index(drop=True).rename(columns={c: c + '_x' for c in overlap})
+    right = attributes.rename(columns={c: c + '_y' for c in overlap})
+    return pd.concat([left, right], axis=1)
+
+
+# Full (non-incremental) processing of freshly loaded frames.
+# Returns (vehicles, rentals, vehicle_pos).
+def build_frames(vehicles_df, rentals_df):
+    vehicles_df = apply_schema(vehicles_df, VEHICLE_SCHEMA)
+    rentals_df = derive_rental_columns(clean_rentals(rentals_df))
+    return vehicles_df, rentals_df, vehicle_positions(rentals_df, vehicles_df)
+
+
+def _frame_fingerprint(df):
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest()
+
+
+# Keeps the derived rentals and their vehicle join keys between loads and, when
+# the rentals workbook only grew, derives and joins just the appended rows.
+# Rows already loaded are recognised by their row hashes (position + content), so
+# edits or deletions in the existing history, or any change to the vehicles, fall
+# back to a full rebuild.
+class IncrementalRentals:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vehicles_fingerprint = None
+        self._row_hashes = None
+        self._vehicles_df = None
+        self._rentals_df = None
+        self._vehicle_pos = None
+        self.last_update = None  # "full", "append" or "unchanged"
+
+    def update(self, vehicles_df, rentals_df):
+        rentals_df = clean_rentals(rentals_df)
+        row_hashes = pd.util.hash_pandas_object(rentals_df, index=False).to_numpy()
+        vehicles_fingerprint = _frame_fingerprint(vehicles_df)
+
+        with self._lock:
+            loaded = 0 if self._row_hashes is None else len(self._row_hashes)
+            appendable = (
+                self._rentals_df is not None
+                and vehicles_fingerprint == self._vehicles_fingerprint
+                and len(row_hashes) >= loaded
+                and np.array_equal(row_hashes[:loaded], self._row_hashes)
+            )
+
+            if not appendable:
+                self._vehicles_df, self._rentals_df, self._vehicle_pos = build_frames(vehicles_df, rentals_df)
+                self.last_update = "full"
+            elif len(row_hashes) > loaded:
+                new_rentals = derive_rental_columns(rentals_df.iloc[loaded:])
+                new_vehicle_pos = vehicle_positions(new_rentals, self._vehicles_df)
+                self._rentals_df = concat_compact([self._rentals_df, new_rentals])
+                self._vehicle_pos = np.concatenate([self._vehicle_pos, new_vehicle_pos])
+                self.last_update = "append"
+            else:
+                self.last_update = "unchanged"
+
+            self._row_hashes = row_hashes
+            self._vehicles_fingerprint = vehicles_fingerprint
+            return self._vehicles_df, self._rentals_df, self._vehicle_pos
+
+
+# Read both tables from their source files (see sources.py: workbooks through
+# their Parquet snapshots, parsed in parallel) and process them.
+# With an IncrementalRentals, only rows appended since its previous load are
+# derived. Raises FileNotFoundError when a table has no source file.
+def load_frames(ingest=None, profiler=NULL_PROFILER, data_dir=DATA_DIR,
+                vehicles_pattern=VEHICLES_GLOB, rentals_pattern=RENTALS_GLOB):
+    with profiler.stage('read', 'vehicles') as record:
+        vehicles_df = load_table(vehicles_pattern, data_dir)
+        record['rows_out'] = len(vehicles_df)
+    with profiler.stage('read', 'rentals') as record:
+        rentals_df = load_table(rentals_pattern, data_dir)
+        record['rows_out'] = len(rentals_df)
+
+    with profiler.stage('process', 'rentals', rows_in=len(rentals_df)) as record:
+        if ingest is None:
+            frames = build_frames(vehicles_df, rentals_df)
+        else:
+            frames = ingest.update(vehicles_df, rentals_df)
+        record['rows_out'] = len(frames[1])
+    return frames
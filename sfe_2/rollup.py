@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from filters import day_numbers
+from pipeline import MONTH_YEAR_FORMAT, vehicle_attribute_codes
+
+CUBE_DIMENSIONS = ['month', 'vehicle_type', 'make', 'status', 'payment_method']
+CUBE_MEASURES = ['count', 'revenue', 'rating_sum', 'rating_count', 'delay_sum']
+
+# Month numbers are months since 1970-01
+_NO_MONTH = np.iinfo(np.int64).min
+
+
+def _first_day(month):
+    return np.int64(month).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+
+def month_label(month):
+    return pd.Timestamp(np.int64(month).astype('datetime64[M]')).strftime(MONTH_YEAR_FORMAT)
+
+
+# Aggregate rentals (with vehicle_type and make attached) into cube cells
+def _aggregate(rentals_df):
+    months = rentals_df['start_date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+    rating = rentals_df['customer_rating'].astype('float64')
+    cells = pd.DataFrame({
+        'month': months,
+        'vehicle_type': rentals_df['vehicle_type'].array,
+        'make': rentals_df['make'].array,
+        'status': rentals_df['status'].array,
+        'payment_method': rentals_df['payment_method'].array,
+        'count': 1,
+        'revenue': rentals_df['total_price'].astype('float64').fillna(0).to_numpy(),
+        'rating_sum': rating.fillna(0).to_numpy(),
+        'rating_count': rating.notna().astype(np.int64).to_numpy(),
+        'delay_sum': rentals_df['return_delay_days'].astype('float64').fillna(0).to_numpy(),
+    })
+    cells = cells.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, sort=False).sum().reset_index()
+    # Cells are small: plain values are simpler to filter and group later on
+    for dimension in CUBE_DIMENSIONS[1:]:
+        cells[dimension] = cells[dimension].astype(object)
+    return cells
+
+
+# Materialized monthly rollup of the rentals: counts, revenue, rating sum/count
+# and delay sum per (month, vehicle_type, make, status, payment_method).
+# Charts are answered by summing cells, so their cost depends on the number of
+# months and categories instead of the number of rentals. Date ranges that cut
+# through a month are handled by aggregating the rows of the (at most two)
+# partially covered months from a date-sorted index.
+class RollupCube:
+    def __init__(self, vehicles_df, rentals_df, vehicle_pos):
+        rentals = rentals_df[['start_date', 'status', 'payment_method', 'total_price',
+                              'customer_rating', 'return_delay_days']].copy()
+        # Vehicle attributes resolved through the join key, as categorical codes
+        for column in ('vehicle_type', 'make'):
+            codes, values = vehicle_attribute_codes(vehicles_df, vehicle_pos, column)
+            rentals[column] = pd.Categorical.from_codes(codes, categories=values)
+
+        days = day_numbers(rentals['start_date'])
+        self._order = np.argsort(days, kind='stable')
+        self._days = days[self._order]
+        self._rentals = rentals
+        self.cells = _aggregate(rentals)
+
+    def _rows(self, lo, hi):
+        return self._rentals.iloc[self._order[lo:hi]]
+
+    # Cube cells covering a date range (pair of dates, or None for everything)
+    def _cells_in_range(self, date_range):
+        if date_range is None:
+            return self.cells
+
+        start_day, end_day = (np.datetime64(d, 'D').astype(np.int64) for d in date_range)
+        lo = np.searchsorted(self._days, start_day, side='left')
+        hi = np.searchsorted(self._days, end_day, side='right')
+        first_month = np.int64(start_day).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        last_month = np.int64(end_day).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+        # A boundary month is fully covered when none of its rentals fall outside the range
+        first_month_pos = np.searchsorted(self._days, _first_day(first_month), side='left')
+        after_last_pos = np.searchsorted(self._days, _first_day(last_month + 1), side='left')
+        first_full = first_month if lo == first_month_pos else first_month + 1
+        last_full = last_month if hi == after_last_pos else last_month - 1
+
+        parts = []
+        if first_full > last_full:
+            parts.append(_aggregate(self._rows(lo, hi)))
+        else:
+            months = self.cells['month']
+            parts.append(self.cells[(months >= first_full) & (months <= last_full)])
+            if first_full > first_month:
+                parts.append(_aggregate(self._rows(lo, np.searchsorted(self._days, _first_day(first_full)))))
+            if last_full < last_month:
+                parts.append(_aggregate(self._rows(np.searchsorted(self._days, _first_day(last_month)), hi)))
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    # Sum the measures of the selected cells, grouped by `by`.
+    # Adds avg_rating (rating_sum / rating_count) to the result.
+    def aggregate(self, by, date_range=None, **filters):
+        cells = self._cells_in_range(date_range)
+        for dimension, value in filters.items():
+            if value is not None:
+                cells = cells[cells[dimension] == value]
+        if by == 'month':
+            cells = cells[cells['month'] != _NO_MONTH]
+        result = cells.groupby(by)[CUBE_MEASURES].sum().reset_index()
+        result['avg_rating'] = result['rating_sum'] / result['rating_count'].where(result['rating_count'] > 0)
+        return result
+
+    # Monthly totals in chronological order, labelled like rentals_df['month_year']
+    def monthly(self, date_range=None, **filters):
+        result = self.aggregate('month', date_range, **filters).sort_values('month')
+        result['month_year'] = [month_label(month) for month in result['month']]
+        return result
@@ -0,0 +1,74 @@
+import pandas as pd
+
+# In-memory dtypes of the fleet and rental tables.
+# Low-cardinality text becomes categorical (one small integer code per row),
+# numerics are downcast to the smallest type that holds them. Prices stay
+# float64 so revenue sums do not drift.
+VEHICLE_SCHEMA = {
+    'vehicle_id': 'category',
+    'make': 'category',
+    'model': 'category',
+    'year': 'int16',
+    'vehicle_type': 'category',
+    'fuel_type': 'category',
+    'color': 'category',
+    'rental_price_per_day': 'float64',
+    'status': 'category',
+}
+
+RENTAL_SCHEMA = {
+    'vehicle_id': 'category',
+    'total_price': 'float64',
+    'status': 'category',
+    'customer_rating': 'float32',
+    'client_name': 'category',
+    'return_delay_days': 'float32',
+    'payment_method': 'category',
+    'month': 'category',
+    'month_year': 'category',
+    'year': 'int16',
+    'rental_days': 'int16',
+}
+
+
+def _convert(series, dtype):
+    if dtype == 'category':
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if pd.api.types.is_integer_dtype(dtype) and series.isna().any():
+        # Missing values: fall back to a small float instead of failing
+        return series.astype('float32')
+    return series.astype(dtype)
+
+
+# Apply a schema in place of the default pandas dtypes; columns absent from the
+# frame are skipped, columns absent from the schema are left untouched
+def apply_schema(df, schema):
+    df = df.copy()
+    for column, dtype in schema.items():
+        if column in df.columns:
+            df[column] = _convert(df[column], dtype)
+    return df
+
+
+# Concatenate compact frames without losing categorical dtypes: categories
+# are unioned first (new values appended, so existing codes keep their meaning)
+def concat_compact(frames):
+    frames = list(frames)
+    for column in frames[0].columns:
+        if not isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            continue
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            other = frame[column]
+            other_categories = other.cat.categories if isinstance(other.dtype, pd.CategoricalDtype) else pd.Index(other.dropna().unique())
+            categories = categories.append(other_categories.difference(categories))
+        frames = [
+            frame.assign(**{column: frame[column].astype(pd.CategoricalDtype(categories))})
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Memory footprint of a frame in bytes (including string payloads)
+def memory_usage(df):
+    return int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,156 @@
+import datetime
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset import SharedDataset
+from forecast import DemandForecaster
+from filters import ALL
+from instrumentation import NULL_PROFILER
+from pipeline import IncrementalRentals, load_frames
+from result_cache import ResultCache
+from sources import all_source_files
+from sql_store import SqlDataset, SqlRentalStore
+from warmup import UsageLog, WarmDatasets, warm_views
+from watcher import FileWatcher
+
+# Data service shared by the Streamlit dashboard (app.py) and the HTTP API
+# (api.py): loads the dataset, keeps it up to date in the background and serves
+# the sections' results (KPIs, trends, performance, distributions...) for a set
+# of filters, memoized per data version.
+
+# Data sources: every vehicles*.xlsx / rentals*.xlsx workbook (all sheets) of
+# DASHBOARD_DATA_DIR, next to this script by default (see sources.py)
+# Reload mode: "watch" rebuilds the data only when a source file changes,
+# "ttl" keeps the old behaviour of reloading every 5 minutes
+RELOAD_MODE = os.environ.get("DASHBOARD_RELOAD_MODE", "watch")
+RELOAD_TTL = 300
+
+# Storage backend: "memory" keeps the frames in the process, "sqlite" ingests
+# the workbooks into a local SQLite file and runs filters and aggregations as SQL
+DATA_BACKEND = os.environ.get("DASHBOARD_BACKEND", "memory")
+
+# Section results served by name (the methods of dataset.FrameSections and
+# sql_store.SqlSections that take no argument)
+SECTIONS = [
+    'kpis', 'period_kpis', 'trends', 'forecast', 'vehicle_performance', 'fleet_status', 'top_clients', 'clients',
+    'delays', 'ratings', 'payments', 'duration_price', 'utilization', 'conflicts',
+]
+
+# Sections shown without opening a dashboard tab, pre-computed for each new
+# data version
+WARM_SECTIONS = ['kpis', 'period_kpis', 'trends', 'forecast', 'vehicle_performance', 'fleet_status', 'utilization', 'top_clients', 'duration_price', 'payments']
+
+
+# Shared, read-only dataset of a data version: loaded from the source workbooks
+# (through their Parquet snapshots, so a workbook is only parsed again when its
+# content changed; changed workbooks are parsed in parallel; only rows appended
+# since the previous load are derived and joined), with the derived columns,
+# filter index and rollup cube built at load time (or, with the sqlite backend,
+# the database file re-ingested when the workbooks changed).
+# Raises FileNotFoundError when the workbooks are missing.
+def build_dataset(data_version, ingest=None, backend=DATA_BACKEND, profiler=NULL_PROFILER, forecaster=None):
+    if backend == "sqlite":
+        store = SqlRentalStore()
+        with profiler.stage('ingest', 'sqlite'):
+            store.sync()
+        return SqlDataset(store, version=data_version, forecaster=forecaster)
+
+    frames = load_frames(ingest, profiler)
+    with profiler.stage('index', 'filter index + rollup cube + daily KPIs', rows_in=len(frames[1])):
+        return SharedDataset(*frames, version=data_version, forecaster=forecaster)
+
+
+# One per process: the current dataset (rebuilt and warmed up in the
+# background when the data changes, see warmup.py), the result cache and the
+# usage log of the requested filter combinations, and the demand forecaster
+# (refitted incrementally from one version to the next).
+# `fallback` returns frames (as pipeline.build_frames) to serve when the
+# workbooks are missing; without one, FileNotFoundError is raised.
+class DataService:
+    def __init__(self, backend=DATA_BACKEND, reload_mode=RELOAD_MODE, fallback=None, profiler=NULL_PROFILER,
+                 result_cache=None, usage_log=None):
+        self.backend = backend
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.usage_log = usage_log if usage_log is not None else UsageLog()
+        self._ingest = IncrementalRentals()
+        self.forecaster = DemandForecaster()
+
+        if reload_mode == "ttl":
+            self.watcher = None
+            current_version = lambda: int(time.time() // RELOAD_TTL)
+        else:
+            # Files are listed again on every poll, so new workbooks are picked up too
+            self.watcher = FileWatcher(all_source_files)
+            current_version = lambda: self.watcher.version
+
+        data_version = current_version()
+        try:
+            dataset = build_dataset(data_version, self._ingest, backend, profiler, self.forecaster)
+        except FileNotFoundError:
+            if fallback is None:
+                raise
+            # Sample data is kept in memory until the workbooks appear
+            dataset = SharedDataset(*fallback(), version=data_version, forecaster=self.forecaster)
+
+        self.datasets = WarmDatasets(current_version, self._build, self._warm, initial=(data_version, dataset))
+        if self.watcher is not None:
+            self.watcher.on_change(self.datasets.notify)
+
+    # The (version, dataset) pair to use for a whole request or run
+    def current(self):
+        return self.datasets.current()
+
+    @property
+    def version(self):
+        return self.datasets.version
+
+    # Result of one section for a set of filters, computed once per data version
+    def section(self, name, data_version, dataset, date_range=None, category=ALL, status=ALL, brand=ALL):
+        if name not in SECTIONS:
+            raise KeyError(name)
+        key = (data_version, date_range, category, status, brand, name)
+        sections = dataset.sections(date_range=date_range, category=category, status=status, brand=brand)
+        return self.result_cache.get_or_compute(key, getattr(sections, name))
+
+    def _build(self, data_version):
+        return build_dataset(data_version, self._ingest, self.backend, forecaster=self.forecaster)
+
+    def _warm(self, data_version, dataset):
+        views = warm_views(dataset, self.usage_log)
+        for date_range, category, status, brand in views:
+            sections = dataset.sections(date_range=date_range, category=category, status=status, brand=brand)
+            for name in WARM_SECTIONS:
+                key = (data_version, date_range, category, status, brand, name)
+                self.result_cache.get_or_compute(key, getattr(sections, name))
+        return len(views)
+
+
+# Section results as plain JSON values: DataFrames as lists of records (their
+# index as a column when it carries labels), missing values as None, dates in
+# ISO format
+def to_json_value(value):
+    if isinstance(value, pd.DataFrame):
+        if not isinstance(value.index, pd.RangeIndex):
+            value = value.reset_index()
+        value = value.rename(columns=lambda c: c.isoformat() if hasattr(c, 'isoformat') else str(c))
+        return [
+            {column: to_json_value(cell) for column, cell in zip(value.columns, row)}
+            for row in value.itertuples(index=False, name=None)
+        ]
+    if isinstance(value, pd.Series):
+        return to_json_value(value.to_frame())
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or value is pd.NaT or value is pd.NA or (isinstance(value, float) and not math.isfinite(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()
+    return value
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# pyarrow is optional: without it we simply fall back to parsing the workbook
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SNAPSHOTS_AVAILABLE = pq is not None
+
+# Snapshots live next to the app unless told otherwise
+SNAPSHOT_DIR = os.environ.get(
+    "DASHBOARD_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots")
+)
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# Cheap change check: modification time and size of the source file
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Content hash of the source file, read in chunks so big workbooks stay out of memory
+def content_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# One snapshot slot per (source path, read options)
+def _snapshot_key(path, read_kwargs):
+    raw = os.path.abspath(path) + "|" + repr(sorted(read_kwargs.items()))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _snapshot_path(key, digest):
+    return os.path.join(SNAPSHOT_DIR, "{}-{}.parquet".format(key, digest))
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Excel columns mixing numbers and text (e.g. model "208" next to "Clio") cannot be
+# stored as a single Arrow type, so they are normalised to strings
+def _arrow_safe(df):
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _write_parquet(df, path):
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    _write_atomic(path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+
+# Memory-mapped read of a snapshot
+def _read_parquet(path):
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+
+# Read an Excel workbook through its Parquet snapshot.
+# The workbook is only parsed again when its content actually changed: a matching
+# mtime/size trusts the snapshot directly, a different mtime/size falls back to the
+# content hash (so a plain `touch` or copy does not trigger a re-parse).
+def read_excel_snapshot(path, **read_kwargs):
+    if pq is None:
+        return pd.read_excel(path, **read_kwargs)
+
+    # Raises FileNotFoundError exactly like pd.read_excel would
+    mtime_ns, size = file_signature(path)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    key = _snapshot_key(path, read_kwargs)
+    manifest_path = os.path.join(SNAPSHOT_DIR, key + ".json")
+    manifest = _read_manifest(manifest_path)
+
+    def snapshot_path(digest):
+        return _snapshot_path(key, digest)
+
+    if manifest and os.path.exists(snapshot_path(manifest["hash"])):
+        if manifest["mtime_ns"] == mtime_ns and manifest["size"] == size:
+            return _read_parquet(snapshot_path(manifest["hash"]))
+
+    digest = content_hash(path)
+    new_manifest = {
+        "source": os.path.abspath(path),
+        "mtime_ns": mtime_ns,
+        "size": size,
+        "hash": digest,
+    }
+
+    if manifest and manifest["hash"] == digest and os.path.exists(snapshot_path(digest)):
+        # Same content, new timestamp: just refresh the manifest
+        df = _read_parquet(snapshot_path(digest))
+    else:
+        df = pd.read_excel(path, **read_kwargs)
+        _write_parquet(df, snapshot_path(digest))
+        # Drop the snapshot of the previous version of the file
+        if manifest and manifest["hash"] != digest:
+            try:
+                os.remove(snapshot_path(manifest["hash"]))
+            except OSError:
+                pass
+        df = _read_parquet(snapshot_path(digest))
+
+    _write_atomic(
+        manifest_path,
+        lambda tmp_path: _dump_json(new_manifest, tmp_path)
+    )
+    return df
+
+
+# True when read_excel_snapshot(path, **read_kwargs) would be answered from its
+# snapshot without parsing (or even hashing) the workbook
+def snapshot_is_current(path, **read_kwargs):
+    if pq is None:
+        return False
+    key = _snapshot_key(path, read_kwargs)
+    manifest = _read_manifest(os.path.join(SNAPSHOT_DIR, key + ".json"))
+    if not manifest:
+        return False
+    return (
+        (manifest["mtime_ns"], manifest["size"]) == file_signature(path)
+        and os.path.exists(_snapshot_path(key, manifest["hash"]))
+    )
+
+
+def _dump_json(data, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
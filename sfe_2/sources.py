@@ -0,0 +1,126 @@
+import glob
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import pandas as pd
+
+from snapshot import SNAPSHOTS_AVAILABLE, read_excel_snapshot, snapshot_is_current
+
+# Source files: every file of DATA_DIR matching the glob of a table (e.g. one
+# rentals workbook per branch or per month) is loaded, and with
+# DASHBOARD_SHEETS=all (the default) every sheet of every workbook.
+# Parts of a table must share the same columns; they are concatenated in file
+# name order, then sheet order.
+DATA_DIR = os.environ.get("DASHBOARD_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+VEHICLES_GLOB = os.environ.get("DASHBOARD_VEHICLES_GLOB", "vehicles*.xlsx")
+RENTALS_GLOB = os.environ.get("DASHBOARD_RENTALS_GLOB", "rentals*.xlsx")
+SHEETS = os.environ.get("DASHBOARD_SHEETS", "all")  # "all" or "first"
+# Worker processes for parsing workbooks (0: one per CPU)
+LOAD_WORKERS = int(os.environ.get("DASHBOARD_LOAD_WORKERS", "0")) or os.cpu_count() or 1
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+SPREADSHEET_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+class SchemaMismatchError(ValueError):
+    pass
+
+
+def source_files(pattern, data_dir=DATA_DIR):
+    return sorted(path for path in glob.glob(os.path.join(data_dir, pattern)) if os.path.isfile(path))
+
+
+# All source files of both tables (what the file watcher has to poll)
+def all_source_files(data_dir=DATA_DIR):
+    return source_files(VEHICLES_GLOB, data_dir) + source_files(RENTALS_GLOB, data_dir)
+
+
+def _is_excel(path):
+    return path.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def _sheet_names(path):
+    if not _is_excel(path) or SHEETS == "first":
+        return [None]
+    if path.lower().endswith('.xls'):
+        with pd.ExcelFile(path) as workbook:
+            return list(workbook.sheet_names)
+    # Sheet names straight from xl/workbook.xml: opening the workbook with
+    # openpyxl would read every sheet, even when all snapshots are current
+    with zipfile.ZipFile(path) as archive:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in workbook.iter('{%s}sheet' % SPREADSHEET_NS)]
+
+
+# One part of a table: a sheet of a workbook (through its Parquet snapshot),
+# or a whole CSV / Parquet file
+def read_part(path, sheet=None):
+    if _is_excel(path):
+        return read_excel_snapshot(path) if sheet is None else read_excel_snapshot(path, sheet_name=sheet)
+    if path.lower().endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _is_current(path, sheet):
+    if not _is_excel(path):
+        return False
+    return snapshot_is_current(path) if sheet is None else snapshot_is_current(path, sheet_name=sheet)
+
+
+# Pool task: parse a part. Workbooks are only parsed into their snapshot, which
+# the parent then memory-maps, instead of pickling the frame back.
+def _parse_part(path, sheet):
+    df = read_part(path, sheet)
+    return None if _is_excel(path) and SNAPSHOTS_AVAILABLE else df
+
+
+# Read all parts. Parts that need parsing (workbooks without a current
+# snapshot, CSV files) are parsed concurrently in worker processes: openpyxl
+# parsing is CPU-bound and holds the GIL, so threads would not help.
+def read_parts(parts, workers=LOAD_WORKERS):
+    parsed = {}
+    stale = [part for part in parts if not _is_current(*part)]
+    if len(stale) > 1 and workers > 1:
+        # Spawned workers: forking a process that runs server threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale)), mp_context=context) as pool:
+            futures = {part: pool.submit(_parse_part, *part) for part in stale}
+            parsed = {part: future.result() for part, future in futures.items()}
+    return [parsed[part] if parsed.get(part) is not None else read_part(*part) for part in parts]
+
+
+# Every part must have the columns of the first one (in any order)
+def check_schemas(parts, frames):
+    expected = list(frames[0].columns)
+    for (path, sheet), df in zip(parts, frames):
+        missing = [column for column in expected if column not in df.columns]
+        extra = [column for column in df.columns if column not in expected]
+        if missing or extra:
+            where = os.path.basename(path) + ("" if sheet is None else " [{}]".format(sheet))
+            raise SchemaMismatchError("{}: columns differ from {} (missing: {}, unexpected: {})".format(
+                where, os.path.basename(parts[0][0]), missing or "none", extra or "none"))
+    return expected
+
+
+# Load one table from every file (and sheet) matching `pattern`.
+# Raises FileNotFoundError when nothing matches.
+def load_table(pattern, data_dir=DATA_DIR, workers=LOAD_WORKERS):
+    paths = source_files(pattern, data_dir)
+    if not paths:
+        raise FileNotFoundError("No source file matches {}".format(os.path.join(data_dir, pattern)))
+
+    parts = [(path, sheet) for path in paths for sheet in _sheet_names(path)]
+    frames = read_parts(parts, workers)
+    # Empty sheets carry no rows nor columns worth validating
+    non_empty = [(part, df) for part, df in zip(parts, frames) if len(df.columns)]
+    if not non_empty:
+        return frames[0]
+    parts, frames = zip(*non_empty)
+    columns = check_schemas(parts, frames)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat([df[columns] for df in frames], ignore_index=True)
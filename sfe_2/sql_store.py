@@ -0,0 +1,489 @@
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import closing
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from clients import client_analytics
+from conflicts import RentalConflicts
+from downsample import MAX_DAY_BINS, PRICE_BINS, SCATTER_POINT_LIMIT
+from filters import ALL, day_numbers
+from forecast import DemandForecaster, compute_forecast
+from kpi_engine import KPI_MEASURES, DailyKpis, compute_period_kpis
+from pipeline import load_frames
+from rollup import month_label
+from snapshot import SNAPSHOT_DIR, file_signature
+from sources import DATA_DIR, all_source_files
+from utilization import compute_utilization, rental_intervals
+
+# Optional SQLite storage backend: the workbooks are ingested once into a local
+# database file, and the dashboard's filters and aggregations run as SQL so
+# only small result sets come back into Python. Enabled with
+# DASHBOARD_BACKEND=sqlite; the file lives in DASHBOARD_SQLITE_PATH.
+SQLITE_PATH = os.environ.get("DASHBOARD_SQLITE_PATH", os.path.join(SNAPSHOT_DIR, "dashboard.sqlite"))
+
+# Values offered by the sidebar filters (same fields as FilterIndex)
+FilterOptions = namedtuple('FilterOptions', ['categories', 'statuses', 'brands'])
+
+_SCHEMA = [
+    "CREATE INDEX rentals_start_date ON rentals (start_date)",
+    "CREATE INDEX rentals_vehicle_id ON rentals (vehicle_id)",
+    # Per-vehicle date lookups when a category or brand picks a few vehicles
+    "CREATE INDEX rentals_vehicle_pos_start_date ON rentals (vehicle_pos, start_date)",
+    "CREATE UNIQUE INDEX vehicles_vehicle_pos ON vehicles (vehicle_pos)",
+    "CREATE INDEX vehicles_make ON vehicles (make)",
+    "CREATE INDEX vehicles_vehicle_type ON vehicles (vehicle_type)",
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+    # Daily KPI totals per vehicle category, for the rolling and period-over-period KPIs
+    "CREATE TABLE daily_kpis AS SELECT r.start_date AS start_date, v.vehicle_type AS vehicle_type, "
+    "COUNT(*) AS count, SUM(COALESCE(r.total_price, 0)) AS revenue, "
+    "SUM(COALESCE(r.customer_rating, 0)) AS rating_sum, COUNT(r.customer_rating) AS rating_count, "
+    "SUM(COALESCE(r.return_delay_days, 0)) AS delay_sum, COUNT(r.return_delay_days) AS delay_count "
+    "FROM rentals r LEFT JOIN vehicles v ON v.vehicle_pos = r.vehicle_pos "
+    "WHERE r.start_date IS NOT NULL GROUP BY r.start_date, v.vehicle_type",
+    # Monthly demand per vehicle category and make, for the forecasts (grouped on
+    # the expression: a bare "month" would be the rentals' own month column)
+    "CREATE TABLE monthly_demand AS SELECT substr(r.start_date, 1, 7) AS month, v.vehicle_type AS vehicle_type, "
+    "v.make AS make, COUNT(*) AS count, SUM(COALESCE(r.total_price, 0)) AS revenue "
+    "FROM rentals r LEFT JOIN vehicles v ON v.vehicle_pos = r.vehicle_pos "
+    "WHERE r.start_date IS NOT NULL GROUP BY substr(r.start_date, 1, 7), v.vehicle_type, v.make",
+]
+
+# Stored with the source signature: bumping it re-ingests stores built with an older layout
+STORE_LAYOUT = 3
+
+INGEST_CHUNK_SIZE = 100_000
+
+
+# Plain Python/SQLite-friendly column types: categoricals as text, dates as
+# ISO 'YYYY-MM-DD' strings (they sort and compare like the dates themselves)
+def _sql_frame(df):
+    df = df.copy()
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            df[column] = df[column].dt.strftime('%Y-%m-%d').astype(object)
+        elif pd.api.types.is_float_dtype(dtype):
+            df[column] = df[column].astype('float64')
+    return df
+
+
+# Source signature: (mtime, size) of every source file, as stored in the meta table
+def source_signature(paths):
+    return json.dumps({'layout': STORE_LAYOUT, 'files': [list(file_signature(path)) for path in paths]})
+
+
+class SqlRentalStore:
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def query(self, sql, params=()):
+        with self._connect() as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    # Query results as frames of at most chunk_size rows (at least one, possibly empty)
+    def iter_query(self, sql, params=(), chunk_size=INGEST_CHUNK_SIZE):
+        with self._connect() as connection:
+            yield from pd.read_sql_query(sql, connection, params=params, chunksize=chunk_size)
+
+    def columns(self, table):
+        return self.query("SELECT name FROM pragma_table_info(?) ORDER BY cid", [table])['name'].tolist()
+
+    def scalar_row(self, sql, params=()):
+        with self._connect() as connection:
+            return connection.execute(sql, params).fetchone()
+
+    def signature(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            row = self.scalar_row("SELECT value FROM meta WHERE key = 'signature'")
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    # Load processed frames (build_frames output) into a fresh database file,
+    # swapped in atomically so readers never see a half-written store
+    def ingest(self, vehicles_df, rentals_df, vehicle_pos, signature=None):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        vehicles = _sql_frame(vehicles_df)
+        vehicles.insert(0, 'vehicle_pos', np.arange(len(vehicles)))
+        rentals = _sql_frame(rentals_df)
+        rentals.insert(0, 'row_pos', np.arange(len(rentals)))
+        rentals['vehicle_pos'] = vehicle_pos
+
+        with closing(sqlite3.connect(tmp_path)) as connection:
+            vehicles.to_sql('vehicles', connection, index=False)
+            rentals.to_sql('rentals', connection, index=False, chunksize=INGEST_CHUNK_SIZE)
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.execute("INSERT INTO meta VALUES ('signature', ?)", (signature,))
+            connection.execute("ANALYZE")
+            connection.commit()
+        os.replace(tmp_path, self.path)
+
+    # Ingest the source files unless the store already holds their current version
+    # Raises FileNotFoundError when there is no source file.
+    def sync(self, data_dir=DATA_DIR):
+        paths = all_source_files(data_dir)
+        if not paths:
+            raise FileNotFoundError("No source file in {}".format(data_dir))
+        signature = source_signature(paths)
+        if self.signature() != signature:
+            self.ingest(*load_frames(data_dir=data_dir), signature=signature)
+            return True
+        return False
+
+
+# WHERE clause (and parameters) over `rentals r LEFT JOIN vehicles v`.
+# A date range covering all the data (`bounds`) only excludes undated rentals:
+# a full table scan beats walking the whole start_date index.
+def _rental_filter(date_range=None, category=None, brand=None, bounds=None):
+    clauses, params = [], []
+    if date_range is not None:
+        start, end = (pd.Timestamp(d).strftime('%Y-%m-%d') for d in date_range)
+        if bounds is not None and start <= bounds[0] and end >= bounds[1]:
+            clauses.append("r.start_date IS NOT NULL")
+        else:
+            clauses.append("r.start_date BETWEEN ? AND ?")
+            params += [start, end]
+    if category is not None:
+        clauses.append("v.vehicle_type = ?")
+        params.append(category)
+    if brand is not None:
+        clauses.append("v.make = ?")
+        params.append(brand)
+    return clauses, params
+
+
+def _where(clauses):
+    return (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+
+_RENTALS = "FROM rentals r LEFT JOIN vehicles v ON v.vehicle_pos = r.vehicle_pos"
+
+
+# Dataset backed by a SqlRentalStore, offering the same surface to app.py as
+# SharedDataset: filter values, date bounds and per-section data
+class SqlDataset:
+    def __init__(self, store, version=None, forecaster=None):
+        self.store = store
+        self.version = version
+        self.forecaster = forecaster if forecaster is not None else DemandForecaster()
+
+        self.rental_count, min_date, max_date = store.scalar_row(
+            "SELECT COUNT(*), MIN(start_date), MAX(start_date) FROM rentals"
+        )
+        self.bounds = (min_date, max_date)
+        self.min_date = pd.Timestamp(min_date).date()
+        self.max_date = pd.Timestamp(max_date).date()
+        self.filter_index = FilterOptions(*(
+            store.query("SELECT DISTINCT {0} FROM vehicles WHERE {0} IS NOT NULL ORDER BY {0}".format(column)).iloc[:, 0].tolist()
+            for column in ('vehicle_type', 'status', 'make')
+        ))
+
+    # Demand forecasts fitted on the monthly_demand table, on first use
+    @cached_property
+    def demand_forecast(self):
+        cells = self.store.query("SELECT month, vehicle_type, make, count, revenue FROM monthly_demand")
+        cells['month'] = pd.to_datetime(cells['month'], format='%Y-%m').to_numpy().astype('datetime64[M]').astype(np.int64)
+        return self.forecaster.fit(cells, self.max_date)
+
+    def sections(self, date_range=None, category=ALL, status=ALL, brand=ALL):
+        return SqlSections(self.store, date_range, category, status, brand, self.bounds, self)
+
+
+# Per-section chart data computed by SQL. Every method returns what the
+# matching aggregates.compute_* function returns for the in-memory backend.
+# Same filter semantics as FilterIndex.select: rentals by date range and
+# category (plus brand for brand-level charts), the fleet by category, status and brand.
+class SqlSections:
+    def __init__(self, store, date_range=None, category=ALL, status=ALL, brand=ALL, bounds=None, dataset=None):
+        self.store = store
+        self.dataset = dataset
+        self.date_range = date_range
+        self.bounds = bounds
+        self.category, self.status, self.brand = (None if v == ALL else v for v in (category, status, brand))
+        self._rentals_where = _rental_filter(date_range, self.category, bounds=bounds)
+
+    def __len__(self):
+        clauses, params = self._rentals_where
+        return self.store.scalar_row("SELECT COUNT(*) " + _RENTALS + _where(clauses), params)[0]
+
+    def _vehicles_where(self, prefix=""):
+        clauses, params = [], []
+        for column, value in (('vehicle_type', self.category), ('status', self.status), ('make', self.brand)):
+            if value is not None:
+                clauses.append("{}{} = ?".format(prefix, column))
+                params.append(value)
+        return clauses, params
+
+    def fleet(self):
+        clauses, params = self._vehicles_where()
+        vehicles = self.store.query("SELECT * FROM vehicles" + _where(clauses) + " ORDER BY vehicle_pos", params)
+        return vehicles.drop(columns='vehicle_pos')
+
+    def recent_rentals(self, n, columns):
+        clauses, params = self._rentals_where
+        rentals = self.store.query(
+            "SELECT {} {}{} ORDER BY r.start_date DESC, r.row_pos DESC LIMIT ?".format(
+                ", ".join("r." + column for column in columns), _RENTALS, _where(clauses)),
+            params + [n]
+        )
+        for column in ('start_date', 'end_date'):
+            if column in rentals.columns:
+                rentals[column] = pd.to_datetime(rentals[column])
+        return rentals
+
+    # Filtered 'rentals' or 'merged' rows for export, streamed from SQLite in
+    # chunks, with the columns of the in-memory frames (merged: overlapping
+    # names suffixed _x/_y, as in pipeline.join_vehicles)
+    def export_chunks(self, table, chunk_size):
+        rental_columns = [c for c in self.store.columns('rentals') if c not in ('row_pos', 'vehicle_pos')]
+        if table == 'merged':
+            vehicle_columns = [c for c in self.store.columns('vehicles') if c not in ('vehicle_id', 'vehicle_pos')]
+            overlap = set(rental_columns) & set(vehicle_columns)
+            selected = ["r.{0} AS {0}_x".format(c) if c in overlap else "r." + c for c in rental_columns]
+            selected += ["v.{0} AS {0}_y".format(c) if c in overlap else "v." + c for c in vehicle_columns]
+            clauses, params = _rental_filter(self.date_range, self.category, self.brand, self.bounds)
+        else:
+            selected = ["r." + c for c in rental_columns]
+            clauses, params = self._rentals_where
+        sql = "SELECT {} {}{} ORDER BY r.row_pos".format(", ".join(selected), _RENTALS, _where(clauses))
+        for chunk in self.store.iter_query(sql, params, chunk_size):
+            for column in ('start_date', 'end_date'):
+                if column in chunk.columns:
+                    chunk[column] = pd.to_datetime(chunk[column])
+            yield chunk
+
+    def kpis(self):
+        clauses, params = self._rentals_where
+        total_rentals, total_revenue, avg_price, avg_days, avg_rating = self.store.scalar_row(
+            "SELECT COUNT(*), TOTAL(r.total_price), AVG(r.total_price), AVG(r.rental_days), AVG(r.customer_rating) "
+            + _RENTALS + _where(clauses), params
+        )
+        fleet_clauses, fleet_params = self._vehicles_where()
+        available, rented, maintenance = self.store.scalar_row(
+            "SELECT TOTAL(status = 'Available'), TOTAL(status = 'Rented'), TOTAL(status = 'Maintenance') FROM vehicles"
+            + _where(fleet_clauses), fleet_params
+        )
+        return {
+            'total_rentals': total_rentals,
+            'total_revenue': total_revenue,
+            'avg_rental_price': avg_price if total_rentals > 0 else 0,
+            'avg_rental_days': avg_days if total_rentals > 0 else 0,
+            'avg_rating': avg_rating if total_rentals > 0 else 0,
+            'total_available': int(available),
+            'total_rented': int(rented),
+            'total_maintenance': int(maintenance),
+        }
+
+    # Daily totals from the daily_kpis table built at ingest (a few rows per
+    # day), then the same prefix-sum windows as in memory
+    def period_kpis(self):
+        clauses, params = ([], []) if self.category is None else (["vehicle_type = ?"], [self.category])
+        daily = self.store.query(
+            "SELECT start_date, " + ", ".join("SUM({0}) AS {0}".format(m) for m in KPI_MEASURES)
+            + " FROM daily_kpis" + _where(clauses) + " GROUP BY start_date",
+            params
+        )
+        daily_kpis = DailyKpis(day_numbers(daily['start_date']), [daily[measure] for measure in KPI_MEASURES])
+        return compute_period_kpis(daily_kpis, self.date_range, span=self.bounds)
+
+    def trends(self):
+        clauses, params = self._rentals_where
+        # Grouped on the expression: a bare "month" is the rentals' own month
+        # column, which would merge the same month of different years
+        monthly_totals = self.store.query(
+            "SELECT substr(r.start_date, 1, 7) AS month, COUNT(*) AS count, TOTAL(r.total_price) AS total_price "
+            + _RENTALS + _where(clauses + ["r.start_date IS NOT NULL"]) + " GROUP BY substr(r.start_date, 1, 7) ORDER BY month", params
+        )
+        months = pd.to_datetime(monthly_totals['month'], format='%Y-%m').to_numpy().astype('datetime64[M]').astype(np.int64)
+        monthly_totals['month_year'] = [month_label(month) for month in months]
+        return {
+            'monthly_rentals': monthly_totals[['month_year', 'count']],
+            'monthly_revenue': monthly_totals[['month_year', 'total_price']],
+        }
+
+    def forecast(self):
+        return compute_forecast(self.dataset.demand_forecast, self.category)
+
+    def _performance(self, column, label):
+        clauses, params = _rental_filter(self.date_range, self.category, self.brand, self.bounds)
+        perf = self.store.query(
+            "SELECT v.{0} AS '{1}', COUNT(*) AS 'Number of Rentals', TOTAL(r.total_price) AS 'Total Revenue', "
+            "ROUND(AVG(r.customer_rating), 1) AS 'Avg Rating' ".format(column, label)
+            + _RENTALS + _where(clauses + ["v.{} IS NOT NULL".format(column)]) + " GROUP BY v.{0} ORDER BY v.{0}".format(column),
+            params
+        )
+        return perf
+
+    def vehicle_performance(self):
+        brand_perf = self._performance('make', 'Brand')
+        return {
+            'category_perf': self._performance('vehicle_type', 'Category'),
+            'brand_perf': brand_perf.sort_values('Number of Rentals', ascending=False),
+        }
+
+    def fleet_status(self):
+        clauses, params = self._vehicles_where()
+        return {'status_counts': self.store.query(
+            "SELECT status AS Status, COUNT(*) AS Count FROM vehicles"
+            + _where(clauses + ["status IS NOT NULL"]) + " GROUP BY status ORDER BY Count DESC, status", params
+        )}
+
+    def top_clients(self):
+        clauses, params = self._rentals_where
+        return {'top_clients': self.store.query(
+            "SELECT r.client_name AS 'Client Name', COUNT(*) AS 'Number of Rentals' " + _RENTALS
+            + _where(clauses + ["r.client_name IS NOT NULL"])
+            + " GROUP BY r.client_name ORDER BY COUNT(*) DESC, r.client_name LIMIT 10", params
+        )}
+
+    # Per-client totals by GROUP BY, scored like the in-memory backend
+    def clients(self):
+        clauses, params = self._rentals_where
+        totals = self.store.query(
+            "SELECT r.client_name, COUNT(*) AS rentals, SUM(COALESCE(r.total_price, 0)) AS revenue, "
+            "SUM(r.customer_rating) AS rating_sum, COUNT(r.customer_rating) AS rating_count, "
+            "SUM(r.return_delay_days > 0) AS late, MIN(r.start_date) AS first_date, MAX(r.start_date) AS last_date "
+            + _RENTALS + _where(clauses + ["r.client_name IS NOT NULL"]) + " GROUP BY r.client_name ORDER BY r.client_name",
+            params
+        )
+        as_of = self.date_range[1] if self.date_range is not None else self.bounds[1]
+        return client_analytics(
+            totals['client_name'], totals['rentals'], totals['revenue'], totals['rating_sum'].fillna(0),
+            totals['rating_count'], totals['late'].fillna(0),
+            day_numbers(totals['first_date']), day_numbers(totals['last_date']),
+            np.datetime64(pd.Timestamp(as_of).date(), 'D').astype(np.int64)
+        )
+
+    def delays(self):
+        clauses, params = self._rentals_where
+        delay_counts = self.store.query(
+            "SELECT r.return_delay_days AS 'Delay Days', COUNT(*) AS Count " + _RENTALS
+            + _where(clauses + ["r.return_delay_days IS NOT NULL"])
+            + " GROUP BY r.return_delay_days ORDER BY r.return_delay_days", params
+        )
+        total, avg_delay, on_time, delayed = self.store.scalar_row(
+            "SELECT COUNT(*), AVG(r.return_delay_days), TOTAL(r.return_delay_days = 0), TOTAL(r.return_delay_days > 0) "
+            + _RENTALS + _where(clauses), params
+        )
+        delayed = int(delayed)
+        return {
+            'delay_counts': delay_counts,
+            'avg_delay': np.nan if avg_delay is None else avg_delay,
+            'delayed_rentals': delayed,
+            'percent_delayed': (delayed / total) * 100 if total > 0 else 0,
+            'delay_pie': pd.DataFrame({
+                "Status": ["On Time", "Delayed"],
+                "Count": [int(on_time), delayed]
+            }),
+        }
+
+    def ratings(self):
+        clauses, params = self._rentals_where
+        rating_counts = self.store.query(
+            "SELECT ROUND(r.customer_rating, 1) AS Rating, COUNT(*) AS Count " + _RENTALS
+            + _where(clauses + ["r.customer_rating IS NOT NULL"]) + " GROUP BY Rating ORDER BY Rating", params
+        )
+        rated = rating_counts['Count'].sum()
+        high_ratings = rating_counts.loc[rating_counts['Rating'] >= 4, 'Count'].sum()
+        return {
+            'rating_counts': rating_counts,
+            'rating_percentage': (high_ratings / rated) * 100 if rated > 0 else 0,
+        }
+
+    def payments(self):
+        clauses, params = self._rentals_where
+        return {'payment_revenue': self.store.query(
+            "SELECT r.payment_method AS 'Payment Method', TOTAL(r.total_price) AS 'Total Revenue', "
+            "COUNT(*) AS 'Number of Rentals' " + _RENTALS + _where(clauses + ["r.payment_method IS NOT NULL"])
+            + " GROUP BY r.payment_method ORDER BY r.payment_method", params
+        )}
+
+    # Scatter points, or the same 2D binning as downsample.bin_duration_price done in SQL
+    def duration_price(self, point_limit=SCATTER_POINT_LIMIT):
+        clauses, params = self._rentals_where
+        clauses = clauses + ["r.rental_days > 0", "r.total_price IS NOT NULL"]
+        count, min_days, max_days, min_price, max_price = self.store.scalar_row(
+            "SELECT COUNT(*), MIN(r.rental_days), MAX(r.rental_days), MIN(r.total_price), MAX(r.total_price) "
+            + _RENTALS + _where(clauses), params
+        )
+        if count <= point_limit:
+            points = self.store.query(
+                "SELECT r.rental_days, r.total_price, r.return_delay_days " + _RENTALS + _where(clauses)
+                + " ORDER BY r.row_pos", params
+            )
+            return {'duration_price': points, 'duration_price_binned': False, 'duration_price_rentals': count}
+
+        day_low, day_high = np.floor(min_days) - 0.5, np.ceil(max_days) + 0.5
+        day_bins = int(min(day_high - day_low, MAX_DAY_BINS))
+        if min_price == max_price:
+            # Same convention as np.histogram for a single value
+            min_price, max_price = min_price - 0.5, max_price + 0.5
+        day_width = (day_high - day_low) / day_bins
+        price_width = (max_price - min_price) / PRICE_BINS
+        binned = self.store.query(
+            "SELECT MIN(CAST((r.rental_days - ?) / ? AS INTEGER), ?) AS day_bin, "
+            "MIN(CAST((r.total_price - ?) / ? AS INTEGER), ?) AS price_bin, "
+            "COUNT(*) AS count, AVG(r.return_delay_days) AS return_delay_days "
+            + _RENTALS + _where(clauses) + " GROUP BY day_bin, price_bin ORDER BY day_bin, price_bin",
+            [day_low, day_width, day_bins - 1, min_price, price_width, PRICE_BINS - 1] + params
+        )
+        binned.insert(0, 'rental_days', day_low + (binned.pop('day_bin') + 0.5) * day_width)
+        binned.insert(1, 'total_price', min_price + (binned.pop('price_bin') + 0.5) * price_width)
+        return {'duration_price': binned, 'duration_price_binned': True, 'duration_price_rentals': count}
+
+    # Rentals of the filtered fleet whose occupancy interval (late return
+    # included) overlaps the date range
+    def _fleet_intervals(self, columns):
+        clauses, params = self._vehicles_where("v.")
+        if self.date_range is not None:
+            first, last = (pd.Timestamp(d).strftime('%Y-%m-%d') for d in self.date_range)
+            clauses = clauses + [
+                "r.start_date <= ?",
+                "julianday(r.end_date) + MAX(COALESCE(r.return_delay_days, 0), 0) > julianday(?)",
+            ]
+            params = params + [last, first]
+        return self.store.query(
+            "SELECT " + ", ".join("r." + column for column in columns) + " "
+            "FROM rentals r JOIN vehicles v ON v.vehicle_pos = r.vehicle_pos" + _where(clauses), params
+        )
+
+    # Occupancy of the filtered fleet: the intervals come from SQL, the
+    # day-by-day sweep runs in NumPy
+    def utilization(self):
+        clauses, params = self._vehicles_where()
+        fleet = self.store.query(
+            "SELECT vehicle_pos, vehicle_id FROM vehicles" + _where(clauses) + " ORDER BY vehicle_pos", params
+        )
+        intervals = self._fleet_intervals(['vehicle_pos', 'start_date', 'end_date', 'return_delay_days', 'status'])
+
+        local = pd.Series(np.arange(len(fleet)), index=fleet['vehicle_pos'])
+        vehicle_index = local.reindex(intervals['vehicle_pos']).fillna(-1).to_numpy(dtype=np.int64)
+        start_days, end_days = rental_intervals(
+            intervals['start_date'], intervals['end_date'], intervals['return_delay_days'], intervals['status']
+        )
+        return compute_utilization(fleet['vehicle_id'], vehicle_index, start_days, end_days, self.date_range)
+
+    # Double bookings of the filtered fleet. Both rentals of a conflict
+    # overlapping the date range, the detector only needs those intervals.
+    def conflicts(self):
+        conflicts = RentalConflicts(self._fleet_intervals(
+            ['rental_id', 'vehicle_id', 'start_date', 'end_date', 'return_delay_days', 'status']
+        ))
+        return {'conflicts': conflicts.frame(conflicts.in_range(self.date_range))}
@@ -0,0 +1,77 @@
+# Forecasts of noiseless series, which the fitted models must extend exactly
+#
+#   python -m pytest sfe_2/tests
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecast import SEASON_LENGTH, TOTAL, DemandForecaster, _fit, monthly_history  # noqa: E402
+
+HORIZON = 3
+
+
+def linear(t):
+    return 100 + 2 * t
+
+
+def trend_and_season(t):
+    return 100 + 2 * t + 10 * np.sin(2 * np.pi * t / SEASON_LENGTH)
+
+
+# Last day of a month number (months since January 1970)
+def last_day(month):
+    return (np.datetime64(month + 1, 'M').astype('datetime64[D]') - 1).astype(object)
+
+
+# One-series history (rentals and revenue) of f over n_months months
+def history(f, n_months):
+    y = f(np.arange(n_months, dtype='float64'))
+    return np.stack([y, 10 * y])[None]
+
+
+@pytest.mark.parametrize('f', [linear, trend_and_season])
+@pytest.mark.parametrize('n_months', [2 * SEASON_LENGTH, 3 * SEASON_LENGTH])
+def test_seasonal_forecast_follows_trend_and_season(f, n_months):
+    forecast = _fit([TOTAL], 0, history(f, n_months))
+    assert forecast.seasonal
+
+    mean, lower, upper = forecast.predict(HORIZON)
+    expected = f(np.arange(n_months, n_months + HORIZON, dtype='float64'))
+    np.testing.assert_allclose(mean[0, 0], expected, rtol=1e-6)
+    np.testing.assert_allclose(mean[0, 1], 10 * expected, rtol=1e-6)
+    assert np.all(lower <= mean) and np.all(mean <= upper)
+
+
+def test_trend_forecast_follows_line():
+    forecast = _fit([TOTAL], 0, history(linear, SEASON_LENGTH))
+    assert not forecast.seasonal
+
+    mean, _, _ = forecast.predict(HORIZON)
+    np.testing.assert_allclose(mean[0, 0], linear(np.arange(SEASON_LENGTH, SEASON_LENGTH + HORIZON)), rtol=1e-6)
+
+
+# Appending months keeps the fitted parameters and continues the recursion
+def test_incremental_refit_matches_full_fit():
+    months = np.arange(3 * SEASON_LENGTH)
+    counts = trend_and_season(months.astype('float64'))
+    cells = pd.DataFrame({
+        'month': months,
+        'vehicle_type': np.full(len(months), 'SUV', dtype=object),
+        'make': np.full(len(months), 'Renault', dtype=object),
+        'count': counts,
+        'revenue': 10 * counts,
+    })
+
+    forecaster = DemandForecaster()
+    first = forecaster.fit(cells[cells['month'] < 2 * SEASON_LENGTH + 6], last_day(2 * SEASON_LENGTH + 5))
+    refit = forecaster.fit(cells, last_day(3 * SEASON_LENGTH - 1))
+    assert first.refit == "full" and refit.refit == "incremental"
+
+    keys, first_month, full_history = monthly_history(cells, 3 * SEASON_LENGTH - 1)
+    mean, _, _ = refit.predict(HORIZON)
+    np.testing.assert_allclose(mean, _fit(keys, first_month, full_history).predict(HORIZON)[0], rtol=1e-6)
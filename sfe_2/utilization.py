@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from filters import day_numbers
+
+# Rentals that never took a car out
+INACTIVE_STATUSES = ('Cancelled',)
+
+# Above this many days the heatmap shows weekly occupancy instead of daily
+HEATMAP_MAX_DAYS = 120
+
+
+# Day interval [start, end) each rental kept its vehicle: from the start date to
+# the end date pushed back by the return delay (the return day itself is free,
+# so a rental occupies rental_days + return_delay_days days). Undated and
+# cancelled rentals get an empty interval.
+def rental_intervals(start_dates, end_dates, return_delay_days, statuses):
+    start = day_numbers(start_dates).astype(np.int64)
+    end = day_numbers(end_dates).astype(np.int64)
+    delay = np.nan_to_num(np.asarray(return_delay_days, dtype='float64'), nan=0.0)
+    end = end + np.maximum(delay, 0).astype(np.int64)
+
+    missing = np.iinfo(np.int32).min
+    inactive = (
+        (start == missing) | (end == missing)
+        | pd.Series(statuses).isin(INACTIVE_STATUSES).to_numpy()
+    )
+    end[inactive] = start[inactive]
+    return start, end
+
+
+# Number of active rentals of each vehicle on each day of [first_day, last_day]:
+# a difference array gets +1 at every interval start and -1 at every end,
+# one bincount for all vehicles at once, then a cumulative sum along the days.
+# O(rentals + vehicles x days), no per-day or per-rental Python loop.
+def occupancy_matrix(vehicle_index, start_days, end_days, n_vehicles, first_day, last_day):
+    n_days = last_day - first_day + 1
+    start = np.clip(start_days - first_day, 0, n_days)
+    end = np.clip(end_days - first_day, 0, n_days)
+    keep = (vehicle_index >= 0) & (end > start)
+    vehicle_index, start, end = vehicle_index[keep], start[keep], end[keep]
+
+    width = n_days + 1
+    size = n_vehicles * width
+    diff = (
+        np.bincount(vehicle_index * width + start, minlength=size)
+        - np.bincount(vehicle_index * width + end, minlength=size)
+    )
+    return np.cumsum(diff.reshape(n_vehicles, width)[:, :n_days], axis=1, dtype=np.int32)
+
+
+# Daily cars out, per-vehicle utilization and the occupancy heatmap for a set
+# of vehicles over a date range. vehicle_index gives each interval's row in
+# vehicle_ids (-1: not one of them). Without a date range, the span of the
+# intervals is used.
+def compute_utilization(vehicle_ids, vehicle_index, start_days, end_days, date_range=None):
+    vehicle_ids = list(vehicle_ids)
+    active = (vehicle_index >= 0) & (end_days > start_days)
+    if date_range is not None:
+        first_day, last_day = (np.datetime64(d, 'D').astype(np.int64) for d in date_range)
+    elif active.any():
+        first_day, last_day = start_days[active].min(), end_days[active].max() - 1
+    else:
+        first_day = last_day = np.datetime64('today', 'D').astype(np.int64)
+
+    occupancy = occupancy_matrix(vehicle_index, start_days, end_days, len(vehicle_ids), first_day, last_day)
+    out = occupancy > 0
+    days = pd.to_datetime(np.arange(first_day, last_day + 1).astype('datetime64[D]'))
+    n_days = len(days)
+
+    days_out = out.sum(axis=1)
+    vehicle_utilization = pd.DataFrame({
+        'Vehicle': vehicle_ids,
+        'Days Rented': days_out,
+        'Utilization (%)': (days_out / n_days * 100).round(1) if n_days else 0.0,
+    }).sort_values('Utilization (%)', ascending=False, kind='stable')
+
+    # Heatmap: daily 0/1 occupancy, or the share of each week a vehicle was out
+    if n_days > HEATMAP_MAX_DAYS:
+        week_starts = np.arange(0, n_days, 7)
+        week_lengths = np.diff(np.append(week_starts, n_days))
+        heatmap = np.add.reduceat(out.astype(np.int32), week_starts, axis=1) / week_lengths
+        heatmap_columns = days[week_starts]
+    else:
+        heatmap = out.astype(np.int8)
+        heatmap_columns = days
+
+    return {
+        'daily_cars_out': pd.DataFrame({'Date': days, 'Cars Out': out.sum(axis=0), 'Fleet Size': len(vehicle_ids)}),
+        'vehicle_utilization': vehicle_utilization,
+        'fleet_utilization': float(out.mean() * 100) if out.size else 0.0,
+        'heatmap': pd.DataFrame(heatmap, index=vehicle_ids, columns=heatmap_columns),
+        'heatmap_weekly': n_days > HEATMAP_MAX_DAYS,
+    }
+
+
+# Rental intervals of a dataset, computed once per data load
+class UtilizationIntervals:
+    def __init__(self, rentals_df, vehicle_pos):
+        self.vehicle_pos = np.asarray(vehicle_pos)
+        self.start_days, self.end_days = rental_intervals(
+            rentals_df['start_date'], rentals_df['end_date'],
+            rentals_df['return_delay_days'], rentals_df['status']
+        )
+
+    # Utilization of the vehicles at `vehicle_positions` (rows of the vehicles table)
+    def compute(self, vehicle_ids, vehicle_positions, n_vehicles, date_range=None):
+        local = np.full(n_vehicles, -1, dtype=np.int64)
+        local[vehicle_positions] = np.arange(len(vehicle_positions))
+        vehicle_index = np.where(self.vehicle_pos >= 0, local[self.vehicle_pos], -1)
+        return compute_utilization(vehicle_ids, vehicle_index, self.start_days, self.end_days, date_range)
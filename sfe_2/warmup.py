@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from filters import ALL
+from snapshot import SNAPSHOT_DIR
+
+# Filter combinations pre-computed on each new data version, besides the
+# default (unfiltered) view
+WARM_TOP_VIEWS = 5
+WARM_CHECK_INTERVAL = 1.0  # seconds between data version checks
+USAGE_SAVE_INTERVAL = 30.0  # seconds between writes of the usage log
+
+# Usage counts survive restarts in this file ("" keeps them in memory only)
+USAGE_LOG_PATH = os.environ.get("DASHBOARD_USAGE_LOG", os.path.join(SNAPSHOT_DIR, "usage.json"))
+
+DEFAULT_VIEW = (None, ALL, ALL, ALL)
+
+
+# How often each filter combination (date range, category, status, brand) was
+# requested. A date range covering all the data is stored as None, so that the
+# same "everything" view still matches once newer rentals move the last date.
+class UsageLog:
+    def __init__(self, path=USAGE_LOG_PATH, save_interval=USAGE_SAVE_INTERVAL):
+        self.path = path or None
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        if self.path:
+            self._load()
+
+    def record(self, date_range, category, status, brand, span=None):
+        if date_range is not None and span is not None and tuple(date_range) == tuple(span):
+            date_range = None
+        view = (tuple(date_range) if date_range is not None else None, category, status, brand)
+        with self._lock:
+            self._counts[view] += 1
+            self._dirty = True
+            save = self.path and time.monotonic() - self._saved_at >= self.save_interval
+        if save:
+            self.save()
+
+    # The n most requested views, the most frequent first
+    def top(self, n):
+        with self._lock:
+            return [view for view, _ in self._counts.most_common(n)]
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [
+                {
+                    'date_range': [d.isoformat() for d in view[0]] if view[0] is not None else None,
+                    'category': view[1],
+                    'status': view[2],
+                    'brand': view[3],
+                    'count': count,
+                }
+                for view, count in self._counts.items()
+            ]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Written aside and renamed, so a crash never leaves half a file
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(entries, f)
+        os.replace(temporary, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in entries:
+            date_range = entry.get('date_range')
+            if date_range is not None:
+                date_range = tuple(date.fromisoformat(d) for d in date_range)
+            view = (date_range, entry.get('category', ALL), entry.get('status', ALL), entry.get('brand', ALL))
+            self._counts[view] += int(entry.get('count', 0))
+
+
+# Filter combinations to pre-compute for a dataset: the default view first, then
+# the most requested ones. A None date range is the dataset's full range, which
+# is what the sidebar's date picker defaults to.
+def warm_views(dataset, usage_log=None, top=WARM_TOP_VIEWS):
+    views = [DEFAULT_VIEW]
+    if usage_log is not None:
+        views += [view for view in usage_log.top(top + 1) if view != DEFAULT_VIEW][:top]
+    full_range = (dataset.min_date, dataset.max_date)
+    return [(view[0] if view[0] is not None else full_range,) + tuple(view[1:]) for view in views]
+
+
+# Serves the current (version, dataset) pair and replaces it in the background:
+# when the data version changes, a worker thread builds the new dataset, warms
+# it (e.g. fills the result cache for the usual views) and only then swaps it in,
+# in one assignment. Sessions keep using the previous, warm dataset meanwhile
+# and never see a half-built one. A failed build keeps the previous dataset;
+# it is retried once the version changes again.
+class WarmDatasets:
+    def __init__(self, current_version, build, warm=None, initial=None, interval=WARM_CHECK_INTERVAL):
+        self.current_version = current_version
+        self.build = build
+        self.warm = warm
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._current = initial
+        self._failed_version = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.last_refresh = None
+        self._thread = threading.Thread(target=self._run, name="dataset-warmup", daemon=True)
+        self._thread.start()
+
+    # The (version, dataset) pair to use for a whole run; built right away the
+    # first time, when there is nothing to serve yet
+    def current(self):
+        with self._lock:
+            current = self._current
+        if current is None:
+            version = self.current_version()
+            current = (version, self.build(version))
+            with self._lock:
+                if self._current is None:
+                    self._current = current
+                current = self._current
+        return current
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._current[0] if self._current is not None else None
+
+    # Wake the worker up now instead of at its next check (e.g. as a
+    # FileWatcher.on_change callback)
+    def notify(self, version=None):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=self.interval * 2)
+
+    # Build, warm and swap in the dataset of `version`; returns whether it was swapped
+    def refresh(self, version):
+        started = time.perf_counter()
+        try:
+            dataset = self.build(version)
+            warmed = self.warm(version, dataset) if self.warm is not None else 0
+        except Exception as error:
+            self._failed_version = version
+            self.last_refresh = {'version': version, 'error': repr(error), 'seconds': time.perf_counter() - started}
+            return False
+        with self._lock:
+            self._current = (version, dataset)
+        self.last_refresh = {'version': version, 'warmed': warmed, 'seconds': time.perf_counter() - started}
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                version = self.current_version()
+                if self._current is not None and version != self.version and version != self._failed_version:
+                    self.refresh(version)
+            except Exception:
+                # A failing check must not stop the worker
+                continue
@@ -0,0 +1,69 @@
+import threading
+
+from snapshot import file_signature
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+# Watches a set of source files on a background thread (mtime/size polling) and
+# bumps a version counter whenever one of them changes. Cached data keyed on
+# `version` is then rebuilt only when a source file was actually modified.
+# `paths` may also be a function returning the current list of files (e.g. a
+# glob), so files that appear or disappear count as changes too.
+class FileWatcher:
+    def __init__(self, paths, interval=DEFAULT_POLL_INTERVAL):
+        self.paths = paths if callable(paths) else list(paths)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._version = 0
+        self._signatures = self._scan()
+        self._callbacks = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="data-file-watcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def version(self):
+        with self._lock:
+            return self._version
+
+    # Register a function called with the new version after each change
+    def on_change(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval * 2)
+
+    def _scan(self):
+        signatures = {}
+        for path in (self.paths() if callable(self.paths) else self.paths):
+            try:
+                signatures[path] = file_signature(path)
+            except OSError:
+                # Missing files count as a state too, so their (re)appearance is noticed
+                signatures[path] = None
+        return signatures
+
+    # Check the files once; returns True when something changed
+    def poll(self):
+        signatures = self._scan()
+        with self._lock:
+            if signatures == self._signatures:
+                return False
+            self._signatures = signatures
+            self._version += 1
+            version = self._version
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(version)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                # A failing callback must not stop the watcher
+                continue